@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Перепарсинг архива страниц без запросов к сайтам.
+
+После исправления селекторов новая логика parse_page применяется ко всем
+сохраненным страницам по порядку загрузки, а competitor_products и
+price_history пересобираются пакетной записью. Страницы товаров (из карты
+сайта) разбираются parse_product_page, товары проходят ту же нормализацию
+и пометку раздела, что и при обычном обновлении, а история цен пишется
+относительно предыдущего наблюдения в архиве. С --until пересобирается
+только история: товары в базе уже новее конца окна и не откатываются к
+старым ценам.
+
+История окна перед пересборкой удаляется (ее уже записали обычные
+обновления), первое наблюдение товара сравнивается с ценой в базе на
+начало окна. Прогресс и последние цены сохраняются после каждой страницы,
+повторный запуск продолжает с места остановки.
+
+Примеры:
+    python backfill.py --source strikeplanet --since 2026-09-01
+    python backfill.py --dry-run          # только разбор, без записи в базу
+    python backfill.py --reset            # начать заново
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+
+from parsers import parse_pool
+from parsers.airsoftrus_parser import AirsoftRusParser
+from parsers.page_archive import get_archive
+from parsers.strikeplanet_parser import StrikePlanetParser
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PARSER_CLASSES = {
+    'strikeplanet': StrikePlanetParser,
+    'airsoftrus': AirsoftRusParser,
+}
+
+CHECKPOINT_PATH = os.path.join('data', 'backfill_checkpoint.json')
+PROGRESS_INTERVAL = 5
+
+
+def parse_date(value: str) -> float:
+    """ГГГГ-ММ-ДД в timestamp"""
+    return datetime.strptime(value, '%Y-%m-%d').timestamp()
+
+
+def load_checkpoint(path: str, signature: dict):
+    """Позиция (fetched_at, id), на которой остановился прошлый запуск с теми же параметрами,
+    и последние цены товаров по URL"""
+    if not os.path.exists(path):
+        return None, {}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get('signature') != signature:
+        print("⚠️ Сохраненный прогресс относится к другим параметрам, начинаем заново")
+        return None, {}
+
+    return (checkpoint['fetched_at'], checkpoint['id']), checkpoint.get('prices', {})
+
+
+def save_checkpoint(path: str, signature: dict, fetch: dict, prices: dict):
+    """Сохранение позиции и последних цен после записанной страницы"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'signature': signature, 'fetched_at': fetch['fetched_at'], 'id': fetch['id'],
+                   'prices': prices}, f)
+    os.replace(tmp_path, path)
+
+
+def first_fetched_at(archive, source: str, since: float = None, until: float = None):
+    """Время первой загрузки источника в окне; None - загрузок нет"""
+    fetches = archive.fetches(source=source, since=since, until=until)
+    try:
+        first = next(fetches, None)
+    finally:
+        fetches.close()
+    return first['fetched_at'] if first else None
+
+
+def reset_history(product_ops, archive, parsers: dict, since: float = None, until: float = None) -> dict:
+    """Удаление истории цен окна и цены товаров на его начало.
+
+    Окно источника начинается с его первой загрузки в архиве: более
+    раннюю историю перепарсинг не восстановит, поэтому она не трогается.
+    """
+    prices = {}
+    for source, parser in parsers.items():
+        started_at = first_fetched_at(archive, source, since, until)
+        if started_at is None:
+            continue
+        start = datetime.fromtimestamp(started_at)
+        # Цены на начало окна - до удаления истории, по которой они считаются
+        prices.update(product_ops.get_competitor_prices_at(parser.name, start))
+        removed = product_ops.delete_competitor_history(
+            parser.name, start, datetime.fromtimestamp(until) if until else None)
+        print(f"🧹 {parser.name}: удалено записей истории цен с {start:%d.%m.%Y %H:%M}: {removed}")
+    return prices
+
+
+def load_parsers_config() -> dict:
+    """PARSERS_CONFIG из key/key.py (разделы, селекторы); без ключа - настройки по умолчанию"""
+    try:
+        from config import Config
+    except ImportError:
+        print("⚠️ key/key.py не найден, парсеры с настройками по умолчанию")
+        return {}
+    return Config.PARSERS_CONFIG
+
+
+def page_kind(parser, url: str):
+    """Вид архивной страницы: ('catalog', раздел), ('product', None) или (None, None) - пропустить"""
+    if not parser.is_product_page(url):
+        return 'catalog', parser.category_of(url)
+    # Раздел по адресу: товары и следующие страницы (?PAGEN_1=2) лежат под адресом раздела
+    category = next((c['name'] for c in parser.categories if url.startswith(c['url'])), None)
+    if parser.is_sitemap_product(url):
+        return 'product', category
+    if category:
+        return 'catalog', category
+    # Карты сайта и прочие страницы
+    return None, None
+
+
+def backfill(sources, since=None, until=None, workers=None, dry_run=False, reset=False,
+             checkpoint_path=CHECKPOINT_PATH):
+    """Перепарсинг архива в пуле процессов с потоковой записью в базу"""
+    archive = get_archive()
+    parsers_config = load_parsers_config()
+    parsers = {source: PARSER_CLASSES[source](parsers_config.get(source)) for source in sources}
+    remembered = {source: parser.selector_memo.get(source) for source, parser in parsers.items()}
+
+    # Окно в прошлом: последние загрузки окна старше состояния товаров в базе
+    update_products = until is None
+    product_ops = None
+    if not dry_run:
+        from database.operations import ProductOperations
+        product_ops = ProductOperations()
+
+    signature = {'sources': sorted(sources), 'since': since, 'until': until}
+    # Цена товара в предыдущем наблюдении: на начало окна, дальше - по архиву
+    after, last_price = (None, {}) if reset else load_checkpoint(checkpoint_path, signature)
+    if after:
+        print(f"▶️ Продолжаем с загрузки от {datetime.fromtimestamp(after[0]):%d.%m.%Y %H:%M}")
+    elif product_ops:
+        # Новый проход: история окна пишется заново, а не дописывается к записанной обновлениями
+        last_price = reset_history(product_ops, archive, parsers, since, until)
+
+    total = sum(archive.count(source=source, since=since, until=until) for source in sources)
+    workers = workers or parse_pool.available_cores()
+    executor = parse_pool.get_executor(workers)
+
+    stats = {'pages': 0, 'parsed': 0, 'unchanged': 0, 'skipped': 0, 'products': 0}
+    started = time.monotonic()
+    last_report = started
+    pending = deque()
+    last_hash = {}
+
+    def report(final=False):
+        elapsed = time.monotonic() - started
+        rate = stats['pages'] / elapsed if elapsed else 0
+        left = max(0, total - stats['pages'])
+        eta = f", осталось ~{left / rate:.0f} сек" if rate and not final else ""
+        print(f"📊 {stats['pages']}/{total} страниц ({stats['unchanged']} без изменений, "
+              f"{stats['skipped']} пропущено), "
+              f"товаров: {stats['products']}, {rate:.1f} стр/сек{eta}")
+
+    def drain_one():
+        """Запись самой старой страницы из очереди, порядок загрузок сохраняется"""
+        fetch, future, kind, category = pending.popleft()
+        if future is not None:
+            parser = parsers[fetch['source']]
+            products = []
+            # Как в конвейере обновления: раздел страницы, затем нормализация
+            for row in future.result():
+                product = parse_pool.tuple_to_product(row)
+                product.category = category
+                product = parser.normalize_product(product)
+                if product:
+                    products.append(product)
+
+            stats['parsed'] += 1
+            stats['products'] += len(products)
+            if product_ops and products:
+                product_ops.bulk_upsert_competitor_products(
+                    products, observed_at=datetime.fromtimestamp(fetch['fetched_at']),
+                    previous_prices={p.url: last_price.get(p.url) for p in products},
+                    update_products=update_products)
+            for product in products:
+                last_price[product.url] = product.price
+        elif kind is not None:
+            stats['unchanged'] += 1
+
+        stats['pages'] += 1
+        if not dry_run:
+            save_checkpoint(checkpoint_path, signature, fetch, last_price)
+
+    try:
+        for fetch in archive.fetches(since=since, until=until, after=after):
+            source = fetch['source']
+            if source not in sources:
+                continue
+
+            parser = parsers[source]
+            kind, category = page_kind(parser, fetch['url'])
+            future = None
+            if kind is None:
+                stats['skipped'] += 1
+            elif fetch['status'] and fetch['status'] >= 400:
+                pass
+            elif last_hash.get(fetch['url']) == fetch['hash']:
+                # Та же страница, что и в прошлый раз - цены не менялись
+                pass
+            else:
+                last_hash[fetch['url']] = fetch['hash']
+                future = executor.submit(
+                    parse_pool.parse_archived_in_worker,
+                    type(parser), archive.root, fetch['hash'], remembered[source], parser.html_engine,
+                    parser.config, fetch['url'] if kind == 'product' else None
+                )
+            pending.append((fetch, future, kind, category))
+
+            # Ограниченное окно: пул занят, а HTML не копится в памяти
+            while len(pending) > workers * 2:
+                drain_one()
+
+            if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                report()
+                last_report = time.monotonic()
+
+        while pending:
+            drain_one()
+    finally:
+        parse_pool.shutdown()
+
+    report(final=True)
+    print("✅ Перепарсинг завершен" + (" (без записи в базу)" if dry_run else ""))
+    return stats
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Перепарсинг архива страниц")
+    arg_parser.add_argument('--source', action='append', choices=sorted(PARSER_CLASSES),
+                            help="источник (можно несколько), по умолчанию все")
+    arg_parser.add_argument('--since', help="с даты ГГГГ-ММ-ДД")
+    arg_parser.add_argument('--until', help="по дату ГГГГ-ММ-ДД (не включая)")
+    arg_parser.add_argument('--workers', type=int, help="процессов разбора, по умолчанию по числу ядер")
+    arg_parser.add_argument('--dry-run', action='store_true', help="только разбор, без записи в базу")
+    arg_parser.add_argument('--reset', action='store_true', help="игнорировать сохраненный прогресс")
+    args = arg_parser.parse_args()
+
+    try:
+        backfill(
+            sources=args.source or list(PARSER_CLASSES),
+            since=parse_date(args.since) if args.since else None,
+            until=parse_date(args.until) if args.until else None,
+            workers=args.workers,
+            dry_run=args.dry_run,
+            reset=args.reset,
+        )
+    except KeyboardInterrupt:
+        print("\n🛑 Остановлено, прогресс сохранен - повторный запуск продолжит с этого места")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора страниц парсерами.
+
+Для каждого HTML-парсера, страницы, движка BeautifulSoup и стратегии
+поиска селекторов меряет страниц/сек, товаров/сек, пиковый RSS процесса
+и пик выделенной памяти (tracemalloc) на страницу. Каждый замер идет в
+отдельном процессе, чтобы RSS одного случая не влиял на другой.
+
+Страницы: debug_page.html и синтетические каталоги на 10/100/1000
+карточек, собранные из карточки товара debug_page.html.
+
+Стратегии:
+    memo     - запомненные селекторы (обычный режим после первого прогона)
+    cascade  - перебор списка селекторов парсера
+    generic  - общий поиск по словам в классах (селекторы не подошли)
+
+Отчет - JSON, его можно сравнить с прошлым прогоном:
+    python benchmark_parsers.py --output data/benchmarks/new.json --compare data/benchmarks/old.json
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.append(os.path.dirname(__file__))
+
+PARSERS = {
+    'strikeplanet': 'parsers.strikeplanet_parser.StrikePlanetParser',
+    'airsoftrus': 'parsers.airsoftrus_parser.AirsoftRusParser',
+}
+
+ENGINES = ['html.parser', 'lxml']
+STRATEGIES = ['memo', 'cascade', 'generic']
+SYNTHETIC_SIZES = [10, 100, 1000]
+
+DEBUG_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_page.html')
+SAMPLE_CARD_SELECTOR = '.product--card'
+
+
+def load_parser_class(key: str):
+    """Класс парсера по ключу"""
+    module_name, class_name = PARSERS[key].rsplit('.', 1)
+    module = __import__(module_name, fromlist=[class_name])
+    return getattr(module, class_name)
+
+
+def available_engines() -> list:
+    """Движки BeautifulSoup, установленные в окружении"""
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    engines = []
+    for engine in ENGINES:
+        try:
+            BeautifulSoup('<p></p>', engine)
+            engines.append(engine)
+        except FeatureNotFound:
+            print(f"⚠️ Движок {engine} не установлен, пропускаем")
+    return engines
+
+
+def build_synthetic_page(cards: int, sample_html: str) -> str:
+    """Каталог из cards копий карточки товара с разными названиями"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(sample_html, 'html.parser')
+    card = soup.select_one(SAMPLE_CARD_SELECTOR)
+    if card is None:
+        raise ValueError(f"В {DEBUG_PAGE} нет карточки {SAMPLE_CARD_SELECTOR}")
+
+    card_html = str(card)
+    title = card.select_one('[class*="title"]')
+    title_text = title.get_text(strip=True) if title else None
+
+    items = []
+    for i in range(cards):
+        item = card_html
+        if title_text:
+            item = item.replace(title_text, f"{title_text} №{i + 1}", 1)
+        items.append(f'<div class="catalog__item">{item}</div>')
+
+    return ('<html><head><meta charset="utf-8"><title>Каталог</title></head><body>'
+            '<header class="header"><nav class="menu"><a href="/">Главная</a></nav></header>'
+            f'<div class="catalog">{"".join(items)}</div>'
+            '<footer class="footer">Планета страйкбола</footer></body></html>')
+
+
+def build_inputs(sizes) -> dict:
+    """Страницы для замеров: имя -> HTML"""
+    with open(DEBUG_PAGE, 'r', encoding='utf-8') as f:
+        sample_html = f.read()
+
+    inputs = {'debug_page': sample_html}
+    for size in sizes:
+        inputs[f'synthetic_{size}'] = build_synthetic_page(size, sample_html)
+    return inputs
+
+
+def max_rss_kb() -> int:
+    """Пиковый RSS процесса в КБ"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS отдает байты, Linux - килобайты
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def run_case(parser_key: str, input_name: str, html: str, engine: str, strategy: str,
+             min_time: float, min_pages: int) -> dict:
+    """Выполняется в отдельном процессе: замер одного случая"""
+    # Логи парсера на каждую страницу искажают замер
+    logging.disable(logging.CRITICAL)
+
+    parser = load_parser_class(parser_key)()
+    parser.html_engine = engine
+    parser.archive_pages = False
+
+    def parse():
+        return parser.parse_page(html)
+
+    # Выученные селекторы нужны стратегии memo, остальные начинают с чистой памяти
+    parser.selector_memo.prime(parser.source, {})
+    _, learned = parser.parse_page_with_selectors(html)
+
+    if strategy == 'memo':
+        parser.selector_memo.prime(parser.source, learned)
+    elif strategy == 'generic':
+        parser.product_selectors = []
+
+    # Прогрев
+    products = len(parse())
+    rss_before = max_rss_kb()
+
+    pages = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while pages < min_pages or elapsed < min_time:
+        parse()
+        pages += 1
+        elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    parse()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    _, selectors = parser.parse_page_with_selectors(html)
+
+    return {
+        'parser': parser_key,
+        'input': input_name,
+        'input_bytes': len(html.encode('utf-8')),
+        'engine': engine,
+        'strategy': strategy,
+        'selectors': selectors,
+        'products_per_page': products,
+        'pages': pages,
+        'seconds': round(elapsed, 4),
+        'pages_per_sec': round(pages / elapsed, 2),
+        'products_per_sec': round(pages * products / elapsed, 1),
+        'ms_per_page': round(elapsed / pages * 1000, 3),
+        'peak_rss_kb': max_rss_kb(),
+        'parse_rss_growth_kb': max_rss_kb() - rss_before,
+        'alloc_peak_kb_per_page': round(alloc_peak / 1024, 1),
+    }
+
+
+def case_key(result: dict) -> tuple:
+    """Ключ случая для сравнения отчетов"""
+    return result['parser'], result['input'], result['engine'], result['strategy']
+
+
+def run_benchmarks(parsers, engines, strategies, sizes, min_time=1.0, min_pages=3) -> dict:
+    """Все случаи по очереди, каждый в свежем процессе"""
+    inputs = build_inputs(sizes)
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    for parser_key in parsers:
+        for input_name, html in inputs.items():
+            for engine in engines:
+                for strategy in strategies:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        result = executor.submit(
+                            run_case, parser_key, input_name, html, engine, strategy, min_time, min_pages
+                        ).result()
+                    results.append(result)
+                    print(f"📊 {parser_key:<12} {input_name:<15} {engine:<11} {strategy:<8} "
+                          f"{result['pages_per_sec']:>8.1f} стр/сек {result['products_per_sec']:>9.0f} тов/сек "
+                          f"RSS {result['peak_rss_kb'] / 1024:>6.1f} МБ "
+                          f"alloc {result['alloc_peak_kb_per_page'] / 1024:>6.1f} МБ/стр")
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'min_time': min_time, 'min_pages': min_pages},
+        'results': results,
+    }
+
+
+def compare_reports(old: dict, new: dict):
+    """Изменение скорости и памяти относительно прошлого отчета"""
+    previous = {case_key(r): r for r in old.get('results', [])}
+
+    print(f"\n🔁 Сравнение с отчетом от {old.get('generated_at')}")
+    for result in new['results']:
+        before = previous.get(case_key(result))
+        if not before:
+            continue
+
+        speed = (result['pages_per_sec'] / before['pages_per_sec'] - 1) * 100 if before['pages_per_sec'] else 0
+        memory = (result['alloc_peak_kb_per_page'] / before['alloc_peak_kb_per_page'] - 1) * 100 \
+            if before['alloc_peak_kb_per_page'] else 0
+        mark = '🟢' if speed >= 5 else '🔴' if speed <= -5 else '⚪'
+        print(f"{mark} {' / '.join(case_key(result))}: скорость {speed:+.1f}%, память {memory:+.1f}%")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Бенчмарк разбора страниц парсерами")
+    arg_parser.add_argument('--parser', action='append', choices=sorted(PARSERS),
+                            help="парсер (можно несколько), по умолчанию все")
+    arg_parser.add_argument('--engine', action='append', choices=ENGINES, help="движок, по умолчанию все установленные")
+    arg_parser.add_argument('--strategy', action='append', choices=STRATEGIES, help="стратегия, по умолчанию все")
+    arg_parser.add_argument('--sizes', type=int, nargs='*', default=SYNTHETIC_SIZES,
+                            help="размеры синтетических каталогов")
+    arg_parser.add_argument('--min-time', type=float, default=1.0, help="минимальное время замера случая, сек")
+    arg_parser.add_argument('--output', help="файл отчета, по умолчанию data/benchmarks/parsers-<время>.json")
+    arg_parser.add_argument('--compare', metavar='REPORT', help="прошлый отчет для сравнения")
+    args = arg_parser.parse_args()
+
+    engines = [e for e in (args.engine or ENGINES) if e in available_engines()]
+
+    print("🚀 Бенчмарк парсеров")
+    print("=" * 50)
+
+    report = run_benchmarks(
+        parsers=args.parser or list(PARSERS),
+        engines=engines,
+        strategies=args.strategy or STRATEGIES,
+        sizes=args.sizes,
+        min_time=args.min_time,
+    )
+
+    output = args.output or os.path.join('data', 'benchmarks', f"parsers-{datetime.now():%Y%m%d-%H%M%S}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Отчет сохранен в {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_reports(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
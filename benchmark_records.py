@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк записей товаров: словари против записей со __slots__.
+
+На синтетических строках курсора в порядке CompetitorProduct.columns()
+меряет время сборки товаров (dict(zip(колонки, строка)) против
+CompetitorProduct.from_rows), время прохода по ценам (product['price']
+против product.price) и память на товар по tracemalloc.
+
+    python benchmark_records.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(__file__))
+
+from database.records import CompetitorProduct
+
+SIZES = [1000, 10000, 100000]
+COMPETITORS = ['StrikePlanet', 'Airsoft-Rus']
+
+
+def build_rows(count: int) -> list:
+    """Строки как из курсора MySQL: Decimal цены, datetime, 0/1 наличия"""
+    now = datetime.now()
+    template = {
+        'old_price': None,
+        'in_stock': 1,
+        'package': '1 кг',
+        # Вес упаковки, а не количество: шаров и цены за 1000 нет
+        'bb_count': None,
+        'price_per_1000': None,
+        'category': 'shary',
+        'created_at': now,
+        'last_updated': now,
+        'last_seen': now,
+    }
+    rows = []
+    for i in range(count):
+        values = dict(
+            template,
+            id=i + 1,
+            name=f"Шары 0.{20 + i % 10}г {i}",
+            price=Decimal(f"{500 + i % 700}.00"),
+            weight=f"0.{20 + i % 10}г",
+            weight_g=Decimal(f"0.{20 + i % 10}0"),
+            competitor=COMPETITORS[i % len(COMPETITORS)],
+            url=f"https://example.com/catalog/item-{i}/",
+        )
+        rows.append(tuple(values[field] for field in CompetitorProduct.fields))
+    return rows
+
+
+def as_dicts(rows: list) -> list:
+    columns = CompetitorProduct.fields
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def as_records(rows: list) -> list:
+    return CompetitorProduct.from_rows(rows)
+
+
+def memory_per_product(build, rows: list) -> float:
+    """Байт на товар: выделенная при сборке память без самих строк"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    products = build(rows)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del products
+    return (after - before) / len(rows)
+
+
+def best_time(func, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def run_case(count: int, repeat: int) -> dict:
+    rows = build_rows(count)
+    dicts, records = as_dicts(rows), as_records(rows)
+    return {
+        'count': count,
+        'build_dict': best_time(lambda: as_dicts(rows), repeat),
+        'build_record': best_time(lambda: as_records(rows), repeat),
+        'scan_dict': best_time(lambda: sum(p['price'] for p in dicts), repeat),
+        'scan_record': best_time(lambda: sum(p.price for p in records), repeat),
+        'bytes_dict': memory_per_product(as_dicts, rows),
+        'bytes_record': memory_per_product(as_records, rows),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Бенчмарк записей товаров")
+    arg_parser.add_argument('--sizes', type=int, nargs='*', default=SIZES, help="количество товаров")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="повторов замера, берется лучший")
+    args = arg_parser.parse_args()
+
+    print("🚀 Бенчмарк записей товаров: dict против __slots__")
+    print("=" * 50)
+
+    for count in args.sizes:
+        result = run_case(count, args.repeat)
+        print(f"\n📦 Товаров: {count}")
+        print(f"   🔨 Сборка:  dict {result['build_dict'] * 1000:>8.2f} мс | "
+              f"запись {result['build_record'] * 1000:>8.2f} мс "
+              f"(x{result['build_dict'] / result['build_record']:.2f})")
+        print(f"   🔍 Проход:  dict {result['scan_dict'] * 1000:>8.2f} мс | "
+              f"запись {result['scan_record'] * 1000:>8.2f} мс "
+              f"(x{result['scan_dict'] / result['scan_record']:.2f})")
+        print(f"   💾 Память:  dict {result['bytes_dict']:>8.0f} Б   | "
+              f"запись {result['bytes_record']:>8.0f} Б "
+              f"(x{result['bytes_dict'] / result['bytes_record']:.2f})")
+
+
+if __name__ == "__main__":
+    main()
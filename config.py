@@ -17,6 +17,23 @@ except ImportError:
     logging.error("❌ Файл key/key.py не найден! Создайте его на основе key/example_key.py")
     raise
 
+try:
+    from key.key import HTTP_CONFIG
+except ImportError:
+    # Необязательная настройка, в старых key.py ее нет
+    HTTP_CONFIG = {}
+
+try:
+    from key.key import QUEUE_CONFIG
+except ImportError:
+    # Без очереди бот парсит сайты сам
+    QUEUE_CONFIG = {}
+
+try:
+    from key.key import PIPELINE_CONFIG
+except ImportError:
+    PIPELINE_CONFIG = {}
+
 
 class Config:
     """Конфигурация бота"""
@@ -44,6 +61,15 @@ class Config:
     if 'vk' in PARSERS_CONFIG:
         PARSERS_CONFIG['vk']['access_token'] = VK_ACCESS_TOKEN
 
+    # Пулы HTTP соединений парсеров (см. parsers/http_clients.py)
+    HTTP_CONFIG = dict(HTTP_CONFIG)
+
+    # Очередь задач парсинга для воркеров (см. database/job_queue.py и worker.py)
+    QUEUE_CONFIG = dict(QUEUE_CONFIG)
+
+    # Стадии конвейера обновления цен (см. utils/pipeline.py)
+    PIPELINE_CONFIG = dict(PIPELINE_CONFIG)
+
     # Настройки администраторов
     ADMIN_IDS = ADMIN_IDS
 
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые обновляет upsert существующего товара; изменение других полей запись не вызывает
+FINGERPRINT_FIELDS = ('name', 'price', 'old_price', 'in_stock', 'category', 'weight', 'package', 'weight_g', 'bb_count')
+
+
+def product_key(source: str, product: Dict):
+    """Ключ товара в таблице: VK ID для наших товаров, URL для конкурентов"""
+    return product.get('vk_product_id') if source == 'vk' else product.get('url')
+
+
+def _canonical(field: str, value) -> str:
+    """Одинаковое представление значения из парсера и из базы (Decimal, 0/1)"""
+    if value is None:
+        return ''
+    if field == 'in_stock':
+        return '1' if int(value) else '0'
+    if field in ('price', 'old_price'):
+        return f"{float(value):.2f}"
+    if field == 'weight_g':
+        return f"{float(value):.3f}"
+    return str(value)
+
+
+def fingerprint(product: Dict) -> int:
+    """64-битный отпечаток записываемых полей товара"""
+    values = dict(product)
+    values.setdefault('in_stock', True)
+    raw = '\x1f'.join(_canonical(field, values.get(field)) for field in FINGERPRINT_FIELDS)
+    return int.from_bytes(hashlib.blake2b(raw.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class ProductIndex:
+    """Отпечатки сохраненных товаров по источникам: ключ -> (отпечаток, цена).
+
+    Загружается из базы один раз; новый результат парсинга сравнивается с
+    ним, и в MySQL уходят только новые и изменившиеся товары. Здесь же
+    отслеживаются товары, пропавшие из каталога (reconcile).
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Dict[object, Tuple[int, Optional[float]]]] = {}
+        # Раздел каталога товара (None - без раздела)
+        self._categories: Dict[str, Dict[object, Optional[str]]] = {}
+        # Товары не в наличии по данным базы
+        self._gone: Dict[str, Set] = {}
+        # Пропавшие в последних обходах: ключ -> [время последнего появления, обходов без товара]
+        self._missing: Dict[str, Dict[object, list]] = {}
+        # Время последнего полного обхода (источник, раздел)
+        self._crawled_at: Dict[Tuple[str, Optional[str]], float] = {}
+
+    def is_loaded(self, source: str) -> bool:
+        return source in self._sources
+
+    def size(self, source: str) -> int:
+        return len(self._sources.get(source, {}))
+
+    def load(self, source: str, rows: Iterable[Dict]):
+        """Отпечатки товаров источника из строк базы"""
+        entries, categories = {}, {}
+        gone = set()
+        for row in rows:
+            key = product_key(source, row)
+            if key is not None:
+                price = float(row['price']) if row.get('price') is not None else None
+                entries[key] = (fingerprint(row), price)
+                categories[key] = row.get('category')
+                if not row.get('in_stock', True):
+                    gone.add(key)
+        self._sources[source] = entries
+        self._categories[source] = categories
+        self._gone[source] = gone
+        logger.info(f"🧬 {source}: загружено отпечатков товаров: {len(entries)}")
+
+    def diff(self, source: str, products: List[Dict]) -> Dict:
+        """Разница с сохраненным: новые, изменившиеся (из них - с новой ценой), без изменений"""
+        entries = self._sources.get(source, {})
+        inserts, updates = [], []
+        price_changes = unchanged = 0
+
+        for product in products:
+            key = product_key(source, product)
+            known = entries.get(key)
+            if known is None:
+                inserts.append(product)
+            elif known[0] != fingerprint(product):
+                updates.append(product)
+                if known[1] is None or known[1] != round(float(product['price']), 2):
+                    price_changes += 1
+            else:
+                unchanged += 1
+
+        return {'inserts': inserts, 'updates': updates, 'price_changes': price_changes, 'unchanged': unchanged}
+
+    def apply(self, source: str, products: Iterable[Dict]):
+        """Записанные в базу товары"""
+        entries = self._sources.setdefault(source, {})
+        categories = self._categories.setdefault(source, {})
+        gone = self._gone.setdefault(source, set())
+        for product in products:
+            key = product_key(source, product)
+            if key is not None:
+                entries[key] = (fingerprint(product), round(float(product['price']), 2))
+                categories[key] = product.get('category')
+                if product.get('in_stock', True):
+                    gone.discard(key)
+                else:
+                    gone.add(key)
+
+    def category(self, source: str, key) -> Optional[str]:
+        """Раздел сохраненного товара"""
+        return self._categories.get(source, {}).get(key)
+
+    def _keys(self, source: str, categories: Set = None) -> Set:
+        """Ключи товаров источника; categories - только из этих разделов"""
+        if categories is None:
+            return set(self._sources.get(source, {}))
+        return {key for key, category in self._categories.get(source, {}).items() if category in categories}
+
+    def missing(self, source: str, seen: Set, categories: Set = None) -> Set:
+        """Сохраненные товары источника (разделов), которых нет в новом результате"""
+        return self._keys(source, categories) - seen
+
+    def reconcile(self, source: str, seen: Set, runs: int, grace: float, now: float = None,
+                  categories: Set = None) -> Dict[float, List]:
+        """Полный обход источника или разделов: пропавшие товары, которые пора пометить отсутствующими.
+
+        Товар помечается, если его нет runs обходов подряд и с последнего
+        появления прошло не меньше grace секунд - один неудачный обход
+        товары не скрывает. Результат: {время последнего появления: ключи}.
+        """
+        now = now or time.time()
+        item_categories = self._categories.get(source, {})
+        # После перезапуска время прошлого обхода неизвестно - отсчет с текущего
+        previous = {}
+        for category in (categories if categories is not None else {None}):
+            previous[category] = self._crawled_at.get((source, category), now)
+            self._crawled_at[(source, category)] = now
+
+        candidates = self._keys(source, categories) - seen - self._gone.get(source, set())
+        missing = self._missing.setdefault(source, {})
+        for key in list(missing):
+            # Товары других разделов этот обход не проверял
+            if key not in candidates and (categories is None or item_categories.get(key) in categories):
+                del missing[key]
+
+        vanished = {}
+        for key in candidates:
+            crawled = previous[item_categories.get(key) if categories is not None else None]
+            state = missing.setdefault(key, [crawled, 0])
+            state[1] += 1
+            if state[1] >= runs and now - state[0] >= grace:
+                vanished.setdefault(state[0], []).append(key)
+        return vanished
+
+    def mark_gone(self, source: str, keys: Iterable):
+        """Товары помечены в базе как отсутствующие"""
+        entries = self._sources.get(source, {})
+        gone = self._gone.setdefault(source, set())
+        missing = self._missing.get(source, {})
+        for key in keys:
+            gone.add(key)
+            missing.pop(key, None)
+            if key in entries:
+                # Отпечаток с in_stock = TRUE больше не совпадет: вернувшийся товар запишется заново
+                entries[key] = (0, entries[key][1])
+
+    def forget(self, source: str):
+        """Сброс источника: при следующем обновлении отпечатки загрузятся заново"""
+        self._sources.pop(source, None)
+        self._categories.pop(source, None)
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from .models import Database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # Время, на которое воркер захватывает задачу; продлевается, пока он работает
+    'lease_seconds': 300,
+    # Попыток на задачу, после чего она помечается failed
+    'max_attempts': 5,
+    # Задержка перед повтором упавшей задачи, растет вдвое с каждой попыткой
+    'retry_delay': 60,
+    # Как часто воркер проверяет очередь и бот - состояние своих задач, сек
+    'poll_interval': 5,
+    # Сколько бот ждет результата поставленной задачи, сек
+    'wait_timeout': 900,
+}
+
+ACTIVE_STATES = ('pending', 'running')
+
+
+class ScrapeJobQueue:
+    """Очередь задач парсинга в таблице scrape_jobs.
+
+    Бот ставит задачи (источник + страница), воркеры (worker.py) забирают
+    их через SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько воркеров
+    на разных машинах не получают одну задачу. Задача захватывается на
+    время lease; если воркер упал, после истечения lease ее заберет другой.
+    """
+
+    def __init__(self, settings: Dict = None):
+        self.db = Database()
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+
+    def enqueue(self, source: str, page: str, trigger: str = None) -> int:
+        """Постановка задачи; если такая уже ждет или выполняется, возвращается ее id"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            # Уникальный active_key не дает двум ботам поставить дубль активной задачи;
+            # LAST_INSERT_ID(id) возвращает id уже существующей
+            cursor.execute(
+                """
+                INSERT INTO scrape_jobs (source, page, trigger_name) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+                """,
+                (source, page, trigger)
+            )
+            job_id = cursor.lastrowid
+            created = cursor.rowcount == 1
+            conn.commit()
+            if created:
+                logger.info(f"📥 Задача #{job_id} поставлена: {source} {page}")
+            return job_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def enqueue_many(self, source: str, pages: List[str], trigger: str = None) -> List[int]:
+        """Задачи на несколько страниц источника"""
+        return [self.enqueue(source, page, trigger) for page in pages]
+
+    def claim(self, worker_id: str, sources: List[str] = None) -> Optional[Dict]:
+        """Захват следующей задачи: ожидающей или брошенной упавшим воркером"""
+        source_filter = ''
+        params = []
+        if sources:
+            source_filter = f"AND source IN ({', '.join(['%s'] * len(sources))})"
+            params.extend(sources)
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # Задачи, снятые по числу попыток, пропускаются - захватывается следующая
+            while True:
+                conn.start_transaction()
+                cursor.execute(
+                    f"""
+                    SELECT id, source, page, attempts, trigger_name FROM scrape_jobs
+                    WHERE ((state = 'pending' AND run_after <= NOW())
+                           OR (state = 'running' AND lease_expires_at < NOW()))
+                    {source_filter}
+                    ORDER BY run_after, id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    tuple(params)
+                )
+                job = cursor.fetchone()
+                if not job:
+                    conn.commit()
+                    return None
+
+                if job['attempts'] < self.settings['max_attempts']:
+                    break
+
+                # Воркеры падали на этой задаче слишком часто
+                cursor.execute(
+                    "UPDATE scrape_jobs SET state = 'failed', lease_expires_at = NULL, finished_at = NOW(), "
+                    "error = COALESCE(error, 'воркер не завершил задачу') WHERE id = %s",
+                    (job['id'],)
+                )
+                conn.commit()
+                logger.warning(f"❌ Задача #{job['id']} ({job['source']}) снята после {job['attempts']} попыток")
+
+            cursor.execute(
+                """
+                UPDATE scrape_jobs
+                SET state = 'running', attempts = attempts + 1, worker_id = %s,
+                    started_at = NOW(), lease_expires_at = NOW() + INTERVAL %s SECOND
+                WHERE id = %s
+                """,
+                (worker_id, self.settings['lease_seconds'], job['id'])
+            )
+            conn.commit()
+            job['attempts'] += 1
+            return job
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def extend_lease(self, job_id: int, worker_id: str) -> bool:
+        """Продление захвата задачи; False - задачу уже забрал другой воркер"""
+        return self._update_owned(
+            "UPDATE scrape_jobs SET lease_expires_at = NOW() + INTERVAL %s SECOND "
+            "WHERE id = %s AND worker_id = %s AND state = 'running'",
+            (self.settings['lease_seconds'], job_id, worker_id)
+        )
+
+    def complete(self, job_id: int, worker_id: str, result_count: int, changed_count: Optional[int]) -> bool:
+        """Задача выполнена"""
+        return self._update_owned(
+            """
+            UPDATE scrape_jobs
+            SET state = 'done', lease_expires_at = NULL, finished_at = NOW(),
+                result_count = %s, changed_count = %s, error = NULL
+            WHERE id = %s AND worker_id = %s AND state = 'running'
+            """,
+            (result_count, changed_count, job_id, worker_id)
+        )
+
+    def fail(self, job_id: int, worker_id: str, attempts: int, error: str) -> bool:
+        """Неудачная попытка: повтор позже или failed, если попытки кончились"""
+        if attempts >= self.settings['max_attempts']:
+            return self._update_owned(
+                """
+                UPDATE scrape_jobs
+                SET state = 'failed', lease_expires_at = NULL, finished_at = NOW(), error = %s
+                WHERE id = %s AND worker_id = %s AND state = 'running'
+                """,
+                (error[:1000], job_id, worker_id)
+            )
+
+        delay = self.settings['retry_delay'] * 2 ** (attempts - 1)
+        return self._update_owned(
+            """
+            UPDATE scrape_jobs
+            SET state = 'pending', lease_expires_at = NULL, error = %s,
+                run_after = NOW() + INTERVAL %s SECOND
+            WHERE id = %s AND worker_id = %s AND state = 'running'
+            """,
+            (error[:1000], delay, job_id, worker_id)
+        )
+
+    def _update_owned(self, query: str, params: tuple) -> bool:
+        """UPDATE задачи, которую держит этот воркер"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_jobs(self, job_ids: List[int]) -> Dict[int, Dict]:
+        """Состояние задач по id"""
+        if not job_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(job_ids))
+        rows = self.db.execute_query(
+            f"""
+            SELECT id, source, page, state, attempts, worker_id, result_count, changed_count, error
+            FROM scrape_jobs WHERE id IN ({placeholders})
+            """,
+            tuple(job_ids),
+            fetch=True
+        )
+        return {row['id']: row for row in rows}
+
+    async def wait(self, job_ids: List[int], timeout: float = None) -> Dict[int, Dict]:
+        """Ожидание завершения задач (done/failed) или таймаута"""
+        deadline = time.monotonic() + (timeout or self.settings['wait_timeout'])
+        loop = asyncio.get_running_loop()
+        while True:
+            # Запрос к MySQL - в пуле потоков, чтобы не задерживать обработчики бота
+            jobs = await loop.run_in_executor(None, self.get_jobs, job_ids)
+            if all(job['state'] not in ACTIVE_STATES for job in jobs.values()) or time.monotonic() >= deadline:
+                return jobs
+            await asyncio.sleep(self.settings['poll_interval'])
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Число активных задач по источникам и состояниям"""
+        rows = self.db.execute_query(
+            """
+            SELECT source, state, COUNT(*) AS jobs FROM scrape_jobs
+            WHERE state IN ('pending', 'running') GROUP BY source, state
+            """,
+            fetch=True
+        )
+        result = {}
+        for row in rows:
+            result.setdefault(row['source'], {})[row['state']] = row['jobs']
+        return result
+
+    def purge(self, days: int = 7) -> None:
+        """Удаление завершенных задач старше days дней"""
+        self.db.execute_query(
+            "DELETE FROM scrape_jobs WHERE state IN ('done', 'failed') AND finished_at < NOW() - INTERVAL %s DAY",
+            (days,)
+        )
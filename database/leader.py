@@ -0,0 +1,126 @@
+"""
+Выбор лидера среди копий бота через MySQL GET_LOCK.
+
+Блокировка живет, пока открыто соединение, которое ее взяло: если
+процесс лидера падает или теряет связь с базой, MySQL освобождает ее
+сам, и следующая проверка на другой копии забирает лидерство.
+
+Проверка на двух процессах с одной базой:
+    python -m database.leader      # в двух терминалах; остановите лидера (Ctrl+C)
+"""
+
+import logging
+import os
+import socket
+import time
+from typing import Optional
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """Именованная блокировка MySQL, которую держит одна копия бота"""
+
+    def __init__(self, db, name: str = None):
+        self.db = db
+        # Имена GET_LOCK общие для всего сервера MySQL, поэтому добавляем имя базы
+        self.name = name or f"{db.config.get('database', 'airsoft_bot')}:scheduler"
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._conn = None
+        self.is_leader = False
+        self.leader_since: Optional[float] = None
+
+    def _query(self, query: str, params: tuple = ()):
+        """Запрос на собственном соединении блокировки"""
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            cursor.close()
+
+    def _holds_lock(self) -> bool:
+        """Наше соединение живо и блокировка все еще у него"""
+        if self._conn is None:
+            return False
+        try:
+            return self._query("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (self.name,)) == 1
+        except mysql.connector.Error as e:
+            logger.warning(f"Соединение блокировки лидера потеряно: {e}")
+            self._close()
+            return False
+
+    def check(self) -> bool:
+        """Подтверждение или захват лидерства; вызывается периодически (heartbeat)"""
+        if self._holds_lock():
+            return True
+
+        was_leader = self.is_leader
+        try:
+            if self._conn is None:
+                self._conn = self.db.get_connection()
+            # Таймаут 0: не ждем, если блокировку держит другая копия
+            acquired = self._query("SELECT GET_LOCK(%s, 0)", (self.name,)) == 1
+        except mysql.connector.Error as e:
+            logger.warning(f"Не удалось проверить лидерство: {e}")
+            self._close()
+            acquired = False
+
+        if acquired and not was_leader:
+            self.leader_since = time.time()
+            logger.info(f"👑 {self.node_id}: стал лидером, запускаю обновления по расписанию")
+        elif was_leader and not acquired:
+            self.leader_since = None
+            logger.warning(f"👑 {self.node_id}: лидерство потеряно, обновления по расписанию остановлены")
+
+        self.is_leader = acquired
+        return acquired
+
+    def current_holder(self) -> Optional[int]:
+        """ID соединения MySQL, которое держит блокировку"""
+        try:
+            if self._conn is None:
+                self._conn = self.db.get_connection()
+            return self._query("SELECT IS_USED_LOCK(%s)", (self.name,))
+        except mysql.connector.Error:
+            self._close()
+            return None
+
+    def release(self):
+        """Освобождение лидерства (при остановке бота)"""
+        if self._conn is not None and self.is_leader:
+            try:
+                self._query("SELECT RELEASE_LOCK(%s)", (self.name,))
+                logger.info(f"👑 {self.node_id}: лидерство освобождено")
+            except mysql.connector.Error:
+                pass
+        self.is_leader = False
+        self.leader_since = None
+        self._close()
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except mysql.connector.Error:
+                pass
+            self._conn = None
+
+
+if __name__ == "__main__":
+    from database.models import Database
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    lock = LeaderLock(Database())
+    print(f"🚀 Узел {lock.node_id}, блокировка {lock.name}")
+
+    try:
+        while True:
+            leader = lock.check()
+            print(f"{'👑 лидер' if leader else '⏳ ожидает'} (держит соединение {lock.current_holder()})")
+            time.sleep(5)
+    except KeyboardInterrupt:
+        lock.release()
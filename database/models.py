@@ -1,8 +1,35 @@
 import mysql.connector
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from config import get_config
 
+# Изменения схемы для существующих баз; повторное применение пропускается
+MIGRATIONS = [
+    "ALTER TABLE competitor_products ADD COLUMN last_seen TIMESTAMP NULL AFTER package",
+    "ALTER TABLE our_products ADD COLUMN last_seen TIMESTAMP NULL AFTER vk_product_id",
+    "ALTER TABLE competitor_products ADD INDEX idx_competitor_stock (competitor, in_stock)",
+    "ALTER TABLE competitor_products ADD COLUMN category VARCHAR(100) AFTER competitor",
+    "ALTER TABLE competitor_products ADD INDEX idx_competitor_category (competitor, category)",
+    "ALTER TABLE competitor_products ADD COLUMN weight_g DECIMAL(6,3) AFTER package",
+    "ALTER TABLE competitor_products ADD COLUMN bb_count INT AFTER weight_g",
+    "ALTER TABLE competitor_products ADD COLUMN price_per_1000 DECIMAL(10,2) AFTER bb_count",
+    "ALTER TABLE competitor_products ADD INDEX idx_weight_price (weight_g, price_per_1000)",
+    "ALTER TABLE our_products ADD COLUMN weight_g DECIMAL(6,3) AFTER package",
+    "ALTER TABLE our_products ADD COLUMN bb_count INT AFTER weight_g",
+    "ALTER TABLE our_products ADD COLUMN price_per_1000 DECIMAL(10,2) AFTER bb_count",
+    "ALTER TABLE our_products ADD INDEX idx_weight_price (weight_g, price_per_1000)",
+    # Одна активная задача на страницу: старые дубли снимаются до уникального ключа
+    """
+    UPDATE scrape_jobs j JOIN scrape_jobs d
+        ON d.source = j.source AND d.page = j.page AND d.id < j.id AND d.state IN ('pending', 'running')
+    SET j.state = 'failed', j.lease_expires_at = NULL, j.finished_at = NOW(), j.error = 'дубль активной задачи'
+    WHERE j.state IN ('pending', 'running')
+    """,
+    "ALTER TABLE scrape_jobs ADD COLUMN active_key CHAR(32) AS "
+    "(IF(state IN ('pending', 'running'), MD5(CONCAT(source, ' ', page)), NULL)) STORED",
+    "ALTER TABLE scrape_jobs ADD UNIQUE KEY uq_active_job (active_key)",
+]
+
 
 class Database:
     _instance = None
@@ -26,6 +53,7 @@ class Database:
         try:
             self.create_database()
             self.create_tables()
+            self.migrate()
             self.insert_default_data()
             print("✅ База данных полностью инициализирована")
         except Exception as e:
@@ -60,9 +88,23 @@ class Database:
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     name VARCHAR(500) NOT NULL,
                     price DECIMAL(10,2),
+                    old_price DECIMAL(10,2),
                     competitor VARCHAR(100) NOT NULL,
-                    url VARCHAR(1000),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    category VARCHAR(100),
+                    url VARCHAR(700),
+                    in_stock BOOLEAN DEFAULT TRUE,
+                    weight VARCHAR(50),
+                    package VARCHAR(100),
+                    weight_g DECIMAL(6,3),
+                    bb_count INT,
+                    price_per_1000 DECIMAL(10,2),
+                    last_seen TIMESTAMP NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uq_competitor_url (url),
+                    INDEX idx_competitor_stock (competitor, in_stock),
+                    INDEX idx_competitor_category (competitor, category),
+                    INDEX idx_weight_price (weight_g, price_per_1000)
                 )
             ''',
             'our_products': '''
@@ -70,8 +112,40 @@ class Database:
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     name VARCHAR(500) NOT NULL,
                     price DECIMAL(10,2),
+                    old_price DECIMAL(10,2),
                     vk_url VARCHAR(1000),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    vk_photo_url VARCHAR(1000),
+                    description TEXT,
+                    in_stock BOOLEAN DEFAULT TRUE,
+                    weight VARCHAR(50),
+                    package VARCHAR(100),
+                    weight_g DECIMAL(6,3),
+                    bb_count INT,
+                    price_per_1000 DECIMAL(10,2),
+                    vk_product_id BIGINT,
+                    last_seen TIMESTAMP NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uq_vk_product (vk_product_id),
+                    INDEX idx_weight_price (weight_g, price_per_1000)
+                )
+            ''',
+            'price_history': '''
+                CREATE TABLE IF NOT EXISTS price_history (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    product_id INT NOT NULL,
+                    product_type VARCHAR(20) NOT NULL,
+                    price DECIMAL(10,2),
+                    change_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    INDEX idx_change_date (change_date),
+                    INDEX idx_product (product_type, product_id)
+                )
+            ''',
+            'settings': '''
+                CREATE TABLE IF NOT EXISTS settings (
+                    setting_key VARCHAR(100) PRIMARY KEY,
+                    setting_value TEXT,
+                    description VARCHAR(255)
                 )
             ''',
             'admins': '''
@@ -79,8 +153,48 @@ class Database:
                     id INT AUTO_INCREMENT PRIMARY KEY,
                     user_id BIGINT NOT NULL UNIQUE,
                     username VARCHAR(100),
+                    full_name VARCHAR(200),
+                    permissions TEXT,
+                    is_active BOOLEAN DEFAULT TRUE,
+                    last_login TIMESTAMP NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
+            ''',
+            'scrape_jobs': '''
+                CREATE TABLE IF NOT EXISTS scrape_jobs (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    source VARCHAR(50) NOT NULL,
+                    page VARCHAR(700) NOT NULL,
+                    state ENUM('pending', 'running', 'done', 'failed') NOT NULL DEFAULT 'pending',
+                    attempts INT NOT NULL DEFAULT 0,
+                    trigger_name VARCHAR(100),
+                    worker_id VARCHAR(200),
+                    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    lease_expires_at TIMESTAMP NULL,
+                    started_at TIMESTAMP NULL,
+                    finished_at TIMESTAMP NULL,
+                    result_count INT,
+                    changed_count INT,
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    active_key CHAR(32) AS
+                        (IF(state IN ('pending', 'running'), MD5(CONCAT(source, ' ', page)), NULL)) STORED,
+                    UNIQUE KEY uq_active_job (active_key),
+                    INDEX idx_claim (state, run_after),
+                    INDEX idx_lease (state, lease_expires_at),
+                    INDEX idx_page (source, page(191), state)
+                )
+            ''',
+            'sitemap_urls': '''
+                CREATE TABLE IF NOT EXISTS sitemap_urls (
+                    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                    source VARCHAR(50) NOT NULL,
+                    url VARCHAR(700) NOT NULL,
+                    lastmod DATETIME NULL,
+                    checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    UNIQUE KEY uq_sitemap_url (url),
+                    INDEX idx_sitemap_source (source)
+                )
             '''
         }
 
@@ -98,6 +212,25 @@ class Database:
             print(f"❌ Ошибка создания таблиц: {e}")
             raise
 
+    def migrate(self):
+        """Новые колонки и индексы в базах, созданных прошлыми версиями"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            for sql in MIGRATIONS:
+                try:
+                    cursor.execute(sql)
+                except mysql.connector.Error as e:
+                    # 1060 - колонка уже есть, 1061 - индекс уже есть
+                    if e.errno not in (1060, 1061):
+                        raise
+            conn.commit()
+            print("✅ Схема базы обновлена")
+        finally:
+            cursor.close()
+            conn.close()
+
     def insert_default_data(self):
         """Только самые необходимые начальные данные"""
         try:
@@ -123,10 +256,6 @@ class Database:
         """Получение соединения с базой данных"""
         return mysql.connector.connect(**self.config)
 
-    def get_connection(self):
-        """Получение соединения с базой данных"""
-        return mysql.connector.connect(**self.config)
-
     def execute_query(self, query: str, params: tuple = None, fetch: bool = False):
         """Универсальный метод выполнения запросов"""
         conn = self.get_connection()
@@ -149,6 +278,38 @@ class Database:
             cursor.close()
             conn.close()
 
+    def fetch_records(self, record, query: str, params: tuple = None) -> list:
+        """SELECT {columns} ... в записи record (см. records): строки-кортежи без словарей"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(query.format(columns=record.columns()), params or ())
+            return record.from_rows(cursor.fetchall())
+        finally:
+            cursor.close()
+            conn.close()
+
+    def execute_batch(self, statements: List[Tuple[str, List[tuple]]]) -> int:
+        """Пакетное выполнение (executemany) нескольких запросов в одной транзакции"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        affected = 0
+
+        try:
+            for query, rows in statements:
+                if rows:
+                    cursor.executemany(query, rows)
+                    affected += cursor.rowcount
+            conn.commit()
+            return affected
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            cursor.close()
+            conn.close()
+
     def get_setting(self, key: str) -> str:
         """Получение значения настройки"""
         result = self.execute_query(
@@ -1,5 +1,6 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from .models import Database
+from .records import CompetitorProduct, OurProduct, Product
 from datetime import datetime, timedelta
 
 
@@ -7,16 +8,25 @@ class ProductOperations:
     def __init__(self):
         self.db = Database()
 
-    def add_competitor_product(self, product_data: Dict) -> int:
+    def add_competitor_product(self, product_data: Union[Dict, CompetitorProduct]) -> int:
         """Добавление товара конкурента"""
+        product_data = self.measured(product_data, CompetitorProduct)
         query = """
             INSERT INTO competitor_products 
-            (name, price, old_price, competitor, url, in_stock, weight, package)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            (name, price, old_price, competitor, category, url, in_stock, weight, package,
+             weight_g, bb_count, price_per_1000)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             ON DUPLICATE KEY UPDATE
+            category = COALESCE(VALUES(category), category),
+            name = VALUES(name),
             price = VALUES(price),
             old_price = VALUES(old_price),
             in_stock = VALUES(in_stock),
+            weight = VALUES(weight),
+            package = VALUES(package),
+            weight_g = VALUES(weight_g),
+            bb_count = VALUES(bb_count),
+            price_per_1000 = VALUES(price_per_1000),
             last_updated = CURRENT_TIMESTAMP
         """
 
@@ -32,47 +42,279 @@ class ProductOperations:
                 product_data['price'],
                 product_data.get('old_price'),
                 product_data['competitor'],
+                product_data.get('category'),
                 product_data['url'],
                 product_data.get('in_stock', True),
                 product_data.get('weight'),
-                product_data.get('package')
+                product_data.get('package'),
+                product_data.weight_g,
+                product_data.bb_count,
+                product_data.price_per_1000
             )
         )
 
-    def get_competitor_product_by_url(self, url: str) -> Optional[Dict]:
-        """Получение товара конкурента по URL"""
-        result = self.db.execute_query(
-            "SELECT * FROM competitor_products WHERE url = %s",
-            (url,),
+    @staticmethod
+    def measured(product_data: Union[Dict, Product], record: type) -> Product:
+        """Запись товара с числовыми весом, количеством и ценой за 1000 шаров из weight и package"""
+        product = product_data if isinstance(product_data, Product) else record.from_dict(product_data)
+        product.measure()
+        return product
+
+    def bulk_upsert_competitor_products(self, products: List[CompetitorProduct], observed_at: datetime = None,
+                                        previous_prices: Dict[str, float] = None,
+                                        update_products: bool = True) -> int:
+        """Пакетное добавление товаров конкурентов с записью истории изменившихся цен.
+
+        observed_at - время, к которому относятся цены (для перепарсинга архива);
+        previous_prices - цены предыдущего наблюдения по URL: история пишется
+        относительно них, а не текущей цены в базе (тоже для перепарсинга);
+        update_products=False - только история, товары в базе не меняются
+        (перепарсинг прошлого окна, после которого есть более новые загрузки).
+        История и обновление товаров пишутся в одной транзакции.
+        """
+        if not products:
+            return 0
+
+        # Если URL встретился несколько раз, побеждает последняя запись
+        by_url = {p.url: p for p in products}
+        existing = self.get_competitor_prices_by_urls(list(by_url))
+        change_date = observed_at or datetime.now()
+
+        if previous_prices is None:
+            previous_prices = {url: row['price'] for url, row in existing.items()}
+
+        history_rows = [
+            (row['id'], 'competitor', previous_prices[url], change_date)
+            for url, row in existing.items()
+            if previous_prices.get(url) is not None
+            and float(previous_prices[url]) != round(float(by_url[url].price), 2)
+        ]
+
+        product_rows = [
+            (
+                p.name,
+                p.price,
+                p.old_price,
+                p.competitor,
+                p.category,
+                p.url,
+                p.in_stock if p.in_stock is not None else True,
+                p.weight,
+                p.package,
+                p.weight_g,
+                p.bb_count,
+                p.price_per_1000
+            )
+            for p in by_url.values()
+        ]
+
+        self.db.execute_batch([
+            (
+                "INSERT INTO price_history (product_id, product_type, price, change_date) VALUES (%s, %s, %s, %s)",
+                history_rows
+            ),
+            (
+                """
+                INSERT INTO competitor_products
+                (name, price, old_price, competitor, category, url, in_stock, weight, package,
+                 weight_g, bb_count, price_per_1000)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                category = COALESCE(VALUES(category), category),
+                name = VALUES(name),
+                price = VALUES(price),
+                old_price = VALUES(old_price),
+                in_stock = VALUES(in_stock),
+                weight = VALUES(weight),
+                package = VALUES(package),
+                weight_g = VALUES(weight_g),
+                bb_count = VALUES(bb_count),
+                price_per_1000 = VALUES(price_per_1000),
+                last_updated = CURRENT_TIMESTAMP
+                """,
+                product_rows if update_products else []
+            ),
+        ])
+
+        return len(product_rows) if update_products else len(history_rows)
+
+    def get_competitor_prices_by_urls(self, urls: List[str], chunk_size: int = 500) -> Dict[str, Dict]:
+        """id и текущие цены товаров конкурентов по списку URL"""
+        result = {}
+        for i in range(0, len(urls), chunk_size):
+            chunk = urls[i:i + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            rows = self.db.execute_query(
+                f"SELECT id, url, price FROM competitor_products WHERE url IN ({placeholders})",
+                tuple(chunk),
+                fetch=True
+            )
+            for row in rows:
+                result[row['url']] = row
+        return result
+
+    def get_competitor_prices_at(self, competitor: str, at: datetime) -> Dict[str, float]:
+        """Цены товаров конкурента на момент at (для перепарсинга архива).
+
+        Цена на момент at - прежняя цена из первой записи истории после at,
+        а без изменений после at - текущая. Товары, добавленные позже at,
+        не возвращаются.
+        """
+        rows = self.db.execute_query(
+            """
+            SELECT p.url, COALESCE((
+                SELECT h.price FROM price_history h
+                WHERE h.product_type = 'competitor' AND h.product_id = p.id AND h.change_date >= %s
+                ORDER BY h.change_date, h.id LIMIT 1
+            ), p.price) AS price
+            FROM competitor_products p
+            WHERE p.competitor = %s AND p.created_at < %s
+            """,
+            (at, competitor, at),
             fetch=True
         )
-        return result[0] if result else None
+        return {row['url']: float(row['price']) for row in rows if row['price'] is not None}
 
-    def get_all_competitor_products(self, competitor: str = None) -> List[Dict]:
-        """Получение всех товаров конкурентов"""
-        if competitor:
-            result = self.db.execute_query(
-                "SELECT * FROM competitor_products WHERE competitor = %s ORDER BY price ASC",
-                (competitor,),
+    def delete_competitor_history(self, competitor: str, since: datetime, until: datetime = None) -> int:
+        """Удаление истории цен конкурента за [since, until) перед ее пересборкой из архива"""
+        query = """
+            DELETE h FROM price_history h
+            JOIN competitor_products p ON p.id = h.product_id
+            WHERE h.product_type = 'competitor' AND p.competitor = %s AND h.change_date >= %s
+        """
+        params = (competitor, since)
+        if until:
+            query += " AND h.change_date < %s"
+            params += (until,)
+        return self.db.execute_batch([(query, [params])])
+
+    def get_our_prices_by_vk_ids(self, vk_ids: List[int], chunk_size: int = 500) -> Dict[int, Dict]:
+        """id и текущие цены наших товаров по списку VK ID"""
+        result = {}
+        for i in range(0, len(vk_ids), chunk_size):
+            chunk = vk_ids[i:i + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            rows = self.db.execute_query(
+                f"SELECT id, vk_product_id, price FROM our_products WHERE vk_product_id IN ({placeholders})",
+                tuple(chunk),
                 fetch=True
             )
-        else:
-            result = self.db.execute_query(
-                "SELECT * FROM competitor_products ORDER BY competitor, price ASC",
+            for row in rows:
+                result[row['vk_product_id']] = row
+        return result
+
+    def get_sitemap_lastmods(self, source: str) -> Dict[str, Optional[datetime]]:
+        """Сохраненные lastmod адресов карты сайта источника"""
+        rows = self.db.execute_query(
+            "SELECT url, lastmod FROM sitemap_urls WHERE source = %s",
+            (source,),
+            fetch=True
+        )
+        return {row['url']: row['lastmod'] for row in rows}
+
+    def save_sitemap_lastmods(self, source: str, entries: List[tuple]) -> int:
+        """Обработанные адреса карты сайта: [(адрес, lastmod)]"""
+        return self.db.execute_batch([(
+            """
+            INSERT INTO sitemap_urls (source, url, lastmod) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE lastmod = VALUES(lastmod), checked_at = CURRENT_TIMESTAMP
+            """,
+            [(source, url, lastmod) for url, lastmod in entries]
+        )])
+
+    def get_source_states(self, source: str, competitor: str = None) -> List[Dict]:
+        """Ключи и обновляемые поля товаров источника (для отпечатков, см. fingerprints)"""
+        if source == 'vk':
+            return self.db.execute_query(
+                "SELECT vk_product_id, name, price, old_price, in_stock, weight, package, weight_g, bb_count "
+                "FROM our_products WHERE vk_product_id IS NOT NULL",
                 fetch=True
             )
-        return result
+        return self.db.execute_query(
+            "SELECT url, name, price, old_price, in_stock, category, weight, package, weight_g, bb_count "
+            "FROM competitor_products WHERE competitor = %s",
+            (competitor,),
+            fetch=True
+        )
+
+    def mark_vanished(self, source: str, keys: List, last_seen: datetime, competitor: str = None) -> int:
+        """Товары, пропавшие из каталога источника, - не в наличии (одним запросом)"""
+        if not keys:
+            return 0
+
+        placeholders = ', '.join(['%s'] * len(keys))
+        if source == 'vk':
+            query = f"""
+                UPDATE our_products SET in_stock = FALSE, last_seen = %s
+                WHERE in_stock = TRUE AND vk_product_id IN ({placeholders})
+            """
+            params = (last_seen, *keys)
+        else:
+            query = f"""
+                UPDATE competitor_products SET in_stock = FALSE, last_seen = %s
+                WHERE competitor = %s AND in_stock = TRUE AND url IN ({placeholders})
+            """
+            params = (last_seen, competitor, *keys)
+
+        return self.db.execute_batch([(query, [params])])
+
+    def save_source_products(self, source: str, products: List[Union[CompetitorProduct, OurProduct]]) -> int:
+        """Пакетное сохранение результата парсинга источника (VK - наши товары, остальные - конкуренты)"""
+        if source == 'vk':
+            return self.bulk_upsert_our_products(products)
+        return self.bulk_upsert_competitor_products(products)
+
+    def get_competitor_product_by_url(self, url: str) -> Optional[CompetitorProduct]:
+        """Получение товара конкурента по URL"""
+        result = self.db.fetch_records(
+            CompetitorProduct,
+            "SELECT {columns} FROM competitor_products WHERE url = %s",
+            (url,)
+        )
+        return result[0] if result else None
 
-    def add_our_product(self, product_data: Dict) -> int:
+    def get_all_competitor_products(self, competitor: str = None) -> List[CompetitorProduct]:
+        """Получение всех товаров конкурентов в наличии"""
+        if competitor:
+            return self.db.fetch_records(
+                CompetitorProduct,
+                "SELECT {columns} FROM competitor_products WHERE competitor = %s AND in_stock = TRUE "
+                "ORDER BY price ASC",
+                (competitor,)
+            )
+        return self.db.fetch_records(
+            CompetitorProduct,
+            "SELECT {columns} FROM competitor_products WHERE in_stock = TRUE ORDER BY competitor, price ASC"
+        )
+
+    def get_cheapest_per_thousand(self, weight_g: float, limit: int = 10) -> List[CompetitorProduct]:
+        """Самые дешевые за 1000 шаров товары конкурентов с весом шара weight_g (по индексу idx_weight_price)"""
+        return self.db.fetch_records(
+            CompetitorProduct,
+            "SELECT {columns} FROM competitor_products "
+            "WHERE weight_g = %s AND price_per_1000 IS NOT NULL AND in_stock = TRUE "
+            "ORDER BY price_per_1000 ASC LIMIT %s",
+            (weight_g, limit)
+        )
+
+    def add_our_product(self, product_data: Union[Dict, OurProduct]) -> int:
         """Добавление нашего товара"""
+        product_data = self.measured(product_data, OurProduct)
         query = """
             INSERT INTO our_products 
-            (name, price, old_price, vk_url, vk_photo_url, description, in_stock, weight, package, vk_product_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            (name, price, old_price, vk_url, vk_photo_url, description, in_stock, weight, package,
+             weight_g, bb_count, price_per_1000, vk_product_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             ON DUPLICATE KEY UPDATE
+            name = VALUES(name),
             price = VALUES(price),
             old_price = VALUES(old_price),
             in_stock = VALUES(in_stock),
+            weight = VALUES(weight),
+            package = VALUES(package),
+            weight_g = VALUES(weight_g),
+            bb_count = VALUES(bb_count),
+            price_per_1000 = VALUES(price_per_1000),
             updated_at = CURRENT_TIMESTAMP
         """
 
@@ -92,27 +334,93 @@ class ProductOperations:
                 product_data.get('in_stock', True),
                 product_data.get('weight'),
                 product_data.get('package'),
+                product_data.weight_g,
+                product_data.bb_count,
+                product_data.price_per_1000,
                 product_data.get('vk_product_id')
             )
         )
 
-    def get_our_product_by_vk_id(self, vk_id: int) -> Optional[Dict]:
+    def bulk_upsert_our_products(self, products: List[OurProduct]) -> int:
+        """Пакетное добавление наших товаров с записью истории изменившихся цен"""
+        by_id = {p.vk_product_id: p for p in products if p.vk_product_id}
+        if not by_id:
+            return 0
+
+        existing = self.get_our_prices_by_vk_ids(list(by_id))
+        change_date = datetime.now()
+
+        history_rows = [
+            (row['id'], 'our', row['price'], change_date)
+            for vk_id, row in existing.items()
+            if row['price'] is not None and float(row['price']) != round(float(by_id[vk_id].price), 2)
+        ]
+
+        product_rows = [
+            (
+                p.name,
+                p.price,
+                p.old_price,
+                p.vk_url,
+                p.vk_photo_url,
+                p.description,
+                p.in_stock if p.in_stock is not None else True,
+                p.weight,
+                p.package,
+                p.weight_g,
+                p.bb_count,
+                p.price_per_1000,
+                p.vk_product_id
+            )
+            for p in by_id.values()
+        ]
+
+        self.db.execute_batch([
+            (
+                "INSERT INTO price_history (product_id, product_type, price, change_date) VALUES (%s, %s, %s, %s)",
+                history_rows
+            ),
+            (
+                """
+                INSERT INTO our_products
+                (name, price, old_price, vk_url, vk_photo_url, description, in_stock, weight, package,
+                 weight_g, bb_count, price_per_1000, vk_product_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                name = VALUES(name),
+                price = VALUES(price),
+                old_price = VALUES(old_price),
+                in_stock = VALUES(in_stock),
+                weight = VALUES(weight),
+                package = VALUES(package),
+                weight_g = VALUES(weight_g),
+                bb_count = VALUES(bb_count),
+                price_per_1000 = VALUES(price_per_1000),
+                updated_at = CURRENT_TIMESTAMP
+                """,
+                product_rows
+            ),
+        ])
+
+        return len(product_rows)
+
+    def get_our_product_by_vk_id(self, vk_id: int) -> Optional[OurProduct]:
         """Получение нашего товара по VK ID"""
         if not vk_id:
             return None
 
-        result = self.db.execute_query(
-            "SELECT * FROM our_products WHERE vk_product_id = %s",
-            (vk_id,),
-            fetch=True
+        result = self.db.fetch_records(
+            OurProduct,
+            "SELECT {columns} FROM our_products WHERE vk_product_id = %s",
+            (vk_id,)
         )
         return result[0] if result else None
 
-    def get_all_our_products(self) -> List[Dict]:
+    def get_all_our_products(self) -> List[OurProduct]:
         """Получение всех наших товаров"""
-        return self.db.execute_query(
-            "SELECT * FROM our_products WHERE in_stock = TRUE ORDER BY price ASC",
-            fetch=True
+        return self.db.fetch_records(
+            OurProduct,
+            "SELECT {columns} FROM our_products WHERE in_stock = TRUE ORDER BY price ASC"
         )
 
     def add_price_history(self, product_id: int, product_type: str, price: float):
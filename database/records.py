@@ -0,0 +1,181 @@
+"""
+Компактные записи товаров.
+
+Товар - объект со __slots__ вместо словаря: значения лежат в слотах
+экземпляра без собственной хеш-таблицы ключей, поэтому закэшированный
+товар занимает в разы меньше памяти, а из кортежа строки курсора запись
+собирается одним вызовом конструктора (см. benchmark_records.py).
+
+Для совместимости записи читаются и как словарь: product['price'],
+product.get('weight'), dict(product). Как и в прежних словарях, поле со
+значением None считается отсутствующим: get() вернет значение по
+умолчанию, а в dict(product) оно не попадет.
+"""
+
+import re
+from datetime import datetime
+from decimal import Decimal
+from itertools import starmap
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+Price = Union[float, Decimal]
+
+_NUMBER = re.compile(r'\d+(?:[,.]\d+)?')
+_COUNT = re.compile(r'\d+(?:[,.]\d{3})*')
+_KILOGRAMS = re.compile(r'\d\s*(?:кг|kg)', re.IGNORECASE)
+
+# Правдоподобный вес одного шара, г; остальное - вес упаковки и т.п. (колонка weight_g - DECIMAL(6,3))
+BB_WEIGHT_RANGE = (0.1, 1.0)
+
+
+def parse_weight(weight: Optional[str]) -> Optional[float]:
+    """Вес шара в граммах из строки extract_weight ("0.25g"); None - не указан или это не вес шара"""
+    match = _NUMBER.search(weight) if weight else None
+    # "1 кг" из характеристик - вес упаковки
+    if not match or _KILOGRAMS.search(weight):
+        return None
+    grams = float(match.group().replace(',', '.'))
+    low, high = BB_WEIGHT_RANGE
+    return grams if low <= grams <= high else None
+
+
+def parse_count(package: Optional[str]) -> Optional[int]:
+    """Количество шаров из строки extract_package ("3000 шт"); None - не указано"""
+    # "1.000 шт" - разделитель разрядов, а не дробь
+    match = _COUNT.search(package) if package else None
+    return int(re.sub(r'[,.]', '', match.group())) if match else None
+
+
+class Record:
+    """Запись со слотами; поля - __slots__ класса и его предков по порядку"""
+
+    __slots__ = ()
+    fields: Tuple[str, ...] = ()
+    _field_set: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fields = tuple(field for klass in reversed(cls.__mro__) for field in klass.__dict__.get('__slots__', ()))
+        cls._field_set = frozenset(cls.fields)
+
+        # Конструктор с позиционными аргументами в порядке полей (как генерируют dataclasses):
+        # запись из строки курсора - cls(*row) без промежуточного словаря
+        args = ', '.join(f"{field}=None" for field in cls.fields)
+        body = '\n'.join(f"    self.{field} = {field}" for field in cls.fields) or "    pass"
+        namespace = {}
+        exec(f"def __init__(self, {args}):\n{body}", namespace)
+        cls.__init__ = namespace['__init__']
+
+    @classmethod
+    def columns(cls, alias: str = None) -> str:
+        """Список колонок для SELECT в порядке полей записи"""
+        prefix = f"{alias}." if alias else ''
+        return ', '.join(prefix + field for field in cls.fields)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> List['Record']:
+        """Записи из кортежей строк, выбранных по columns()"""
+        return list(starmap(cls, rows))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Record':
+        """Запись из словаря (старый код); лишние ключи отбрасываются"""
+        return cls(**{key: value for key, value in data.items() if key in cls._field_set})
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.fields)
+
+    # Доступ как к словарю
+
+    def __getitem__(self, key: str):
+        if key not in self._field_set:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self._field_set:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._field_set and getattr(self, key) is not None
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None) if key in self._field_set else None
+        return default if value is None else value
+
+    def setdefault(self, key: str, default=None):
+        value = self.get(key)
+        if value is None:
+            self[key] = value = default
+        return value
+
+    def update(self, values: Dict):
+        for key, value in values.items():
+            self[key] = value
+
+    def keys(self) -> List[str]:
+        return [field for field in self.fields if getattr(self, field) is not None]
+
+    def items(self) -> List[tuple]:
+        return [(field, getattr(self, field)) for field in self.keys()]
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and other.as_tuple() == self.as_tuple()
+
+    def __repr__(self) -> str:
+        values = ', '.join(f"{key}={value!r}" for key, value in self.items())
+        return f"{type(self).__name__}({values})"
+
+
+class Product(Record):
+    """Общие поля товара"""
+
+    __slots__ = ('id', 'name', 'price', 'old_price', 'in_stock', 'weight', 'package',
+                 'weight_g', 'bb_count', 'price_per_1000', 'last_seen')
+
+    id: Optional[int]
+    name: str
+    price: Price
+    old_price: Optional[Price]
+    in_stock: Optional[bool]
+    weight: Optional[str]
+    package: Optional[str]
+    weight_g: Optional[Price]
+    bb_count: Optional[int]
+    price_per_1000: Optional[Price]
+    last_seen: Optional[datetime]
+
+    def measure(self):
+        """Числовые вес, количество и цена за 1000 шаров из строк weight и package"""
+        self.weight_g = parse_weight(self.weight)
+        self.bb_count = parse_count(self.package)
+        if self.bb_count and self.price:
+            self.price_per_1000 = round(float(self.price) * 1000 / self.bb_count, 2)
+        else:
+            self.price_per_1000 = None
+
+
+class CompetitorProduct(Product):
+    """Товар конкурента (competitor_products)"""
+
+    __slots__ = ('competitor', 'category', 'url', 'created_at', 'last_updated')
+
+    competitor: str
+    category: Optional[str]
+    url: str
+    created_at: Optional[datetime]
+    last_updated: Optional[datetime]
+
+
+class OurProduct(Product):
+    """Наш товар из VK (our_products)"""
+
+    __slots__ = ('vk_url', 'vk_photo_url', 'description', 'vk_product_id', 'created_at', 'updated_at')
+
+    vk_url: Optional[str]
+    vk_photo_url: Optional[str]
+    description: Optional[str]
+    vk_product_id: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
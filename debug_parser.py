@@ -3,9 +3,11 @@
 Тестовый скрипт для отладки парсера
 """
 
+import asyncio
 import logging
 import sys
 import os
+import time
 
 # Добавляем путь к проекту
 sys.path.append(os.path.dirname(__file__))
@@ -16,23 +18,37 @@ logging.basicConfig(
 )
 
 
-def test_strikeplanet_parser():
-    """Тестирование парсера StrikePlanet"""
-    from parsers.strikeplanet_parser import StrikePlanetParser
+def create_parser(key: str):
+    """Парсер по ключу PARSERS_CONFIG"""
+    if key == 'strikeplanet':
+        from parsers.strikeplanet_parser import StrikePlanetParser
+        return StrikePlanetParser()
+    if key == 'airsoftrus':
+        from parsers.airsoftrus_parser import AirsoftRusParser
+        return AirsoftRusParser()
+    if key == 'vk':
+        from parsers.vk_parser import VKParser
+        # При воспроизведении из кассеты токен не нужен, но без него парсер не ходит в API
+        return VKParser(os.getenv('VK_ACCESS_TOKEN') or 'replay')
+    raise ValueError(f"Неизвестный парсер: {key}")
 
-    print("🔍 Тестируем парсер StrikePlanet...")
 
-    parser = StrikePlanetParser()
+async def test_parser(key: str = 'strikeplanet', save_html: bool = True):
+    """Тестирование парсера"""
+    parser = create_parser(key)
+
+    print(f"🔍 Тестируем парсер {parser.name}...")
 
     # Сохраняем HTML для анализа
-    html = parser.get_page(parser.catalog_url)
-    if html:
-        with open('debug_page.html', 'w', encoding='utf-8') as f:
-            f.write(html)
-        print("✅ HTML страница сохранена в debug_page.html")
+    if save_html and hasattr(parser, 'catalog_url'):
+        html = await parser.get_page(parser.catalog_url)
+        if html:
+            with open('debug_page.html', 'w', encoding='utf-8') as f:
+                f.write(html)
+            print("✅ HTML страница сохранена в debug_page.html")
 
     # Парсим товары
-    products = parser.parse_products()
+    products = await parser.parse_products()
 
     print(f"📊 Найдено товаров: {len(products)}")
 
@@ -40,56 +56,115 @@ def test_strikeplanet_parser():
         print(f"\n--- Товар {i + 1} ---")
         print(f"Название: {product.get('name', 'Нет')}")
         print(f"Цена: {product.get('price', 'Нет')}")
-        print(f"URL: {product.get('url', 'Нет')}")
+        print(f"URL: {product.get('url', product.get('vk_url', 'Нет'))}")
         print(f"Вес: {product.get('weight', 'Нет')}")
         print(f"Упаковка: {product.get('package', 'Нет')}")
 
     return products
 
 
-def analyze_html_structure():
+async def run_parsers(keys, save_html: bool = True):
+    """Прогон нескольких парсеров подряд"""
+    results = {}
+    for key in keys:
+        results[key] = await test_parser(key, save_html=save_html)
+    return results
+
+
+def analyze_html_structure(html_path: str = 'debug_page.html'):
     """Анализ структуры HTML"""
-    from bs4 import BeautifulSoup
+    from parsers.selector_inference import infer_profile
 
-    with open('debug_page.html', 'r', encoding='utf-8') as f:
+    with open(html_path, 'r', encoding='utf-8') as f:
         html = f.read()
 
-    soup = BeautifulSoup(html, 'html.parser')
-
     print("\n🔍 Анализ структуры HTML:")
 
-    # Ищем все элементы с классами
-    elements_with_classes = soup.find_all(class_=True)
-    class_count = {}
+    profile = infer_profile(html, 'debug')
+    if not profile:
+        print("❌ Не найдено повторяющихся блоков с ценами")
+        return None
 
-    for element in elements_with_classes[:100]:  # Первые 100 элементов
-        for class_name in element.get('class', []):
-            class_count[class_name] = class_count.get(class_name, 0) + 1
+    print("📊 Кандидаты в контейнеры товаров:")
+    for candidate in profile['scores']['container']:
+        print(f"  {candidate['selector']}: {candidate['count']} шт, оценка {candidate['score']} "
+              f"(цены {candidate['price_density']:.0%}, ссылки {candidate['link_density']:.0%})")
 
-    # Сортируем по частоте
-    common_classes = sorted(class_count.items(), key=lambda x: x[1], reverse=True)[:20]
+    for field in ('name', 'price', 'link'):
+        print(f"\n🎯 Селекторы поля {field}:")
+        for candidate in profile['scores'][field]:
+            print(f"  {candidate['selector']}: оценка {candidate['score']}")
 
-    print("📊 Самые частые классы:")
-    for class_name, count in common_classes:
-        print(f"  .{class_name}: {count} раз")
+    return profile
 
-    # Ищем потенциальные товары
-    print("\n🔍 Поиск товаров:")
-    for class_name, count in common_classes:
-        if any(keyword in class_name.lower() for keyword in ['product', 'item', 'card', 'goods', 'catalog']):
-            elements = soup.select(f'.{class_name}')
-            print(f"\n🎯 Класс .{class_name} ({count} элементов):")
-            for i, elem in enumerate(elements[:3]):  # Показываем первые 3
-                text = elem.get_text(strip=True)[:100]
-                print(f"  {i + 1}. {text}")
+
+def infer_selectors(source: str, html_path: str, save: bool = True):
+    """Автоматический подбор селекторов и сохранение профиля сайта"""
+    from parsers.selector_inference import infer_profile, save_profile
+
+    with open(html_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    profile = infer_profile(html, source)
+    if not profile:
+        print(f"❌ Не удалось подобрать селекторы для {source}")
+        return None
+
+    print(f"🎯 Профиль {source}:")
+    for field in ('container', 'name', 'price', 'link'):
+        print(f"  {field}: {profile.get(field)}")
+
+    if save:
+        path = save_profile(profile)
+        print(f"✅ Профиль сохранен в {path}, парсер подхватит его при следующем запуске")
+
+    return profile
 
 
 if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="Отладка парсеров")
+    arg_parser.add_argument('--infer', metavar='SOURCE',
+                            help="подобрать селекторы для парсера (strikeplanet, airsoftrus) по сохраненной странице")
+    arg_parser.add_argument('--html', default='debug_page.html', help="сохраненная HTML страница")
+    arg_parser.add_argument('--no-save', action='store_true', help="не сохранять профиль")
+    arg_parser.add_argument('--parser', default='strikeplanet',
+                            choices=['strikeplanet', 'airsoftrus', 'vk', 'all'], help="какой парсер запускать")
+    mode = arg_parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', metavar='CASSETTE', help="записать все ответы сайтов в кассету (.json/.json.gz)")
+    mode.add_argument('--replay', metavar='CASSETTE', help="воспроизвести ответы из кассеты без сети")
+    arg_parser.add_argument('--latency', type=float, default=0.0,
+                            help="искусственная задержка ответа при воспроизведении, сек")
+    args = arg_parser.parse_args()
+
+    if args.infer:
+        infer_selectors(args.infer, args.html, save=not args.no_save)
+        sys.exit(0)
+
+    from parsers.transport import RecordingTransport, ReplayTransport, set_transport
+
+    transport = None
+    if args.record:
+        transport = set_transport(RecordingTransport(args.record))
+    elif args.replay:
+        transport = set_transport(ReplayTransport(args.replay, latency=args.latency))
+
     print("🚀 Запуск отладки парсера")
     print("=" * 50)
 
-    products = test_strikeplanet_parser()
+    keys = ['strikeplanet', 'airsoftrus', 'vk'] if args.parser == 'all' else [args.parser]
+    started = time.monotonic()
+    try:
+        # При воспроизведении debug_page.html не перезаписываем
+        results = asyncio.run(run_parsers(keys, save_html=not args.replay))
+    finally:
+        if transport:
+            transport.close()
+    print(f"\n⏱ Время прогона: {time.monotonic() - started:.2f} сек")
+
+    products = [product for items in results.values() for product in items]
 
     if not products:
         print("\n❌ Товары не найдены, анализируем структуру...")
-        analyze_html_structure()
\ No newline at end of file
+        analyze_html_structure(args.html)
@@ -4,6 +4,7 @@ import logging
 from typing import Dict, List
 from database.models import Database
 from database.operations import AdminOperations, ProductOperations
+from utils.price_store import PriceStore
 
 logger = logging.getLogger(__name__)
 
@@ -69,16 +70,20 @@ class AdminHandler:
 
     async def handle_update_prices(self, query, context):
         """Обработка обновления цен"""
-        await query.edit_message_text("🔄 Начинаю обновление цен...")
+        # Экземпляр AirsoftBot кладется в bot_data при создании приложения
+        bot = context.application.bot_data['airsoft_bot']
+
+        if bot.refresh.is_running('all'):
+            await query.edit_message_text("⏳ Обновление цен уже идет, дождусь его результата...")
+        else:
+            await query.edit_message_text("🔄 Начинаю обновление цен...")
 
         try:
             # Создаем временное сообщение о прогрессе
             progress_message = await query.message.reply_text("⏳ Парсинг сайтов...")
 
             # Обновляем цены
-            from main import AirsoftBot  # Импортируем здесь чтобы избежать циклического импорта
-            bot = context.application
-            success_count = await bot.update_all_prices()
+            success_count = await bot.update_all_prices('админ-панель')
 
             await progress_message.edit_text(f"✅ Обновление завершено!\nОбработано товаров: {success_count}")
 
@@ -112,17 +117,9 @@ class AdminHandler:
     async def get_system_stats(self) -> str:
         """Получение системной статистики"""
         try:
-            # Статистика товаров
-            comp_products = self.product_ops.get_all_competitor_products()
-            our_products = self.product_ops.get_all_our_products()
-
-            # Статистика по конкурентам
-            competitors = {}
-            for product in comp_products:
-                competitor = product['competitor']
-                if competitor not in competitors:
-                    competitors[competitor] = 0
-                competitors[competitor] += 1
+            # Статистика товаров - по колоночным снимкам цен
+            competitors = PriceStore.from_products(self.product_ops.get_all_competitor_products())
+            ours = PriceStore.from_products(self.product_ops.get_all_our_products(), competitor='VK')
 
             # Администраторы
             admins = self.admin_ops.get_all_admins()
@@ -131,22 +128,24 @@ class AdminHandler:
             recent_changes = self.product_ops.get_price_changes(24)  # За 24 часа
 
             stats_text = "📊 *Системная статистика*\n\n"
-            stats_text += f"*Наши товары:* {len(our_products)} шт.\n"
+            stats_text += f"*Наши товары:* {len(ours)} шт.\n"
 
-            for competitor, count in competitors.items():
-                stats_text += f"*{competitor}:* {count} шт.\n"
+            by_competitor = competitors.stats(competitors.by_competitor)
+            for competitor, stats in by_competitor.items():
+                stats_text += (f"*{competitor}:* {stats['count']} шт., "
+                               f"медиана {stats['median']:.2f} руб. ({stats['p10']:.0f}-{stats['p90']:.0f})\n")
 
             stats_text += f"\n*Администраторов:* {len(admins)}\n"
             stats_text += f"*Изменений цен за 24ч:* {len(recent_changes)}\n"
 
             # Средние цены
-            if comp_products:
-                avg_price = sum(p['price'] for p in comp_products if p['price']) / len(comp_products)
-                stats_text += f"*Средняя цена конкурентов:* {avg_price:.2f} руб.\n"
+            if competitors:
+                stats_text += f"*Средняя цена конкурентов:* {competitors.mean():.2f} руб.\n"
+                stats_text += f"*Медианная цена конкурентов:* {competitors.median():.2f} руб.\n"
 
-            if our_products:
-                our_avg_price = sum(p['price'] for p in our_products if p['price']) / len(our_products)
-                stats_text += f"*Наша средняя цена:* {our_avg_price:.2f} руб.\n"
+            if ours:
+                stats_text += f"*Наша средняя цена:* {ours.mean():.2f} руб.\n"
+                stats_text += f"*Наша медианная цена:* {ours.median():.2f} руб.\n"
 
             return stats_text
 
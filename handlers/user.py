@@ -22,11 +22,11 @@ class UserHandler:
 
         # Кнопки товаров для текущей страницы
         for product in products[start_idx:end_idx]:
-            product_name = product['name'][:30] + "..." if len(product['name']) > 30 else product['name']
+            product_name = product.name[:30] + "..." if len(product.name) > 30 else product.name
             keyboard.append([
                 InlineKeyboardButton(
-                    f"🛒 {product_name} - {product['price']} руб.",
-                    callback_data=f"user_order_{product['id']}"
+                    f"🛒 {product_name} - {product.price} руб.",
+                    callback_data=f"user_order_{product.id}"
                 )
             ])
 
@@ -71,7 +71,7 @@ class UserHandler:
 
         # Получаем информацию о товаре
         products = self.product_ops.get_all_our_products()
-        product = next((p for p in products if p['id'] == product_id), None)
+        product = next((p for p in products if p.id == product_id), None)
 
         if not product:
             await query.edit_message_text("❌ Товар не найден")
@@ -79,8 +79,8 @@ class UserHandler:
 
         order_text = (
             f"🛒 *Заказ товара*\n\n"
-            f"*Товар:* {product['name']}\n"
-            f"*Цена:* {product['price']} руб.\n\n"
+            f"*Товар:* {product.name}\n"
+            f"*Цена:* {product.price} руб.\n\n"
             f"Для завершения заказа свяжитесь с менеджером:\n"
             f"👉 @your_manager\n\n"
             f"Или перейдите в топик заказов:\n"
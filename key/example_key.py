@@ -28,17 +28,72 @@ ADMIN_IDS = [
 ]
 
 # Настройки парсеров
+# update_interval - базовый интервал обновления, сек; планировщик сокращает его, когда цены
+#                   меняются, и увеличивает, когда нет (min_interval/max_interval, по умолчанию /4 и x4)
+# rate_limit - лимит запросов к сайту: rate запросов в секунду, burst запросов подряд
+# html_engine - движок разбора HTML: 'html.parser' или 'lxml' (см. benchmark_parsers.py)
+# enrich - загружать страницы товаров ради наличия и характеристик:
+#          {'enabled': True, 'ttl': 21600, 'concurrency': 4}, повторно - когда устарело или изменилась цена
+# streaming - разбирать страницу по мере загрузки, не держа ее в памяти целиком
+# categories - разделы каталога: [{'name', 'url', 'update_interval'}]; у каждого раздела свое расписание
+#              (update_interval/min_interval/max_interval раздела важнее настроек источника),
+#              раздел сохраняется у товара. По умолчанию - раздел страйкбольных шаров
+# sitemap - поиск новых и измененных товаров по карте сайта (по <lastmod>), отдельным расписанием:
+#           {'enabled': True, 'update_interval': 900, 'url': '.../sitemap.xml', 'include': [r'/catalog/.+/.+/']};
+#           по умолчанию карта - /sitemap.xml сайта, товары - адреса внутри разделов каталога
+# vanish - когда товар, пропавший из каталога, помечается отсутствующим: его нет runs полных обходов
+#          подряд и grace секунд, по умолчанию {'runs': 2, 'grace': 3600}
 PARSERS_CONFIG = {
     'strikeplanet': {
         'enabled': True,
-        'update_interval': 3600
+        'update_interval': 3600,
+        'rate_limit': {'rate': 1.0, 'burst': 3},
+        'categories': [
+            {'name': 'shary', 'url': 'https://strikeplanet.ru/catalog/raskhodniki/straykbolnye-shary/'},
+            # {'name': 'gaz', 'url': 'https://strikeplanet.ru/catalog/...', 'update_interval': 7200},
+        ]
     },
     'airsoftrus': {
         'enabled': True,
-        'update_interval': 3600
+        'update_interval': 3600,
+        'rate_limit': {'rate': 0.5, 'burst': 2}
     },
     'vk': {
         'enabled': True,
         'update_interval': 7200,
+        'rate_limit': {'rate': 3.0, 'burst': 3}
     }
-}
\ No newline at end of file
+}
+
+# HTTP соединения парсеров (необязательно): один пул keep-alive соединений на хост
+HTTP_CONFIG = {
+    'pool_connections': 4,   # хостов в пуле
+    'pool_maxsize': 8,       # соединений на хост
+    'dns_ttl': 300,          # кэш адресов хостов, сек (0 - без кэша)
+    'warm_up': True,         # открыть соединения при запуске бота
+}
+
+# Очередь задач парсинга (необязательно): при 'enabled': True бот только ставит задачи
+# в таблицу scrape_jobs, а сайты парсят отдельные процессы worker.py (можно на нескольких машинах)
+QUEUE_CONFIG = {
+    'enabled': False,
+    'lease_seconds': 300,    # на сколько воркер захватывает задачу (продлевается, пока он жив)
+    'max_attempts': 5,       # попыток на задачу
+    'retry_delay': 60,       # задержка перед повтором, растет вдвое
+    'poll_interval': 5,      # как часто проверять очередь, сек
+    'wait_timeout': 900,     # сколько бот ждет результата задачи, сек
+}
+
+# Конвейер обновления цен (необязательно): загрузка -> разбор -> нормализация -> запись.
+# Число одновременных обработчиков стадии и размер очереди перед ней; очереди ограничивают память
+PIPELINE_CONFIG = {
+    'fetch_concurrency': 4,
+    'parse_concurrency': 2,
+    'normalize_concurrency': 1,
+    'write_concurrency': 1,
+    'fetch_queue': 8,        # страниц, ожидающих загрузки
+    'parse_queue': 4,        # загруженных страниц, ожидающих разбора
+    'normalize_queue': 500,  # товаров
+    'write_queue': 1000,     # товаров
+    'write_batch': 200,      # товаров в одной пакетной записи
+}
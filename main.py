@@ -1,7 +1,9 @@
 import asyncio
 import logging
 import sys
+import time
 from datetime import datetime
+from typing import Dict, List
 
 from telegram import Update, BotCommand
 from telegram.ext import (
@@ -15,36 +17,51 @@ from telegram.ext import (
 from telegram.error import TelegramError
 
 from config import get_config
+from database.job_queue import ScrapeJobQueue
 from database.models import Database
 from database.operations import ProductOperations, AdminOperations
+from database.records import CompetitorProduct
 from parsers.strikeplanet_parser import StrikePlanetParser
 from parsers.airsoftrus_parser import AirsoftRusParser
 from parsers.vk_parser import VKParser
+from parsers import parse_pool, sitemap
+from parsers.http_clients import http_clients
 from handlers.admin import AdminHandler
 from handlers.user import UserHandler
+from utils.freshness import FreshnessTracker
 from utils.helpers import MessageFormatter, Scheduler
+from utils.pipeline import PipelineMetrics, RefreshPipeline
+from utils.refresh import RefreshCoordinator
 
-# Настройка логирования
-config = get_config()
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format=config.LOG_FORMAT,
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('bot.log', encoding='utf-8')
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def setup_logging(config):
+    """Настройка логирования бота.
+
+    Вызывается только при запуске main.py: процессы пула разбора (spawn)
+    заново импортируют модуль __main__, и настройка на уровне модуля
+    открывала бы bot.log в каждом из них.
+    """
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL),
+        format=config.LOG_FORMAT,
+        handlers=[
+            logging.StreamHandler(sys.stdout),
+            logging.FileHandler('bot.log', encoding='utf-8')
+        ]
+    )
+
+
 class AirsoftBot:
     def __init__(self):
-        self.config = config
+        self.config = get_config()
         self.db = Database()
         self.product_ops = ProductOperations()
         self.admin_ops = AdminOperations()
 
         # Инициализация парсеров
+        http_clients.configure(self.config.HTTP_CONFIG)
         self.parsers = self.setup_parsers()
 
         # Инициализация обработчиков
@@ -53,8 +70,25 @@ class AirsoftBot:
         self.formatter = MessageFormatter()
         self.scheduler = Scheduler(self)
 
+        # Свежесть данных по источникам и фоновые повторы после сбоев
+        self.freshness = FreshnessTracker()
+        self.revalidations = {}
+
+        # Одновременные запросы обновления (команда, админ-панель, планировщик) - один обход сайтов
+        self.refresh = RefreshCoordinator()
+
+        # Загрузка, разбор и запись страниц идут одновременно (см. utils/pipeline.py)
+        self.pipeline_metrics = PipelineMetrics()
+        self.refresh_pipeline = RefreshPipeline(self.parsers, self.product_ops, self.config.PIPELINE_CONFIG,
+                                                self.pipeline_metrics)
+
+        # Режим очереди: сайты парсят воркеры (worker.py), бот только ставит задачи
+        self.job_queue = ScrapeJobQueue(self.config.QUEUE_CONFIG) if self.config.QUEUE_CONFIG.get('enabled') else None
+
         # Инициализация приложения Telegram
         self.application = Application.builder().token(self.config.BOT_TOKEN).build()
+        # Доступ к боту из обработчиков (админ-панель)
+        self.application.bot_data['airsoft_bot'] = self
 
         self.setup_handlers()
 
@@ -63,14 +97,15 @@ class AirsoftBot:
         parsers = {}
 
         if self.config.PARSERS_CONFIG.get('strikeplanet', {}).get('enabled', False):
-            parsers['strikeplanet'] = StrikePlanetParser()
+            parsers['strikeplanet'] = StrikePlanetParser(self.config.PARSERS_CONFIG['strikeplanet'])
 
         if self.config.PARSERS_CONFIG.get('airsoftrus', {}).get('enabled', False):
-            parsers['airsoftrus'] = AirsoftRusParser()
+            parsers['airsoftrus'] = AirsoftRusParser(self.config.PARSERS_CONFIG['airsoftrus'])
 
         if (self.config.PARSERS_CONFIG.get('vk', {}).get('enabled', False) and
                 self.config.PARSERS_CONFIG['vk'].get('access_token')):
-            parsers['vk'] = VKParser(self.config.PARSERS_CONFIG['vk']['access_token'])
+            parsers['vk'] = VKParser(self.config.PARSERS_CONFIG['vk']['access_token'],
+                                     self.config.PARSERS_CONFIG['vk'])
 
         logger.info(f"✅ Инициализировано парсеров: {len(parsers)}")
         return parsers
@@ -87,6 +122,7 @@ class AirsoftBot:
         self.application.add_handler(CommandHandler("admin", self.admin_panel))
         self.application.add_handler(CommandHandler("update", self.update_prices))
         self.application.add_handler(CommandHandler("stats", self.show_stats))
+        self.application.add_handler(CommandHandler("status", self.show_status))
         self.application.add_handler(CommandHandler("add_admin", self.add_admin))
 
         # Обработчики callback от inline клавиатур
@@ -137,6 +173,7 @@ class AirsoftBot:
 /admin - Панель администратора
 /update - Обновить цены вручную
 /stats - Статистика
+/status - Состояние обновлений
 /add_admin - Добавить администратора
 
 💡 *Для заказа:* Используйте кнопки под сообщениями с нашими товарами.
@@ -156,13 +193,13 @@ class AirsoftBot:
             # Группируем по конкурентам
             competitors = {}
             for product in products:
-                competitor = product['competitor']
+                competitor = product.competitor
                 if competitor not in competitors:
                     competitors[competitor] = []
                 competitors[competitor].append(product)
 
             # Формируем сообщения
-            messages = self.formatter.format_competitor_prices(competitors)
+            messages = self.formatter.format_competitor_prices(competitors, self.source_freshness(products))
 
             for message in messages:
                 await update.message.reply_text(
@@ -225,10 +262,13 @@ class AirsoftBot:
             await update.message.reply_text("❌ У вас нет прав для этой команды.")
             return
 
-        await update.message.reply_text("🔄 Начинаю обновление цен...")
+        if self.refresh.is_running('all'):
+            await update.message.reply_text("⏳ Обновление цен уже идет, дождусь его результата...")
+        else:
+            await update.message.reply_text("🔄 Начинаю обновление цен...")
 
         try:
-            success_count = await self.update_all_prices()
+            success_count = await self.update_all_prices('/update')
 
             if success_count > 0:
                 # Публикуем обновление в группе
@@ -241,44 +281,180 @@ class AirsoftBot:
             logger.error(f"Ошибка обновления цен: {e}")
             await update.message.reply_text("❌ Ошибка при обновлении цен")
 
-    async def update_all_prices(self) -> int:
-        """Обновление всех цен"""
-        total_updated = 0
+    async def update_all_prices(self, trigger: str = None) -> int:
+        """Обновление всех цен; повторный вызов во время обновления ждет его результат"""
+        return await self.refresh.run('all', lambda: self._update_all_prices(trigger), trigger)
+
+    async def _update_all_prices(self, trigger: str = None) -> int:
+        # Источники обновляются параллельно: в режиме очереди их берут разные воркеры,
+        # без очереди загрузка одного сайта идет, пока разбираются и пишутся страницы другого
+        counts = await asyncio.gather(*(self.update_source(source, trigger) for source in self.parsers))
+        return sum(counts)
+
+    async def update_source(self, source: str, trigger: str = None, category: str = None) -> int:
+        """Обновление источника или его раздела; если оно уже идет - ожидание его результата"""
+        parser = self.parsers[source]
+        if category is None and len(parser.work_units()) > 1:
+            # Разделы обновляются параллельно, каждый как отдельное обновление
+            counts = await asyncio.gather(*(self.update_source(source, trigger, name)
+                                            for _, name in parser.work_units()))
+            return sum(counts)
+
+        return await self.refresh.run(parser.work_key(category),
+                                      lambda: self._update_source(source, trigger, category), trigger)
+
+    def work_label(self, source: str, category: str = None) -> str:
+        """Название источника и раздела для логов"""
+        name = self.parsers[source].name
+        return f"{name} / {category}" if category else name
+
+    async def _update_source(self, source: str, trigger: str = None, category: str = None) -> int:
+        """Обновление одного источника или раздела; при сбое база не трогается"""
+        if self.job_queue:
+            return await self._enqueue_source(source, trigger, category)
+
+        parser = self.parsers[source]
+        key = parser.work_key(category)
+        results = await self.refresh_pipeline.run([(source, page) for page in parser.job_pages(category)])
+        result = results[source]
+
+        if not result['products'] or result['write_failed']:
+            error = result['errors'][0] if result['errors'] else "товары не получены"
+            delay = self.freshness.record_failure(key, error)
+            self.schedule_revalidation(source, delay, category)
+            return 0
+
+        self.freshness.record_success(key, result['products'], result['changed'])
+        disappeared = len(result['disappeared']) if result['disappeared'] is not None else '?'
+        logger.info(f"{self.work_label(source, category)}: обновлено {result['products']} товаров "
+                    f"(новых {result['inserted']}, изменилось {result['updated']}, "
+                    f"без изменений {result['unchanged']}, пропало {disappeared}, нет в наличии {result['vanished']})")
+        return result['products']
+
+    async def _enqueue_source(self, source: str, trigger: str = None, category: str = None) -> int:
+        """Режим очереди: задачи на страницы источника (раздела) и ожидание их результата"""
+        parser = self.parsers[source]
+        key = parser.work_key(category)
+        label = self.work_label(source, category)
 
-        # Парсинг StrikePlanet
-        if 'strikeplanet' in self.parsers:
-            try:
-                products = self.parsers['strikeplanet'].parse_products()
-                for product in products:
-                    self.product_ops.add_competitor_product(product)
-                total_updated += len(products)
-                logger.info(f"StrikePlanet: обновлено {len(products)} товаров")
-            except Exception as e:
-                logger.error(f"Ошибка парсинга StrikePlanet: {e}")
+        try:
+            job_ids = await asyncio.get_running_loop().run_in_executor(
+                None, self.job_queue.enqueue_many, source, parser.job_pages(category), trigger)
+        except Exception as e:
+            logger.error(f"Ошибка постановки задач {label}: {e}")
+            delay = self.freshness.record_failure(key, f"ошибка очереди: {e}")
+            self.schedule_revalidation(source, delay, category)
+            return 0
+
+        jobs = list((await self.job_queue.wait(job_ids)).values())
+        if any(job['state'] in ('pending', 'running') for job in jobs):
+            # Воркеры заняты или не запущены - задачи остаются в очереди
+            logger.warning(f"⏳ {label}: задачи еще в очереди ({', '.join(f'#{job_id}' for job_id in job_ids)})")
+            return 0
+
+        failed = [job for job in jobs if job['state'] == 'failed']
+        if failed:
+            delay = self.freshness.record_failure(key, failed[0]['error'] or "задача не выполнена")
+            self.schedule_revalidation(source, delay, category)
+            return 0
+
+        count = sum(job['result_count'] or 0 for job in jobs)
+        changes = [job['changed_count'] for job in jobs]
+        self.freshness.record_success(key, count, None if None in changes else sum(changes))
+        logger.info(f"{label}: воркеры обновили {count} товаров")
+        return count
+
+    def schedule_revalidation(self, source: str, delay: float, category: str = None):
+        """Фоновое повторное обновление источника (раздела) после сбоя"""
+        key = self.parsers[source].work_key(category)
+        task = self.revalidations.get(key)
+        if task and not task.done():
+            return
+        self.revalidations[key] = asyncio.create_task(self.revalidate(source, delay, category))
+
+    async def revalidate(self, source: str, delay: float, category: str = None):
+        """Повтор обновления источника (раздела); при новом сбое задержка растет"""
+        await asyncio.sleep(delay)
+        # Задача уже выполняется - следующий повтор планирует update_source
+        self.revalidations.pop(self.parsers[source].work_key(category), None)
+        label = self.work_label(source, category)
+        if not self.scheduler.is_leader:
+            logger.info(f"🔄 {label}: повтор пропущен, фоновые обновления выполняет лидер")
+            return
 
-        # Парсинг Airsoft-Rus
-        if 'airsoftrus' in self.parsers:
-            try:
-                products = self.parsers['airsoftrus'].parse_products()
-                for product in products:
-                    self.product_ops.add_competitor_product(product)
-                total_updated += len(products)
-                logger.info(f"Airsoft-Rus: обновлено {len(products)} товаров")
-            except Exception as e:
-                logger.error(f"Ошибка парсинга Airsoft-Rus: {e}")
+        logger.info(f"🔄 Повторное обновление {label}")
+        await self.update_source(source, 'повтор после сбоя', category)
+
+    async def discover_source(self, source: str, trigger: str = None) -> int:
+        """Поиск новых и измененных товаров по карте сайта; если он уже идет - ожидание его результата"""
+        key = self.parsers[source].sitemap_key
+        return await self.refresh.run(key, lambda: self._discover_source(source, trigger), trigger)
 
-        # Парсинг VK товаров
-        if 'vk' in self.parsers:
+    async def _discover_source(self, source: str, trigger: str = None) -> int:
+        """Страницы товаров, добавленных или измененных по карте сайта, - в конвейер или очередь задач"""
+        parser = self.parsers[source]
+        loop = asyncio.get_running_loop()
+
+        try:
+            known = await loop.run_in_executor(None, self.product_ops.get_sitemap_lastmods, source)
+            found = await sitemap.discover(parser, known)
+        except Exception as e:
+            logger.error(f"❌ {parser.name}: карта сайта не прочитана: {e}")
+            return 0
+
+        pages = [url for url, _ in found['products']]
+        if self.job_queue:
             try:
-                products = self.parsers['vk'].parse_products()
-                for product in products:
-                    self.product_ops.add_our_product(product)
-                total_updated += len(products)
-                logger.info(f"VK: обновлено {len(products)} товаров")
+                await loop.run_in_executor(None, self.job_queue.enqueue_many, source, pages, trigger)
             except Exception as e:
-                logger.error(f"Ошибка парсинга VK: {e}")
-
-        return total_updated
+                logger.error(f"Ошибка постановки задач {parser.name}: {e}")
+                return 0
+            # Задачи очереди повторяются сами, поэтому lastmod запоминается сразу
+            done = found['products'] + found['sitemaps']
+            logger.info(f"🗺 {parser.name}: в очередь поставлено страниц товаров: {len(pages)}")
+        else:
+            result = (await self.refresh_pipeline.run([(source, page) for page in pages]))[source] if pages else None
+            if result and result['write_failed']:
+                return 0
+            unfetched = set(result['unfetched']) if result else set()
+            # Незагруженные страницы повторятся в следующий раз; вложенные карты тогда тоже перечитываются
+            done = [entry for entry in found['products'] if entry[0] not in unfetched]
+            if not unfetched:
+                done += found['sitemaps']
+            if result:
+                logger.info(f"🗺 {parser.name}: страниц товаров {len(pages)}, товаров {result['products']} "
+                            f"(новых {result['inserted']}, изменилось {result['updated']}), "
+                            f"не загружено {len(unfetched)}")
+
+        if done:
+            await loop.run_in_executor(None, self.product_ops.save_sitemap_lastmods, source, done)
+        return len(pages)
+
+    def source_freshness(self, products: List[CompetitorProduct]) -> Dict[str, Dict]:
+        """Время последнего удачного обновления и пометка устаревания по конкурентам"""
+        sources = {parser.name: source for source, parser in self.parsers.items()}
+        freshness = {}
+        for product in products:
+            competitor = product.competitor
+            updated_at = product.last_updated
+            entry = freshness.setdefault(competitor, {'updated_at': updated_at, 'stale': False})
+            if updated_at and (not entry['updated_at'] or updated_at > entry['updated_at']):
+                entry['updated_at'] = updated_at
+
+        states = self.freshness.status()
+        for competitor, entry in freshness.items():
+            source = sources.get(competitor)
+            keys = [key for key, _ in self.parsers[source].work_units()] if source else []
+            entry['stale'] = any(self.freshness.is_stale(key) for key in keys)
+            # Неизменившиеся товары не перезаписываются, поэтому last_updated - время последнего изменения;
+            # по разделам берется самый давно проверенный
+            checks = [states.get(key, {}).get('last_success') for key in keys]
+            last_success = min(checks) if checks and all(checks) else None
+            if last_success:
+                checked_at = datetime.fromtimestamp(last_success)
+                if not entry['updated_at'] or checked_at > entry['updated_at']:
+                    entry['updated_at'] = checked_at
+        return freshness
 
     async def publish_price_update(self, context: ContextTypes.DEFAULT_TYPE):
         """Публикация обновления цен в группе"""
@@ -315,6 +491,81 @@ class AirsoftBot:
             logger.error(f"Ошибка получения статистики: {e}")
             await update.message.reply_text("❌ Ошибка получения статистики")
 
+    async def show_status(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Состояние обновлений: идущие, ожидающие и запланированные"""
+        user_id = update.effective_user.id
+
+        if not self.admin_ops.is_admin(user_id):
+            await update.message.reply_text("❌ Доступ запрещен.")
+            return
+
+        await update.message.reply_text(self.format_status(), parse_mode='Markdown')
+
+    def format_status(self) -> str:
+        """Текст /status"""
+        now = time.time()
+        running = self.refresh.status()
+        freshness = self.freshness.status()
+        next_runs = self.scheduler.next_runs()
+
+        text = "🛰 *Состояние обновлений*\n\n"
+        leader = self.scheduler.leader
+        if leader.is_leader:
+            text += (f"👑 Лидер: эта копия ({leader.node_id}), "
+                     f"{self.formatter.format_age(now - leader.leader_since)}\n\n")
+        else:
+            text += f"⏳ Не лидер ({leader.node_id}): обновления по расписанию выполняет другая копия\n\n"
+
+        if 'all' in running:
+            flight = running['all']
+            text += (f"🔄 Полное обновление идет {flight['running_for']:.0f} сек "
+                     f"(запустил: {flight['trigger'] or 'неизвестно'}, ждут: {flight['waiters']})\n\n")
+
+        queued = {}
+        if self.job_queue:
+            try:
+                queued = self.job_queue.stats()
+            except Exception as e:
+                logger.error(f"Ошибка чтения очереди задач: {e}")
+
+        for source, parser in self.parsers.items():
+            text += f"*{parser.name}*\n"
+            if source in queued:
+                text += (f"   📥 Задачи: ждут {queued[source].get('pending', 0)}, "
+                         f"выполняются {queued[source].get('running', 0)}\n")
+            for key, category in parser.work_units():
+                if category:
+                    text += f"   📂 _{category}_\n"
+                flight = running.get(key)
+                if flight:
+                    text += (f"   🔄 Обновляется {flight['running_for']:.0f} сек "
+                             f"(запустил: {flight['trigger'] or 'неизвестно'}, ждут: {flight['waiters']})\n")
+
+                state = freshness.get(key, {})
+                if state.get('last_success'):
+                    text += (f"   ✅ Последнее обновление: {self.formatter.format_age(now - state['last_success'])} "
+                             f"назад, товаров: {state['last_count']}\n")
+                if state.get('failures'):
+                    text += f"   ⚠️ Сбоев подряд: {state['failures']} ({state['error']})\n"
+                if state.get('retry_at') and key in self.revalidations:
+                    text += f"   🔁 Повтор через {max(0, state['retry_at'] - now):.0f} сек\n"
+                if key in next_runs:
+                    text += f"   🕒 По расписанию через {max(0, next_runs[key] - now):.0f} сек\n"
+            if parser.sitemap_key in running:
+                text += f"   🗺 Идет обход карты сайта {running[parser.sitemap_key]['running_for']:.0f} сек\n"
+            elif parser.sitemap_key in next_runs:
+                text += f"   🗺 Карта сайта через {max(0, next_runs[parser.sitemap_key] - now):.0f} сек\n"
+            text += "\n"
+
+        stages = self.pipeline_metrics.status()
+        if stages:
+            text += "🏭 *Конвейер* (обработано / ошибок / среднее время / очередь)\n"
+            for name, stage in stages.items():
+                text += (f"   {name}: {stage['items']} / {stage['errors']} / {stage['avg_latency'] * 1000:.0f} мс / "
+                         f"{stage['depth']} из {stage['capacity']} (пик {stage['peak_depth']})\n")
+
+        return text
+
     async def add_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Добавление администратора"""
         user_id = update.effective_user.id
@@ -366,6 +617,21 @@ class AirsoftBot:
     async def on_startup(self, application):
         """Действия при запуске бота"""
         await self.setup_commands()
+
+        # Соединения с сайтами открываются в фоне, запуск бота не ждет
+        warm_up_urls = [url for parser in self.parsers.values() for url in parser.warm_up_urls()]
+        asyncio.create_task(http_clients.warm_up(warm_up_urls))
+
+        # Новые таблицы и колонки в базах, созданных прошлыми версиями
+        self.db.create_tables()
+        self.db.migrate()
+
+        if self.job_queue:
+            logger.info("📥 Режим очереди: парсинг выполняют воркеры (worker.py)")
+        else:
+            # Отпечатки сохраненных товаров: дальше в базу пишутся только изменения
+            await self.refresh_pipeline.load_index(self.parsers)
+
         await self.scheduler.start()
 
         # Добавляем администраторов по умолчанию из конфига
@@ -380,6 +646,10 @@ class AirsoftBot:
     async def on_shutdown(self, application):
         """Действия при остановке бота"""
         await self.scheduler.stop()
+        for task in self.revalidations.values():
+            task.cancel()
+        parse_pool.shutdown()
+        http_clients.close()
         logger.info("🛑 Бот остановлен")
 
     def run(self):
@@ -405,5 +675,6 @@ class AirsoftBot:
 
 
 if __name__ == "__main__":
+    setup_logging(get_config())
     bot = AirsoftBot()
     bot.run()
\ No newline at end of file
@@ -41,8 +41,12 @@ class FastBot:
             self.product_ops = ProductOperations()
             self.admin_ops = AdminOperations()
 
-            # Инициализируем парсеры
+            # Инициализируем парсеры и открываем соединения с сайтами
+            from parsers.http_clients import http_clients
+            http_clients.configure(self.config.HTTP_CONFIG)
             self.parsers = self.setup_parsers()
+            await http_clients.warm_up(
+                [url for parser in self.parsers.values() for url in parser.warm_up_urls()])
 
             self.initialized = True
             logger.info("✅ База данных и парсеры инициализированы")
@@ -58,7 +62,7 @@ class FastBot:
         try:
             if self.config.PARSERS_CONFIG.get('strikeplanet', {}).get('enabled', False):
                 from parsers.strikeplanet_parser import StrikePlanetParser
-                parsers['strikeplanet'] = StrikePlanetParser()
+                parsers['strikeplanet'] = StrikePlanetParser(self.config.PARSERS_CONFIG['strikeplanet'])
                 logger.info("✅ Парсер StrikePlanet инициализирован")
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации парсера StrikePlanet: {e}")
@@ -66,7 +70,7 @@ class FastBot:
         try:
             if self.config.PARSERS_CONFIG.get('airsoftrus', {}).get('enabled', False):
                 from parsers.airsoftrus_parser import AirsoftRusParser
-                parsers['airsoftrus'] = AirsoftRusParser()
+                parsers['airsoftrus'] = AirsoftRusParser(self.config.PARSERS_CONFIG['airsoftrus'])
                 logger.info("✅ Парсер Airsoft-Rus инициализирован")
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации парсера Airsoft-Rus: {e}")
@@ -75,12 +79,12 @@ class FastBot:
             vk_config = self.config.PARSERS_CONFIG.get('vk', {})
             if vk_config.get('enabled', False) and vk_config.get('access_token'):
                 from parsers.vk_parser import VKParser
-                parsers['vk'] = VKParser(vk_config['access_token'])
+                parsers['vk'] = VKParser(vk_config['access_token'], vk_config)
                 logger.info("✅ Парсер VK инициализирован")
             elif vk_config.get('enabled', False):
                 from parsers.vk_parser import VKParser
-                parsers['vk'] = VKParser()  # Без токена - будет использовать fallback
-                logger.info("✅ Парсер VK инициализирован (fallback режим)")
+                parsers['vk'] = VKParser(config=vk_config)  # Без токена товары не загружаются
+                logger.info("⚠️ Парсер VK инициализирован без токена")
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации парсера VK: {e}")
 
@@ -239,7 +243,7 @@ class FastBot:
             if 'strikeplanet' in self.parsers:
                 try:
                     await update.message.reply_text("🔍 Парсинг StrikePlanet...")
-                    products = self.parsers['strikeplanet'].parse_products()
+                    products = await self.parsers['strikeplanet'].parse_products()
                     if products:
                         for product in products:
                             self.product_ops.add_competitor_product(product)
@@ -256,7 +260,7 @@ class FastBot:
             if 'airsoftrus' in self.parsers:
                 try:
                     await update.message.reply_text("🔍 Парсинг Airsoft-Rus...")
-                    products = self.parsers['airsoftrus'].parse_products()
+                    products = await self.parsers['airsoftrus'].parse_products()
                     if products:
                         for product in products:
                             self.product_ops.add_competitor_product(product)
@@ -273,7 +277,7 @@ class FastBot:
             if 'vk' in self.parsers:
                 try:
                     await update.message.reply_text("🔍 Парсинг VK товаров...")
-                    products = self.parsers['vk'].parse_products()
+                    products = await self.parsers['vk'].parse_products()
                     if products:
                         for product in products:
                             self.product_ops.add_our_product(product)
@@ -1,26 +1,54 @@
 from .base_parser import BaseParser
-from bs4 import BeautifulSoup
+from database.records import CompetitorProduct
 import logging
 from typing import List, Dict, Optional
 from urllib.parse import urljoin
-import random
-import time
 
 logger = logging.getLogger(__name__)
 
 
 class AirsoftRusParser(BaseParser):
-    def __init__(self):
-        super().__init__("Airsoft-Rus")
+    source = 'airsoftrus'
+
+    # Улучшенные селекторы для Airsoft-Rus
+    product_selectors = [
+        '.catalog-item',
+        '.product-item',
+        '.item',
+        '.product',
+        '.goods-item',
+        '.catalog-section-item',
+        '.item_block'
+    ]
+
+    name_selectors = [
+        '.item-title',
+        '.product-name',
+        '.name',
+        'h1', 'h2', 'h3', 'h4',
+        '.title'
+    ]
+
+    price_selectors = [
+        '.price',
+        '.cost',
+        '.item-price',
+        '.price_value'
+    ]
+
+    default_categories = [
+        {'name': 'shary', 'url': "https://airsoft-rus.ru/catalog/1096/"},
+    ]
+
+    def __init__(self, config: Dict = None):
+        super().__init__("Airsoft-Rus", config)
         self.base_url = "https://airsoft-rus.ru"
-        self.catalog_url = "https://airsoft-rus.ru/catalog/1096/"
 
         # Улучшаем заголовки для обхода защиты
-        self.session.headers.update({
+        self.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
             'Sec-Fetch-Dest': 'document',
@@ -28,153 +56,49 @@ class AirsoftRusParser(BaseParser):
             'Sec-Fetch-Site': 'none',
             'Cache-Control': 'max-age=0',
             'DNT': '1',
+            'Referer': 'https://airsoft-rus.ru/',
         })
+        self.timeout = 15
+
+        # Сайт отвечает 403 на часть запросов - повторяем с другим User-Agent
+        self.retry_statuses = self.retry_statuses + (403,)
+        self.user_agents = [
+            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0'
+        ]
 
-    def get_page(self, url: str) -> Optional[str]:
-        """Переопределяем метод для обхода защиты"""
-        try:
-            logger.info(f"Загрузка страницы: {url}")
-
-            # Добавляем случайную задержку
-            time.sleep(random.uniform(1, 3))
-
-            response = self.session.get(
-                url,
-                timeout=15,
-                allow_redirects=True,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Referer': 'https://airsoft-rus.ru/',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                }
-            )
-
-            # Проверяем статус
-            if response.status_code == 403:
-                logger.warning("Получен 403, пробуем альтернативный подход...")
-                return self.get_page_alternative(url)
-
-            response.raise_for_status()
-            logger.info(f"Страница загружена успешно")
-            return response.text
-
-        except Exception as e:
-            logger.error(f"Ошибка загрузки {url}: {e}")
-            return None
-
-    def get_page_alternative(self, url: str) -> Optional[str]:
-        """Альтернативный метод загрузки"""
-        try:
-            # Пробуем другие User-Agent
-            user_agents = [
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0'
-            ]
-
-            for ua in user_agents:
-                try:
-                    response = self.session.get(
-                        url,
-                        timeout=10,
-                        headers={'User-Agent': ua}
-                    )
-                    if response.status_code == 200:
-                        logger.info(f"Успешно с User-Agent: {ua[:50]}...")
-                        return response.text
-                except:
-                    continue
-
-            return None
-
-        except Exception as e:
-            logger.error(f"Ошибка альтернативного метода: {e}")
+    def request_headers(self, attempt: int) -> Optional[Dict]:
+        """На повторах (в том числе после 403) пробуем другие User-Agent"""
+        if attempt == 0:
             return None
+        return {'User-Agent': self.user_agents[(attempt - 1) % len(self.user_agents)]}
 
-    def parse_products(self) -> List[Dict]:
+    async def parse_products(self) -> List[Dict]:
         """Парсинг товаров с обработкой ошибок"""
         logger.info("Начинаем парсинг Airsoft-Rus")
 
-        html = self.get_page(self.catalog_url)
-        if not html:
-            logger.error(f"Не удалось загрузить каталог {self.catalog_url}")
-
-            # Возвращаем тестовые данные если парсинг не удался
-            return self.get_fallback_products()
+        if not self.is_available():
+            return []
 
-        return self.parse_page(html)
-
-    def parse_page(self, html: str) -> List[Dict]:
-        """Парсинг страницы каталога"""
-        soup = BeautifulSoup(html, 'html.parser')
-        products = []
-
-        # Улучшенные селекторы для Airsoft-Rus
-        product_selectors = [
-            '.catalog-item',
-            '.product-item',
-            '.item',
-            '.product',
-            '.goods-item',
-            '.catalog-section-item',
-            '.item_block'
-        ]
-
-        product_containers = None
-        for selector in product_selectors:
-            product_containers = soup.select(selector)
-            if product_containers:
-                logger.info(f"Найден селектор товаров: {selector}, найдено: {len(product_containers)}")
-                break
-
-        if not product_containers:
-            logger.warning("Не найден селектор для товаров Airsoft-Rus")
-            # Альтернативный поиск
-            product_containers = soup.find_all('div', class_=lambda x: x and any(
-                word in str(x).lower() for word in ['item', 'product', 'card', 'goods']))
-            logger.info(f"Альтернативный поиск: найдено {len(product_containers)} контейнеров")
-
-        for container in product_containers:
-            try:
-                product = self.parse_product_container(container)
-                if product and self.validate_product(product):
-                    products.append(product)
-            except Exception as e:
-                logger.error(f"Ошибка парсинга товара Airsoft-Rus: {e}")
-                continue
-
-        # Если товары не найдены, используем fallback
+        products = await self.fetch_categories()
         if not products:
-            logger.warning("Товары не найдены, используем fallback данные")
-            return self.get_fallback_products()
+            return []
 
-        return products
+        return await self.enrich_products(products)
 
-    def parse_product_container(self, container) -> Dict:
+    def parse_product_container(self, container) -> CompetitorProduct:
         """Парсинг отдельного товара"""
         # Название и URL
         name = None
-        url = None
 
         # Ищем название
-        name_selectors = [
-            '.item-title',
-            '.product-name',
-            '.name',
-            'h1', 'h2', 'h3', 'h4',
-            '.title'
-        ]
+        name_elem = self.select_field(container, 'name', self.name_selectors)
+        if name_elem:
+            name = name_elem.get_text(strip=True)
 
-        for selector in name_selectors:
-            name_elem = container.select_one(selector)
-            if name_elem:
-                name = name_elem.get_text(strip=True)
-                # Пробуем найти ссылку
-                link_elem = name_elem.find('a') if name_elem else None
-                if link_elem and link_elem.get('href'):
-                    url = link_elem.get('href')
-                break
+        # Ссылка - в названии или отдельным элементом карточки
+        url = self.select_link(container, name_elem)
 
         # Если не нашли через селекторы
         if not name:
@@ -188,21 +112,7 @@ class AirsoftRusParser(BaseParser):
                     break
 
         # Цена
-        price = 0
-        price_selectors = [
-            '.price',
-            '.cost',
-            '.item-price',
-            '.price_value'
-        ]
-
-        for selector in price_selectors:
-            price_elem = container.select_one(selector)
-            if price_elem:
-                price_text = price_elem.get_text(strip=True)
-                price = self.clean_price(price_text)
-                if price > 0:
-                    break
+        price = self.select_price(container, self.price_selectors)
 
         # Формируем полный URL
         if url and not url.startswith('http'):
@@ -215,43 +125,12 @@ class AirsoftRusParser(BaseParser):
         weight = self.extract_weight(name) if name else None
         package = self.extract_package(name) if name else None
 
-        return {
-            'name': name or "Товар Airsoft-Rus",
-            'price': price,
-            'competitor': self.name,
-            'url': url,
-            'in_stock': True,
-            'weight': weight,
-            'package': package
-        }
-
-    def get_fallback_products(self) -> List[Dict]:
-        """Возвращает тестовые данные если парсинг не удался"""
-        logger.info("Используем fallback данные для Airsoft-Rus")
-
-        return [
-            {
-                'name': 'BB шары 0.25g Airsoft-Rus (3000 шт)',
-                'price': 430.0,
-                'competitor': 'Airsoft-Rus',
-                'url': 'https://airsoft-rus.ru/catalog/1096/',
-                'weight': '0.25g',
-                'package': '3000 шт'
-            },
-            {
-                'name': 'BB шары 0.28g Airsoft-Rus (3000 шт)',
-                'price': 480.0,
-                'competitor': 'Airsoft-Rus',
-                'url': 'https://airsoft-rus.ru/catalog/1096/',
-                'weight': '0.28g',
-                'package': '3000 шт'
-            },
-            {
-                'name': 'BB шары 0.30g Airsoft-Rus (5000 шт)',
-                'price': 750.0,
-                'competitor': 'Airsoft-Rus',
-                'url': 'https://airsoft-rus.ru/catalog/1096/',
-                'weight': '0.30g',
-                'package': '5000 шт'
-            }
-        ]
\ No newline at end of file
+        return CompetitorProduct(
+            name=name or "Товар Airsoft-Rus",
+            price=price,
+            competitor=self.name,
+            url=url,
+            in_stock=True,
+            weight=weight,
+            package=package
+        )
@@ -1,51 +1,725 @@
 from abc import ABC, abstractmethod
+import asyncio
+import functools
 import requests
 from bs4 import BeautifulSoup
-import time
 import re
-from typing import List, Dict, Optional
+import threading
+from collections import Counter
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Union
 from urllib.parse import urljoin, urlparse  # ДОБАВЛЯЕМ ИМПОРТ
 import logging
 
+from database.records import CompetitorProduct, Product
+from . import parse_pool
+from .detail_cache import get_detail_cache
+from .http_clients import http_clients
+from .page_archive import get_archive
+from .rate_limiter import parse_retry_after, rate_limiter
+from .resilience import (
+    TRANSIENT_ERRORS, TRANSIENT_STATUSES, CircuitOpenError, RetryPolicy, get_circuit_breaker
+)
+from .selector_inference import load_profile
+from .selector_memo import SelectorMemo
+from .streaming import StreamingPageParser
+from .transport import get_transport
+
 logger = logging.getLogger(__name__)
 
 
 class BaseParser(ABC):
-    def __init__(self, name: str):
+    # Ключ парсера в PARSERS_CONFIG
+    source = None
+
+    # Селекторы перебираются по порядку, запомненный пробуется первым
+    product_selectors: List[str] = []
+    name_selectors: List[str] = []
+    price_selectors: List[str] = []
+    link_selectors: List[str] = []
+
+    # Слова для дорогого общего поиска контейнеров по классу
+    fallback_class_words = ['item', 'product', 'card', 'goods']
+
+    # Страница товара: блок наличия и строки характеристик
+    stock_selectors: List[str] = [
+        '[itemprop="availability"]', '.product-stock', '.product-available', '.availability', '.stock'
+    ]
+    spec_row_selectors: List[str] = ['.product-props tr', '.props tr', '.characteristics tr', 'table tr', 'dl']
+    out_of_stock_words = ['нет в наличии', 'отсутствует', 'под заказ', 'ожидается', 'outofstock']
+    in_stock_words = ['в наличии', 'есть на складе', 'instock']
+    # Название и цена на странице товара (цена - еще и по price_selectors)
+    product_name_selectors: List[str] = ['[itemprop="name"]', 'h1', 'meta[property="og:title"]']
+    product_price_selectors: List[str] = ['[itemprop="price"]', 'meta[property="product:price:amount"]']
+
+    # Движок BeautifulSoup: 'html.parser' (без зависимостей) или 'lxml' (быстрее)
+    html_engine = 'html.parser'
+
+    # Разделы каталога {'name', 'url'}, если в PARSERS_CONFIG не задан список 'categories'
+    default_categories: List[Dict] = []
+
+    def __init__(self, name: str, config: Dict = None):
         self.name = name
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Секция парсера из PARSERS_CONFIG
+        self.config = config or {}
+        # Соединения общие для процесса (см. http_clients), у парсера только заголовки
+        self.http_clients = http_clients
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.5,en;q=0.3',
-        })
+        }
         self.timeout = 10
         self.retry_count = 2
         self.delay_between_requests = 1
 
+        # 'rate_limit': {'rate': запросов в секунду, 'burst': запросов подряд}
+        rate_limit = self.config.get('rate_limit', {})
+        self.rate = rate_limit.get('rate', 1 / self.delay_between_requests)
+        self.burst = rate_limit.get('burst')
+        self.rate_limiter = rate_limiter
+        self._configured_hosts = set()
+
+        # 'retry': {'retries', 'base_delay'}, 'circuit_breaker': {'failure_threshold', 'reset_timeout'}
+        retry = self.config.get('retry', {})
+        self.retry_policy = RetryPolicy(retry.get('retries', self.retry_count), retry.get('base_delay', 1.0))
+        self.retry_statuses = TRANSIENT_STATUSES
+        self.circuit_breaker = get_circuit_breaker(self.name, **self.config.get('circuit_breaker', {}))
+
+        self.html_engine = self.config.get('html_engine', self.html_engine)
+
+        # 'enrich': {'enabled', 'ttl', 'concurrency'} - загрузка страниц товаров
+        enrich = self.config.get('enrich', {})
+        self.enrich_enabled = enrich.get('enabled', False)
+        self.enrich_ttl = enrich.get('ttl')
+        self.enrich_concurrency = enrich.get('concurrency', 4)
+
+        # 'streaming': True - разбор страницы по мере загрузки (см. streaming)
+        self.streaming = self.config.get('streaming', False)
+        self.stream_chunk_size = 64 * 1024
+        self.last_stream_digest = None
+
+        # 'categories': [{'name', 'url', 'update_interval'}] - разделы каталога, у каждого свое расписание
+        self.categories = [dict(category) for category in self.config.get('categories', self.default_categories)]
+        self._page_categories = {category['url']: category['name'] for category in self.categories}
+        self.catalog_url = self.categories[0]['url'] if self.categories else None
+
+        # 'sitemap': {'enabled', 'url', 'include', 'update_interval'} - поиск новых и измененных
+        # товаров по карте сайта; include - регулярные выражения адресов товаров
+        # (по умолчанию - адреса внутри разделов каталога)
+        sitemap = self.config.get('sitemap', {})
+        self.sitemap_enabled = sitemap.get('enabled', False)
+        self.sitemap_url = sitemap.get('url')
+        if not self.sitemap_url and self.catalog_url:
+            self.sitemap_url = urljoin(self.catalog_url, '/sitemap.xml')
+        self.sitemap_include = [re.compile(pattern) for pattern in sitemap.get('include', [])]
+        self.sitemap_key = f"{self.source}:sitemap"
+
+        # 'vanish': {'runs', 'grace'} - когда пропавший из каталога товар считается отсутствующим
+        vanish = self.config.get('vanish', {})
+        self.vanish_runs = vanish.get('runs', 2)
+        self.vanish_grace = vanish.get('grace', 3600)
+
+        # Каждая загруженная страница сохраняется в локальный архив (см. page_archive)
+        self.archive_pages = self.config.get('archive', True)
+
+        # None - общий транспорт процесса (см. transport.set_transport)
+        self.transport = None
+
+        self.selector_memo = SelectorMemo()
+        self.apply_selector_profile(load_profile(self.source))
+        # Сработавшие селекторы полей разбираемой карточки; потоковый разбор идет
+        # в потоках executor, поэтому у каждого потока свои
+        self._local = threading.local()
+
     @abstractmethod
-    def parse_products(self) -> List[Dict]:
+    async def parse_products(self) -> List[Dict]:
         pass
 
-    def get_page(self, url: str) -> Optional[str]:
+    def warm_up_urls(self) -> List[str]:
+        """Адреса, соединения с которыми открываются при запуске"""
+        url = getattr(self, 'catalog_url', None)
+        return [url] if url else []
+
+    def job_pages(self, category: str = None) -> List[str]:
+        """Страницы обновления источника или одного раздела (по задаче очереди на страницу)"""
+        return [c['url'] for c in self.categories if category is None or c['name'] == category]
+
+    def category_of(self, page: str) -> Optional[str]:
+        """Раздел каталога, к которому относится страница"""
+        return self._page_categories.get(page)
+
+    def is_product_page(self, page: str) -> bool:
+        """Страница отдельного товара (из карты сайта), а не раздела каталога"""
+        return bool(self.categories) and page not in self._page_categories
+
+    def is_sitemap_product(self, url: str) -> bool:
+        """Адрес из карты сайта - страница товара"""
+        if self.sitemap_include:
+            return any(pattern.search(url) for pattern in self.sitemap_include)
+        return any(url.startswith(c['url']) and url != c['url'] and '?' not in url for c in self.categories)
+
+    def category(self, name: str) -> Dict:
+        """Настройки раздела по имени"""
+        return next((c for c in self.categories if c['name'] == name), {})
+
+    def work_key(self, category: str = None) -> str:
+        """Ключ обновления для планировщика и свежести: источник или источник:раздел"""
+        if category and len(self.categories) > 1:
+            return f"{self.source}:{category}"
+        return self.source
+
+    def work_units(self) -> List[Tuple[str, Optional[str]]]:
+        """Единицы обновления (ключ, раздел): разделы по отдельности, если их больше одного"""
+        if len(self.categories) < 2:
+            return [(self.source, None)]
+        return [(self.work_key(c['name']), c['name']) for c in self.categories]
+
+    async def fetch_categories(self) -> List[CompetitorProduct]:
+        """Товары всех разделов каталога с пометкой раздела"""
+        all_products = []
+        for category in self.categories:
+            logger.info(f"{self.name}: парсинг раздела {category['name']}: {category['url']}")
+            products = await self.fetch_products(category['url'])
+            if products is None:
+                logger.error(f"Не удалось загрузить раздел {category['url']}")
+                continue
+            for product in products:
+                product.category = category['name']
+            all_products.extend(products)
+        return all_products
+
+    def is_available(self) -> bool:
+        """Сайт не отключен предохранителем; иначе обновление пропускается"""
+        if self.circuit_breaker.is_open:
+            logger.warning(f"{self.name}: сайт отключен после серии сбоев, пропускаем "
+                           f"(повтор через {self.circuit_breaker.retry_in():.0f} сек), остаются прежние данные")
+            return False
+        return True
+
+    def request_headers(self, attempt: int) -> Optional[Dict]:
+        """Дополнительные заголовки для попытки номер attempt (с нуля)"""
+        return None
+
+    async def fetch(self, url: str, **kwargs) -> requests.Response:
+        """HTTP запрос с лимитом хоста, повторами и предохранителем сайта"""
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(f"{self.name} временно отключен")
+
+        host = urlparse(url).netloc
+        if host not in self._configured_hosts:
+            self.rate_limiter.configure(host, self.rate, self.burst)
+            self._configured_hosts.add(host)
+
+        kwargs.setdefault('timeout', self.timeout)
+        base_headers = dict(self.headers, **(kwargs.pop('headers', None) or {}))
+        session = self.http_clients.session(host)
+        loop = asyncio.get_running_loop()
+        transport = self.transport or get_transport()
+
+        # Воспроизведение из кассеты идет без лимитов и повторов
+        attempts = 1 if transport.offline else self.retry_policy.retries + 1
+
+        for attempt in range(attempts):
+            headers = dict(base_headers, **(self.request_headers(attempt) or {}))
+            retry_after = None
+
+            try:
+                if not transport.offline:
+                    await self.rate_limiter.acquire(host)
+                response = await loop.run_in_executor(
+                    None, functools.partial(transport.send, session, url, headers=headers, **kwargs))
+            except TRANSIENT_ERRORS as e:
+                if attempt == attempts - 1:
+                    self.circuit_breaker.record_failure()
+                    raise
+                logger.warning(f"{self.name}: {type(e).__name__} на {url}, попытка {attempt + 1}/{attempts}")
+            except BaseException:
+                # Ошибка запроса или отмена: пробный запрос не должен занимать место
+                self.circuit_breaker.record_neutral()
+                raise
+            else:
+                self.rate_limiter.observe(host, response.status_code, response.headers.get('Retry-After'))
+                if response.status_code not in self.retry_statuses:
+                    if response.status_code >= 500:
+                        self.circuit_breaker.record_failure()
+                    elif response.status_code >= 400:
+                        self.circuit_breaker.record_neutral()
+                    else:
+                        self.circuit_breaker.record_success()
+                    return response
+                if attempt == attempts - 1:
+                    self.circuit_breaker.record_failure()
+                    return response
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                logger.warning(f"{self.name}: ответ {response.status_code} на {url}, "
+                               f"попытка {attempt + 1}/{attempts}")
+
+            await asyncio.sleep(self.retry_policy.delay(attempt, retry_after))
+
+    async def get_page(self, url: str) -> Optional[str]:
         """Получение HTML страницы"""
         try:
             logger.info(f"Загрузка страницы: {url}")
-            response = self.session.get(url, timeout=self.timeout)
+            response = await self.fetch(url)
             response.raise_for_status()
 
             # Проверяем кодировку
-            if response.encoding.lower() != 'utf-8':
+            if not response.encoding or response.encoding.lower() != 'utf-8':
                 response.encoding = 'utf-8'
 
             logger.info(f"Страница загружена успешно")
-            time.sleep(self.delay_between_requests)
+            await self.archive_page(url, response.status_code, response.text)
             return response.text
 
         except Exception as e:
             logger.error(f"Ошибка загрузки {url}: {e}")
             return None
 
+    async def stream_products(self, url: str) -> AsyncIterator[Dict]:
+        """Потоковый разбор: товары отдаются по мере закрытия их контейнеров.
+
+        Страница читается кусками в потоке executor и в память целиком не
+        попадает, в архив пишется тоже по кускам. После прохода хеш страницы
+        в архиве остается в last_stream_digest.
+        """
+        remembered = self.selector_memo.get(self.source).get('container')
+        stream = StreamingPageParser(self, ([remembered] if remembered else []) + self.product_selectors)
+        self.last_stream_digest = None
+
+        logger.info(f"Потоковая загрузка страницы: {url}")
+        response = await self.fetch(url, stream=True)
+        if not stream.can_stream:
+            response.close()
+            raise ValueError(f"{self.name}: нет простых селекторов для потокового разбора")
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        cancelled = threading.Event()
+        done = object()
+
+        def put(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def read():
+            writer = None
+            try:
+                response.raise_for_status()
+                transport = self.transport or get_transport()
+                if self.archive_pages and not transport.offline:
+                    writer = get_archive().writer(self.source, url, status=response.status_code)
+
+                for chunk in response.iter_content(self.stream_chunk_size):
+                    if cancelled.is_set():
+                        return
+                    if writer:
+                        writer.write(chunk)
+                    for product in stream.feed(chunk):
+                        put(product)
+
+                for product in stream.close():
+                    put(product)
+                if writer:
+                    self.last_stream_digest = writer.commit()
+                    writer = None
+            except BaseException as e:
+                put(e)
+            finally:
+                if writer:
+                    writer.abort()
+                response.close()
+                put(done)
+
+        reader = loop.run_in_executor(None, read)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    self.remember_selectors(stream.selectors)
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            await asyncio.shield(reader)
+
+    async def fetch_products(self, url: str) -> Optional[List[Dict]]:
+        """Товары страницы каталога; None, если страницу не удалось загрузить"""
+        if self.streaming:
+            try:
+                products = [product async for product in self.stream_products(url)]
+                if products:
+                    return products
+
+                # Потоково не нашлось: полный разбор с перебором, страница уже в архиве
+                logger.info(f"{self.name}: потоковый разбор не дал товаров, полный разбор страницы")
+                html = None
+                if self.last_stream_digest:
+                    loop = asyncio.get_running_loop()
+                    html = await loop.run_in_executor(None, get_archive().load, self.last_stream_digest)
+                if html:
+                    return await self.parse_html(html)
+            except (CircuitOpenError, requests.RequestException) as e:
+                logger.error(f"Ошибка загрузки {url}: {e}")
+                return None
+            except Exception as e:
+                logger.warning(f"{self.name}: потоковый разбор не удался ({e}), загружаем страницу целиком")
+
+        html = await self.get_page(url)
+        if not html:
+            return None
+        return await self.parse_html(html)
+
+    async def enrich_products(self, products: List[Dict]) -> List[Dict]:
+        """Наличие и характеристики со страниц товаров.
+
+        Страницы загружаются параллельно (не больше enrich_concurrency сразу,
+        темп задает лимит хоста), повторно - только когда запись в кэше
+        устарела или цена в каталоге изменилась.
+        """
+        if not self.enrich_enabled or not products:
+            return products
+
+        cache = get_detail_cache()
+        pending = []
+        cached = 0
+        for product in products:
+            url = product.get('url')
+            if not url or url in self._page_categories:
+                continue
+            details = cache.get(url, product.get('price'), self.enrich_ttl)
+            if details is None:
+                pending.append(product)
+            else:
+                product.update(details)
+                cached += 1
+
+        semaphore = asyncio.Semaphore(self.enrich_concurrency)
+
+        async def enrich(product: Dict) -> bool:
+            async with semaphore:
+                if self.circuit_breaker.is_open:
+                    return False
+                try:
+                    response = await self.fetch(product['url'])
+                    response.raise_for_status()
+                    response.encoding = 'utf-8'
+                    details = await parse_pool.parse_detail(self, response.text)
+                except Exception as e:
+                    logger.warning(f"{self.name}: страница товара {product['url']} не загружена: {e}")
+                    return False
+
+                # Не найденные на странице поля не затирают данные из названия
+                details = {k: v for k, v in details.items() if v is not None}
+                product.update(details)
+                cache.put(product['url'], product.get('price'), details)
+                return True
+
+        loaded = sum(await asyncio.gather(*(enrich(p) for p in pending)))
+        if loaded:
+            await asyncio.get_running_loop().run_in_executor(None, cache.save)
+
+        logger.info(f"{self.name}: страницы товаров - из кэша {cached}, загружено {loaded}, "
+                    f"ошибок {len(pending) - loaded}")
+        return products
+
+    async def fetch_payload(self, page: str) -> Optional[Union[str, List[Dict]]]:
+        """Стадия загрузки конвейера: HTML страницы или, при потоковом разборе, уже товары"""
+        if not self.is_available():
+            return None
+        if self.streaming and not self.is_product_page(page):
+            return await self.fetch_products(page)
+        return await self.get_page(page)
+
+    async def parse_payload(self, payload: Union[str, List[Dict]], page: str = None) -> List[Dict]:
+        """Стадия разбора конвейера: товары страницы с данными со страниц товаров"""
+        if isinstance(payload, str) and page and self.is_product_page(page):
+            product = await parse_pool.parse_product(self, payload, page)
+            return [product] if product else []
+
+        products = await self.parse_html(payload) if isinstance(payload, str) else payload
+        if not products:
+            return []
+        return await self.enrich_products(products)
+
+    def normalize_product(self, product: Product) -> Optional[Product]:
+        """Стадия нормализации: единый вид товара перед записью; None - товар отбрасывается"""
+        name = ' '.join((product.name or '').split())
+        product.name = name
+        if not self.validate_product(product):
+            return None
+
+        product.price = round(float(product.price), 2)
+        if product.old_price:
+            product.old_price = round(float(product.old_price), 2)
+        if product.in_stock is None:
+            product.in_stock = True
+        if not product.weight:
+            product.weight = self.extract_weight(name)
+        if not product.package:
+            product.package = self.extract_package(name)
+        product.measure()
+        return product
+
+    def parse_detail_page(self, html: str) -> Dict:
+        """Наличие, вес и упаковка со страницы товара; None - не найдено"""
+        return self.detail_fields(BeautifulSoup(html, self.html_engine))
+
+    def parse_product_page(self, html: str, url: str) -> Optional[CompetitorProduct]:
+        """Товар целиком со страницы товара (адрес из карты сайта); None - это не товар"""
+        soup = BeautifulSoup(html, self.html_engine)
+
+        name = None
+        for selector in self.product_name_selectors:
+            elem = soup.select_one(selector)
+            if elem is not None:
+                name = (elem.get('content') or elem.get_text(' ', strip=True)).strip()
+                if name:
+                    break
+
+        price = 0
+        for selector in self.product_price_selectors:
+            elem = soup.select_one(selector)
+            if elem is not None:
+                price = self.clean_price(elem.get('content') or elem.get_text(strip=True))
+                if price > 0:
+                    break
+        if price <= 0:
+            price = self.select_price(soup, self.price_selectors)
+
+        product = CompetitorProduct(name=name, price=price, competitor=self.name, url=url)
+        if not self.validate_product(product):
+            return None
+
+        details = self.detail_fields(soup)
+        product.in_stock = details['in_stock'] if details['in_stock'] is not None else True
+        product.weight = details['weight'] or self.extract_weight(name)
+        product.package = details['package'] or self.extract_package(name)
+        return product
+
+    def detail_fields(self, soup) -> Dict:
+        """Наличие, вес и упаковка из разобранной страницы товара"""
+        details = {'in_stock': None, 'weight': None, 'package': None}
+
+        for selector in self.stock_selectors:
+            elem = soup.select_one(selector)
+            if elem is None:
+                continue
+            text = ' '.join([elem.get_text(' ', strip=True), elem.get('href') or '', elem.get('content') or ''])
+            in_stock = self.detect_stock(text)
+            if in_stock is not None:
+                details['in_stock'] = in_stock
+                break
+
+        for selector in self.spec_row_selectors:
+            for row in soup.select(selector):
+                for key, value in self.spec_pairs(row):
+                    key = key.lower()
+                    if not value:
+                        continue
+                    if details['weight'] is None and 'вес' in key:
+                        details['weight'] = self.extract_weight(value if not value[-1:].isdigit() else f"{value} г")
+                    elif details['package'] is None and any(w in key for w in ('количеств', 'упаковк', 'шт')):
+                        details['package'] = self.extract_package(
+                            value if not value[-1:].isdigit() else f"{value} шт")
+            if details['weight'] and details['package']:
+                break
+
+        return details
+
+    def spec_pairs(self, row) -> List[Tuple[str, str]]:
+        """Пары (название, значение) строки характеристик; в <dl> - каждый dt со следующим за ним dd"""
+        terms = row.find_all('dt')
+        if terms:
+            pairs = []
+            for term in terms:
+                value = term.find_next_sibling(['dd', 'dt'])
+                if value is not None and value.name == 'dd':
+                    pairs.append((term.get_text(' ', strip=True), value.get_text(' ', strip=True)))
+            return pairs
+
+        cells = row.find_all(['th', 'td'])
+        if len(cells) < 2:
+            return []
+        return [(cells[0].get_text(' ', strip=True), cells[1].get_text(' ', strip=True))]
+
+    def detect_stock(self, text: str) -> Optional[bool]:
+        """Наличие по тексту блока: True, False или None, если непонятно"""
+        text = text.lower().replace(' ', '')
+        if any(word.replace(' ', '') in text for word in self.out_of_stock_words):
+            return False
+        if any(word.replace(' ', '') in text for word in self.in_stock_words):
+            return True
+        return None
+
+    def apply_selector_profile(self, profile: Dict):
+        """Селекторы из профиля (см. selector_inference) ставятся перед встроенными"""
+        for field in ('product', 'name', 'price', 'link'):
+            selector = profile.get('container' if field == 'product' else field)
+            if not selector:
+                continue
+            attr = f"{field}_selectors"
+            current = getattr(self, attr)
+            setattr(self, attr, [selector] + [s for s in current if s != selector])
+
+        if profile:
+            logger.info(f"{self.name}: загружен профиль селекторов от {profile.get('generated_at')}")
+
+    def parse_page(self, html: str) -> List[Dict]:
+        """Парсинг одной страницы"""
+        return self.parse_page_with_selectors(html)[0]
+
+    def parse_page_with_selectors(self, html: str) -> Tuple[List[Dict], Dict[str, str]]:
+        """Товары страницы и селекторы, которые их дали.
+
+        Селекторы возвращаются вместе с товарами, а не хранятся в парсере:
+        конвейер разбирает несколько страниц одним парсером одновременно.
+        """
+        soup = BeautifulSoup(html, self.html_engine)
+
+        # Сначала пробуем селектор, который сработал в прошлый раз
+        remembered = self.selector_memo.get(self.source).get('container')
+        if remembered:
+            products, selectors = self.parse_containers(soup.select(remembered), remembered)
+            if products:
+                return products, selectors
+            logger.info(f"{self.name}: запомненный селектор {remembered} не сработал, полный перебор")
+
+        containers, selector = self.find_product_containers(soup, exclude=remembered)
+        products, selectors = self.parse_containers(containers, selector)
+
+        # После общего поиска выводим класс контейнера, чтобы в следующий раз не искать
+        if products and selector is None:
+            learned = selectors.get('container')
+            if learned:
+                learned_products, learned_selectors = self.parse_containers(soup.select(learned), learned)
+                if learned_products:
+                    logger.info(f"{self.name}: выведен селектор товаров {learned}")
+                    return learned_products, learned_selectors
+
+        return products, selectors
+
+    async def parse_html(self, html: str) -> List[Dict]:
+        """parse_page в пуле процессов, чтобы не занимать event loop бота"""
+        products, selectors = await parse_pool.parse_page(self, html)
+        if products:
+            self.remember_selectors(selectors)
+        return products
+
+    def find_product_containers(self, soup, exclude: str = None) -> Tuple[list, Optional[str]]:
+        """Поиск контейнеров товаров перебором селекторов"""
+        for selector in self.product_selectors:
+            if selector == exclude:
+                continue
+            product_containers = soup.select(selector)
+            if product_containers:
+                logger.info(f"Найден селектор товаров: {selector}, найдено: {len(product_containers)}")
+                return product_containers, selector
+
+        logger.warning(f"{self.name}: не найден селектор для товаров, пробуем альтернативный поиск")
+        words = self.fallback_class_words
+        product_containers = soup.find_all('div', class_=lambda x: x and any(
+            word in str(x).lower() for word in words))
+        logger.info(f"Альтернативный поиск: найдено {len(product_containers)} контейнеров")
+        return product_containers, None
+
+    def parse_containers(self, containers, selector: Optional[str]) -> Tuple[List[Dict], Dict[str, str]]:
+        """Разбор контейнеров и учет сработавших селекторов полей"""
+        products = []
+        selectors = {}
+        hits = {'name': Counter(), 'price': Counter(), 'link': Counter()}
+        container_classes = Counter()
+
+        for container in containers:
+            self._field_hits = {}
+            try:
+                product = self.parse_product_container(container)
+                if product and self.validate_product(product):
+                    products.append(product)
+                    for field, field_selector in self._field_hits.items():
+                        hits[field][field_selector] += 1
+                    if selector is None and container.get('class'):
+                        container_classes[container['class'][0]] += 1
+            except Exception as e:
+                logger.error(f"Ошибка парсинга товара {self.name}: {e}")
+                continue
+
+        if products:
+            if selector is None and container_classes:
+                # Самый частый класс; при равенстве - внешний, он встречается раньше
+                selector = f".{container_classes.most_common(1)[0][0]}"
+            selectors = {'container': selector}
+            for field, counter in hits.items():
+                if counter:
+                    selectors[field] = counter.most_common(1)[0][0]
+
+        return products, selectors
+
+    @property
+    def _field_hits(self) -> Dict[str, str]:
+        return self._local.__dict__.setdefault('field_hits', {})
+
+    @_field_hits.setter
+    def _field_hits(self, hits: Dict[str, str]):
+        self._local.field_hits = hits
+
+    def parse_product_container(self, container) -> Optional[Dict]:
+        """Парсинг отдельного товара (переопределяется в HTML-парсерах)"""
+        raise NotImplementedError
+
+    def select_field(self, container, field: str, selectors: List[str]):
+        """Первый найденный элемент поля, запомненный селектор пробуется первым"""
+        for selector in self.selector_memo.order(self.source, field, selectors):
+            elem = container.select_one(selector)
+            if elem:
+                self._field_hits[field] = selector
+                return elem
+        return None
+
+    def select_link(self, container, name_elem=None) -> Optional[str]:
+        """Ссылка на товар: внутри названия или отдельным элементом карточки"""
+        if name_elem is not None:
+            link_elem = name_elem.find('a')
+            if link_elem and link_elem.get('href'):
+                return link_elem.get('href')
+
+        if self.link_selectors:
+            link_elem = self.select_field(container, 'link', self.link_selectors)
+            if link_elem is not None:
+                if link_elem.name != 'a':
+                    link_elem = link_elem.find('a', href=True)
+                if link_elem is not None and link_elem.get('href'):
+                    return link_elem.get('href')
+        return None
+
+    def select_price(self, container, selectors: List[str]) -> float:
+        """Первая положительная цена по селекторам"""
+        for selector in self.selector_memo.order(self.source, 'price', selectors):
+            price_elem = container.select_one(selector)
+            if price_elem:
+                price = self.clean_price(price_elem.get_text(strip=True))
+                if price > 0:
+                    self._field_hits['price'] = selector
+                    return price
+        return 0
+
+    def remember_selectors(self, selectors: Dict[str, str]):
+        """Сохранение селекторов, давших валидные товары"""
+        if self.source and selectors.get('container'):
+            self.selector_memo.remember(self.source, selectors)
+
+    async def archive_page(self, url: str, status: int, body: str):
+        """Сохранение страницы в архив; ошибки архива не мешают парсингу"""
+        if not self.archive_pages or (self.transport or get_transport()).offline:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, functools.partial(
+                get_archive().store, self.source, url, body, status=status))
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить {url} в архив: {e}")
+
     def clean_price(self, price_text: str) -> float:
         """Очистка и преобразование цены в число"""
         if not price_text:
@@ -65,12 +739,50 @@ class BaseParser(ABC):
             logger.warning(f"Ошибка преобразования цены '{price_text}': {e}")
             return 0.0
 
-    def validate_product(self, product: Dict) -> bool:
+    def validate_product(self, product: Product) -> bool:
         """Валидация данных товара"""
-        if not product.get('name'):
+        if not product.name:
             return False
 
-        if product.get('price', 0) <= 0:
+        if (product.price or 0) <= 0:
             return False
 
-        return True
\ No newline at end of file
+        return True
+
+    def extract_weight(self, name: str) -> str:
+        """Извлечение веса из названия"""
+        if not name:
+            return None
+
+        weight_patterns = [
+            r'(\d+[,.]?\d*)\s*[gг]',  # 0.25g, 0.25г
+            r'(\d+[,.]?\d*)\s*грамм',  # 0.25 грамм
+            r'(\d+)\s*гр',  # 25 гр
+        ]
+
+        for pattern in weight_patterns:
+            match = re.search(pattern, name, re.IGNORECASE)
+            if match:
+                weight = match.group(1).replace(',', '.')
+                return f"{weight}g"
+
+        return None
+
+    def extract_package(self, name: str) -> str:
+        """Извлечение информации о упаковке"""
+        if not name:
+            return None
+
+        package_patterns = [
+            r'(\d+[,.]?\d*)\s*[pр]',  # 1000p, 1000р
+            r'(\d+)\s*шт',  # 1000 шт
+            r'(\d+)\s*штук',  # 1000 штук
+        ]
+
+        for pattern in package_patterns:
+            match = re.search(pattern, name, re.IGNORECASE)
+            if match:
+                count = match.group(1)
+                return f"{count} шт"
+
+        return None
@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join('data', 'detail_cache.json')
+DEFAULT_TTL = 6 * 3600
+
+
+class DetailCache:
+    """Данные со страниц товаров (наличие, характеристики) с временем жизни.
+
+    Запись действительна, пока не истек ttl и цена в каталоге та же, что
+    была при загрузке страницы товара.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Чтение кэша с диска"""
+        if not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать {self.path}: {e}")
+            return {}
+
+    def get(self, url: str, price: float, ttl: float = None) -> Optional[Dict]:
+        """Данные товара, если они свежие и цена не менялась"""
+        entry = self._data.get(url)
+        if not entry:
+            return None
+        if time.time() - entry['fetched_at'] > (ttl or self.ttl):
+            return None
+        if price is not None and entry.get('price') != price:
+            return None
+        return dict(entry['details'])
+
+    def put(self, url: str, price: float, details: Dict):
+        """Сохранение данных товара"""
+        with self._lock:
+            self._data[url] = {'fetched_at': time.time(), 'price': price, 'details': dict(details)}
+
+    def save(self):
+        """Атомарная запись на диск без просроченных записей"""
+        now = time.time()
+        with self._lock:
+            self._data = {url: entry for url, entry in self._data.items()
+                          if now - entry['fetched_at'] <= self.ttl * 4}
+            data = dict(self._data)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить {self.path}: {e}")
+
+
+_cache: Optional[DetailCache] = None
+
+
+def get_detail_cache() -> DetailCache:
+    """Общий кэш страниц товаров процесса"""
+    global _cache
+    if _cache is None:
+        _cache = DetailCache()
+    return _cache
@@ -0,0 +1,212 @@
+"""
+Общие HTTP клиенты парсеров.
+
+На каждый хост процесса одна requests.Session с пулом keep-alive
+соединений, поэтому TLS рукопожатие не повторяется при каждом обновлении.
+Адреса хостов кэшируются (DNS кэш с временем жизни), сжатие ответов
+запрашивается только в тех форматах, которые умеет распаковать urllib3.
+При запуске бота соединения можно открыть заранее (warm_up).
+"""
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+import urllib3.util.connection
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # Хостов в пуле адаптера и соединений на хост
+    'pool_connections': 4,
+    'pool_maxsize': 8,
+    # Время жизни адреса хоста в DNS кэше, сек (0 - без кэша)
+    'dns_ttl': 300,
+    # Открыть соединения к сайтам при запуске
+    'warm_up': True,
+}
+
+
+def supported_encodings() -> str:
+    """Accept-Encoding, который urllib3 сможет распаковать"""
+    encodings = ['gzip', 'deflate']
+    try:
+        import brotli  # noqa: F401
+        encodings.append('br')
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append('br')
+        except ImportError:
+            pass
+    return ', '.join(encodings)
+
+
+class DnsCache:
+    """Кэш адресов хостов для новых соединений urllib3"""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self._lock = threading.Lock()
+        self._original = None
+
+    def resolve(self, host: str, port: int) -> List[str]:
+        """Адреса хоста из кэша или от резолвера"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((host, port))
+        if entry and entry[0] > now:
+            return entry[1]
+
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self._entries[(host, port)] = (now + self.ttl, addresses)
+        return addresses
+
+    def forget(self, host: str, port: int):
+        """Сброс адреса, с которым не удалось соединиться"""
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def install(self):
+        """Подмена создания соединений urllib3 на версию с кэшем"""
+        if self._original is not None:
+            return
+        self._original = original = urllib3.util.connection.create_connection
+
+        def create_connection(address, *args, **kwargs):
+            host, port = address
+            if not self.ttl or _is_ip(host):
+                return original(address, *args, **kwargs)
+
+            last_error = None
+            for ip in self.resolve(host, port):
+                try:
+                    return original((ip, port), *args, **kwargs)
+                except OSError as e:
+                    last_error = e
+            self.forget(host, port)
+            raise last_error or OSError(f"Нет адресов для {host}")
+
+        urllib3.util.connection.create_connection = create_connection
+
+    def uninstall(self):
+        """Возврат стандартного создания соединений"""
+        if self._original is not None:
+            urllib3.util.connection.create_connection = self._original
+            self._original = None
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+class HttpClientRegistry:
+    """Сессии requests по хостам с общими настройками пула"""
+
+    def __init__(self, settings: Dict = None):
+        self.settings = dict(DEFAULT_SETTINGS)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+        self.dns_cache = DnsCache()
+        self.configure(settings or {})
+
+    def configure(self, settings: Dict):
+        """Новые настройки; уже созданные сессии закрываются"""
+        self.settings.update(settings)
+        self.dns_cache.ttl = self.settings['dns_ttl']
+        if self.settings['dns_ttl']:
+            self.dns_cache.install()
+        else:
+            self.dns_cache.uninstall()
+        self.close()
+
+    def session(self, host: str) -> requests.Session:
+        """Сессия хоста (создается при первом обращении)"""
+        session = self._sessions.get(host)
+        if session is not None:
+            return session
+
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.settings['pool_connections'],
+                    pool_maxsize=self.settings['pool_maxsize'],
+                    max_retries=0,  # повторы делает BaseParser.fetch
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers['Accept-Encoding'] = supported_encodings()
+                self._sessions[host] = session
+        return session
+
+    def session_for(self, url: str) -> requests.Session:
+        """Сессия хоста URL"""
+        return self.session(urlparse(url).netloc)
+
+    async def warm_up(self, urls: Iterable[str], timeout: float = 5):
+        """Открытие соединений к хостам заранее, чтобы первый запрос не ждал рукопожатия"""
+        if not self.settings['warm_up']:
+            return
+
+        origins = {}
+        for url in urls:
+            parsed = urlparse(url)
+            if parsed.scheme and parsed.netloc:
+                origins.setdefault(parsed.netloc, f"{parsed.scheme}://{parsed.netloc}/")
+
+        loop = asyncio.get_running_loop()
+
+        def touch(host: str, origin: str) -> Optional[str]:
+            started = time.monotonic()
+            try:
+                self.session(host).head(origin, timeout=timeout, allow_redirects=False)
+                return f"{host} {(time.monotonic() - started) * 1000:.0f} мс"
+            except requests.RequestException as e:
+                logger.warning(f"Не удалось открыть соединение с {host}: {e}")
+                return None
+
+        results = await asyncio.gather(*(
+            loop.run_in_executor(None, touch, host, origin) for host, origin in origins.items()
+        ))
+        ready = [r for r in results if r]
+        if ready:
+            logger.info(f"🔌 Соединения открыты заранее: {', '.join(ready)}")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Состояние пулов по хостам"""
+        result = {}
+        for host, session in list(self._sessions.items()):
+            adapter = session.get_adapter('https://')
+            pools = adapter.poolmanager.pools
+            connection_pools = [pools[key] for key in pools.keys()]
+            result[host] = {
+                'connections': sum(pool.num_connections for pool in connection_pools),
+                'requests': sum(pool.num_requests for pool in connection_pools),
+            }
+        return result
+
+    def close(self):
+        """Закрытие всех сессий"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+
+http_clients = HttpClientRegistry()
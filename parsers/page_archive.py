@@ -0,0 +1,337 @@
+"""
+Локальный архив загруженных страниц.
+
+Страницы хранятся сжатыми по хешу содержимого (одинаковые страницы
+лежат на диске один раз), индекс загрузок - в SQLite: источник, URL,
+время, статус и хеш. При превышении max_bytes удаляются самые старые
+загрузки и объекты, на которые больше никто не ссылается.
+"""
+
+import hashlib
+import logging
+import lzma
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = os.path.join('data', 'archive')
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+# Загрузок за один запрос при очистке архива
+EVICT_BATCH = 100
+
+CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+
+# Потоковые компрессоры для записи страницы по кускам
+STREAM_CODECS = {
+    'zlib': lambda: zlib.compressobj(6),
+    'lzma': lambda: lzma.LZMACompressor(preset=6),
+}
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS objects (
+        hash TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        raw_size INTEGER NOT NULL,
+        stored_size INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS fetches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        source TEXT,
+        url TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        status INTEGER,
+        hash TEXT NOT NULL REFERENCES objects(hash)
+    );
+    CREATE INDEX IF NOT EXISTS idx_fetches_source_time ON fetches (source, fetched_at);
+    CREATE INDEX IF NOT EXISTS idx_fetches_url_time ON fetches (url, fetched_at);
+    CREATE INDEX IF NOT EXISTS idx_fetches_hash ON fetches (hash);
+    CREATE INDEX IF NOT EXISTS idx_fetches_time ON fetches (fetched_at, id);
+"""
+
+
+class PageArchive:
+    """Сжатый архив страниц с адресацией по содержимому"""
+
+    def __init__(self, root: str = DEFAULT_ARCHIVE_DIR, codec: str = 'zlib', max_bytes: int = DEFAULT_MAX_BYTES):
+        if codec not in CODECS:
+            raise ValueError(f"Неизвестный кодек архива: {codec}")
+
+        self.root = root
+        self.codec = codec
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, 'index.sqlite')
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        with self._connect() as conn:
+            # WAL: долгое чтение (перепарсинг архива) не блокирует запись новых страниц
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Соединение с индексом: коммит по выходу из блока, затем закрытие"""
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _object_path(self, digest: str, codec: str) -> str:
+        """Файл объекта: objects/<первые 2 символа хеша>/<хеш>.<кодек>"""
+        return os.path.join(self.root, 'objects', digest[:2], f"{digest}.{codec}")
+
+    def store(self, source: Optional[str], url: str, body, status: int = 200,
+              fetched_at: float = None) -> str:
+        """Сохранение загруженной страницы, возвращает хеш содержимого"""
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        digest = hashlib.sha256(data).hexdigest()
+        fetched_at = fetched_at or time.time()
+
+        with self._lock:
+            with self._connect() as conn:
+                known = conn.execute("SELECT codec FROM objects WHERE hash = ?", (digest,)).fetchone()
+                if known is None:
+                    compress, _ = CODECS[self.codec]
+                    packed = compress(data)
+                    path = self._object_path(digest, self.codec)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = f"{path}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(packed)
+                    os.replace(tmp_path, path)
+
+                evicted = self._index(conn, known is None, source, url, status, fetched_at, digest, len(data),
+                                      len(packed) if known is None else 0)
+            self._remove_objects(evicted)
+
+        return digest
+
+    def writer(self, source: Optional[str], url: str, status: int = 200) -> 'PageWriter':
+        """Запись страницы по кускам без накопления всего тела в памяти"""
+        return PageWriter(self, source, url, status)
+
+    def _index(self, conn: sqlite3.Connection, new_object: bool, source: Optional[str], url: str,
+               status: int, fetched_at: float, digest: str, raw_size: int, stored_size: int) -> List[str]:
+        """Запись загрузки (и нового объекта) в индекс; возвращает файлы вытесненных объектов"""
+        if new_object:
+            conn.execute(
+                "INSERT INTO objects (hash, codec, raw_size, stored_size, created_at) VALUES (?, ?, ?, ?, ?)",
+                (digest, self.codec, raw_size, stored_size, fetched_at)
+            )
+
+        conn.execute(
+            "INSERT INTO fetches (source, url, fetched_at, status, hash) VALUES (?, ?, ?, ?, ?)",
+            (source, url, fetched_at, status, digest)
+        )
+
+        return self._evict(conn) if new_object else []
+
+    def load(self, digest: str) -> Optional[str]:
+        """HTML страницы по хешу"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT codec FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+
+        _, decompress = CODECS[row['codec']]
+        with open(self._object_path(digest, row['codec']), 'rb') as f:
+            return decompress(f.read()).decode('utf-8')
+
+    @staticmethod
+    def _filters(source: str = None, url: str = None, since: float = None, until: float = None):
+        """Условия WHERE для выборки загрузок"""
+        query = " WHERE 1 = 1"
+        params = []
+
+        if source:
+            query += " AND source = ?"
+            params.append(source)
+        if url:
+            query += " AND url = ?"
+            params.append(url)
+        if since:
+            query += " AND fetched_at >= ?"
+            params.append(since)
+        if until:
+            query += " AND fetched_at < ?"
+            params.append(until)
+
+        return query, params
+
+    def fetches(self, source: str = None, url: str = None, since: float = None, until: float = None,
+                after: tuple = None) -> Iterator[Dict]:
+        """Загрузки в порядке времени с фильтрами; after=(fetched_at, id) - продолжить после записи"""
+        where, params = self._filters(source, url, since, until)
+        if after:
+            where += " AND (fetched_at > ? OR (fetched_at = ? AND id > ?))"
+            params += [after[0], after[0], after[1]]
+
+        query = "SELECT id, source, url, fetched_at, status, hash FROM fetches" + where + " ORDER BY fetched_at, id"
+
+        with self._connect() as conn:
+            for row in conn.execute(query, params):
+                yield dict(row)
+
+    def count(self, source: str = None, url: str = None, since: float = None, until: float = None) -> int:
+        """Количество загрузок по тем же фильтрам"""
+        where, params = self._filters(source, url, since, until)
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM fetches" + where, params).fetchone()[0]
+
+    def latest(self, url: str) -> Optional[str]:
+        """Последняя сохраненная версия страницы"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT hash FROM fetches WHERE url = ? ORDER BY fetched_at DESC LIMIT 1", (url,)
+            ).fetchone()
+        return self.load(row['hash']) if row else None
+
+    def stats(self) -> Dict:
+        """Размер архива"""
+        with self._connect() as conn:
+            objects = conn.execute(
+                "SELECT COUNT(*) AS n, COALESCE(SUM(raw_size), 0) AS raw, "
+                "COALESCE(SUM(stored_size), 0) AS stored FROM objects"
+            ).fetchone()
+            fetches = conn.execute("SELECT COUNT(*) AS n FROM fetches").fetchone()
+        return {
+            'fetches': fetches['n'],
+            'objects': objects['n'],
+            'raw_bytes': objects['raw'],
+            'stored_bytes': objects['stored'],
+        }
+
+    def _evict(self, conn: sqlite3.Connection) -> List[str]:
+        """Удаление старых загрузок из индекса, пока архив больше max_bytes.
+
+        Файлы объектов не удаляются: их список возвращается, и удалять их
+        можно только после коммита (см. _remove_objects), иначе откат
+        оставит в индексе ссылки на несуществующие файлы.
+        """
+        total = conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM objects").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+
+        paths = []
+        while total > self.max_bytes:
+            # Самые старые загрузки небольшими порциями по индексу idx_fetches_time
+            oldest = conn.execute(
+                "SELECT id, hash FROM fetches ORDER BY fetched_at, id LIMIT ?", (EVICT_BATCH,)
+            ).fetchall()
+            if not oldest:
+                break
+
+            for row in oldest:
+                if total <= self.max_bytes:
+                    break
+
+                conn.execute("DELETE FROM fetches WHERE id = ?", (row['id'],))
+                still_used = conn.execute(
+                    "SELECT 1 FROM fetches WHERE hash = ? LIMIT 1", (row['hash'],)
+                ).fetchone()
+                if still_used:
+                    continue
+
+                obj = conn.execute(
+                    "SELECT codec, stored_size FROM objects WHERE hash = ?", (row['hash'],)
+                ).fetchone()
+                conn.execute("DELETE FROM objects WHERE hash = ?", (row['hash'],))
+                paths.append(self._object_path(row['hash'], obj['codec']))
+                total -= obj['stored_size']
+
+        logger.info(f"Архив страниц: удалено {len(paths)} старых страниц, размер {total / 1024 / 1024:.1f} МБ")
+        return paths
+
+    @staticmethod
+    def _remove_objects(paths: List[str]):
+        """Удаление файлов вытесненных объектов после коммита индекса (под блокировкой архива)"""
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class PageWriter:
+    """Потоковая запись страницы: хеш и сжатие считаются по мере поступления кусков"""
+
+    def __init__(self, archive: PageArchive, source: Optional[str], url: str, status: int):
+        self.archive = archive
+        self.source = source
+        self.url = url
+        self.status = status
+        self.fetched_at = time.time()
+        self.raw_size = 0
+        self.stored_size = 0
+        self._hash = hashlib.sha256()
+        self._compressor = STREAM_CODECS[archive.codec]()
+        self._tmp_path = os.path.join(archive.root, 'objects', f"tmp-{uuid.uuid4().hex}.{archive.codec}")
+        self._file = open(self._tmp_path, 'wb')
+
+    def write(self, chunk: bytes):
+        """Очередной кусок страницы"""
+        self._hash.update(chunk)
+        self.raw_size += len(chunk)
+        self._put(self._compressor.compress(chunk))
+
+    def _put(self, packed: bytes):
+        if packed:
+            self._file.write(packed)
+            self.stored_size += len(packed)
+
+    def commit(self) -> str:
+        """Завершение записи, возвращает хеш содержимого"""
+        self._put(self._compressor.flush())
+        self._file.close()
+        digest = self._hash.hexdigest()
+        archive = self.archive
+
+        with archive._lock:
+            with archive._connect() as conn:
+                known = conn.execute("SELECT codec FROM objects WHERE hash = ?", (digest,)).fetchone()
+                if known is None:
+                    path = archive._object_path(digest, archive.codec)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(self._tmp_path, path)
+                else:
+                    os.remove(self._tmp_path)
+
+                evicted = archive._index(conn, known is None, self.source, self.url, self.status,
+                                         self.fetched_at, digest, self.raw_size, self.stored_size)
+            archive._remove_objects(evicted)
+
+        return digest
+
+    def abort(self):
+        """Отмена записи недокачанной страницы"""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+_archive: Optional[PageArchive] = None
+
+
+def get_archive() -> PageArchive:
+    """Общий архив страниц процесса"""
+    global _archive
+    if _archive is None:
+        _archive = PageArchive()
+    return _archive
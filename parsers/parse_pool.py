@@ -0,0 +1,183 @@
+"""
+Разбор HTML страниц в пуле процессов.
+
+BeautifulSoup работает на чистом Python и занимает CPU; в процессе бота
+это задерживает обработку команд. В пул уходит только класс парсера,
+HTML и запомненные селекторы, обратно приходят кортежи полей товара.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from database.records import CompetitorProduct
+
+logger = logging.getLogger(__name__)
+
+# Порядок полей товара в кортежах, которые возвращают процессы пула
+PRODUCT_FIELDS = ('name', 'price', 'competitor', 'url', 'in_stock', 'weight', 'package')
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+# Экземпляры парсеров и архивов внутри процесса пула
+_worker_parsers = {}
+_worker_archives = {}
+
+
+def available_cores() -> int:
+    """Количество ядер, доступных процессу"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def product_to_tuple(product: CompetitorProduct) -> tuple:
+    """Товар в компактный кортеж для передачи между процессами"""
+    return tuple(getattr(product, field) for field in PRODUCT_FIELDS)
+
+
+def tuple_to_product(row: tuple) -> CompetitorProduct:
+    """Кортеж из пула обратно в запись товара"""
+    return CompetitorProduct(**dict(zip(PRODUCT_FIELDS, row)))
+
+
+def _worker_parser(parser_class, remembered: Dict[str, str], engine: str = None, config: Dict = None):
+    """Парсер процесса пула с настройками, селекторами и движком от основного процесса"""
+    config = config or {}
+    parser = _worker_parsers.get(parser_class)
+    if parser is None or parser.config != config:
+        # Разделы, адреса каталога и селекторы из PARSERS_CONFIG - как у парсера бота
+        parser = _worker_parsers[parser_class] = parser_class(config=config)
+    parser.html_engine = engine or parser_class.html_engine
+
+    # Запомненные селекторы приходят от основного процесса, диск не трогаем
+    parser.selector_memo.prime(parser.source, remembered)
+    return parser
+
+
+def parse_in_worker(parser_class, html: str, remembered: Dict[str, str], engine: str = None,
+                    config: Dict = None) -> Tuple[List[tuple], Dict[str, str]]:
+    """Выполняется в процессе пула: разбор страницы в кортежи товаров"""
+    parser = _worker_parser(parser_class, remembered, engine, config)
+    products, selectors = parser.parse_page_with_selectors(html)
+    return [product_to_tuple(p) for p in products], selectors
+
+
+def parse_archived_in_worker(parser_class, archive_root: str, digest: str, remembered: Dict[str, str],
+                             engine: str = None, config: Dict = None, product_url: str = None) -> List[tuple]:
+    """Выполняется в процессе пула: разбор страницы из архива по хешу.
+
+    HTML читается из архива внутри процесса пула, между процессами
+    передаются только хеш и готовые кортежи. product_url - страница
+    отдельного товара (parse_product_page), а не раздела каталога.
+    """
+    from .page_archive import PageArchive
+
+    archive = _worker_archives.get(archive_root)
+    if archive is None:
+        archive = _worker_archives[archive_root] = PageArchive(archive_root)
+
+    html = archive.load(digest)
+    if not html:
+        return []
+
+    parser = _worker_parser(parser_class, remembered, engine, config)
+    if product_url:
+        product = parser.parse_product_page(html, product_url)
+        return [product_to_tuple(product)] if product else []
+    products = parser.parse_page(html)
+    return [product_to_tuple(p) for p in products]
+
+
+def parse_detail_in_worker(parser_class, html: str, engine: str = None, config: Dict = None) -> Dict:
+    """Выполняется в процессе пула: данные со страницы товара"""
+    parser = _worker_parser(parser_class, {}, engine, config)
+    return parser.parse_detail_page(html)
+
+
+def parse_product_in_worker(parser_class, html: str, url: str, engine: str = None,
+                            config: Dict = None) -> Optional[tuple]:
+    """Выполняется в процессе пула: товар со страницы товара"""
+    parser = _worker_parser(parser_class, {}, engine, config)
+    product = parser.parse_product_page(html, url)
+    return product_to_tuple(product) if product else None
+
+
+def get_executor(max_workers: int = None) -> ProcessPoolExecutor:
+    """Общий пул процессов, создается при первом использовании"""
+    global _executor
+    if _executor is None:
+        workers = max_workers or available_cores()
+        # spawn: дочерние процессы не наследуют потоки и соединения бота
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        logger.info(f"Пул разбора HTML запущен: {workers} процессов")
+    return _executor
+
+
+async def parse_page(parser, html: str) -> Tuple[List[Dict], Dict[str, str]]:
+    """Разбор страницы парсером в пуле процессов; при сбое пула - в текущем процессе.
+
+    Возвращает товары и селекторы, которые их дали.
+    """
+    global _executor
+    remembered = parser.selector_memo.get(parser.source)
+    loop = asyncio.get_running_loop()
+
+    try:
+        rows, selectors = await loop.run_in_executor(
+            get_executor(), parse_in_worker, type(parser), html, remembered, parser.html_engine,
+            parser.config)
+    except (BrokenProcessPool, OSError) as e:
+        logger.error(f"Пул разбора HTML недоступен ({e}), разбираем в основном процессе")
+        _executor = None
+        return parser.parse_page_with_selectors(html)
+
+    return [tuple_to_product(row) for row in rows], selectors
+
+
+async def parse_detail(parser, html: str) -> Dict:
+    """Разбор страницы товара в пуле процессов; при сбое пула - в текущем процессе"""
+    global _executor
+    loop = asyncio.get_running_loop()
+
+    try:
+        return await loop.run_in_executor(
+            get_executor(), parse_detail_in_worker, type(parser), html, parser.html_engine, parser.config)
+    except (BrokenProcessPool, OSError) as e:
+        logger.error(f"Пул разбора HTML недоступен ({e}), разбираем в основном процессе")
+        _executor = None
+        return parser.parse_detail_page(html)
+
+
+async def parse_product(parser, html: str, url: str) -> Optional[Dict]:
+    """Разбор страницы товара целиком в пуле процессов; при сбое пула - в текущем процессе"""
+    global _executor
+    loop = asyncio.get_running_loop()
+
+    try:
+        row = await loop.run_in_executor(
+            get_executor(), parse_product_in_worker, type(parser), html, url, parser.html_engine,
+            parser.config)
+    except (BrokenProcessPool, OSError) as e:
+        logger.error(f"Пул разбора HTML недоступен ({e}), разбираем в основном процессе")
+        _executor = None
+        return parser.parse_product_page(html, url)
+
+    return tuple_to_product(row) if row else None
+
+
+def shutdown():
+    """Остановка пула"""
+    global _executor
+    if _executor is not None:
+        if sys.version_info >= (3, 9):
+            _executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            # cancel_futures появился в 3.9; в 3.8 пул дожидается уже поставленных задач
+            _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 2
+
+# Ответы, на которые сайт просит сбавить темп
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: число или HTTP-дата"""
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Токен-бакет одного хоста с подстройкой скорости под ответы сайта"""
+
+    def __init__(self, rate: float, burst: int, min_rate: float = None):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate or rate / 16
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Забирает токен и возвращает, сколько секунд ждать до запроса.
+
+        Токены могут уходить в минус: так параллельные запросы встают
+        в очередь без блокировок, каждый со своим временем старта.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def throttle(self, retry_after: Optional[float]):
+        """Сайт ответил 429/503: вдвое снижаем скорость и ждем Retry-After"""
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            # Ожидание уже учтено в blocked_until, копить долг не нужно
+            self.tokens = max(self.tokens, 0.0)
+
+    def recover(self):
+        """Успешный ответ: плавно возвращаемся к настроенной скорости"""
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate * 1.25)
+
+
+class HostRateLimiter:
+    """Общий лимитер запросов по хостам для всех парсеров"""
+
+    def __init__(self, default_rate: float = DEFAULT_RATE, default_burst: int = DEFAULT_BURST):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def configure(self, host: str, rate: float = None, burst: int = None):
+        """Настройка скорости хоста (запросов в секунду и размер всплеска)"""
+        rate = rate or self.default_rate
+        burst = burst or self.default_burst
+
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            self.buckets[host] = TokenBucket(rate, burst)
+        elif bucket.base_rate != rate or bucket.burst != burst:
+            bucket.base_rate = bucket.rate = rate
+            bucket.burst = burst
+            bucket.min_rate = rate / 16
+
+    def bucket(self, host: str) -> TokenBucket:
+        """Бакет хоста, создается с настройками по умолчанию"""
+        if host not in self.buckets:
+            self.configure(host)
+        return self.buckets[host]
+
+    async def acquire(self, host: str):
+        """Ожидание разрешения на запрос к хосту"""
+        wait = self.bucket(host).reserve()
+        if wait > 0:
+            logger.debug(f"Лимит {host}: ждем {wait:.2f} сек")
+            await asyncio.sleep(wait)
+
+    def observe(self, host: str, status: int, retry_after: Optional[str] = None):
+        """Учет ответа сайта для подстройки скорости"""
+        bucket = self.bucket(host)
+        if status in THROTTLE_STATUSES:
+            delay = parse_retry_after(retry_after)
+            bucket.throttle(delay)
+            logger.warning(f"{host} ответил {status}, снижаем скорость до {bucket.rate:.2f} зап/сек"
+                           + (f", пауза {delay:.0f} сек" if delay else ""))
+        elif status < 400:
+            bucket.recover()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Текущие скорости по хостам"""
+        return {
+            host: {'rate': round(b.rate, 3), 'base_rate': b.base_rate, 'burst': b.burst}
+            for host, b in self.buckets.items()
+        }
+
+
+# Один лимитер на процесс: парсеры одного хоста делят его бюджет
+rate_limiter = HostRateLimiter()
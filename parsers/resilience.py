@@ -0,0 +1,141 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых есть смысл повторить запрос
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class CircuitOpenError(Exception):
+    """Сайт временно отключен предохранителем"""
+
+
+class RetryPolicy:
+    """Повторы с экспоненциальной задержкой и случайным разбросом (full jitter)"""
+
+    def __init__(self, retries: int = 2, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Пауза перед повтором номер attempt (с нуля)"""
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0, cap)
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """Предохранитель сайта: после серии сбоев перестает ходить на сайт.
+
+    После reset_timeout пропускается один пробный запрос; пока он не
+    завершился, остальные запросы отклоняются.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 900,
+                 probe_timeout: float = 120):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # Пробный запрос, не сообщивший результат (отменен), через столько секунд уступает место новому
+        self.probe_timeout = probe_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+
+    def _probe_busy(self, now: float) -> bool:
+        return self.probe_started_at is not None and now - self.probe_started_at < self.probe_timeout
+
+    @property
+    def is_open(self) -> bool:
+        """Запросы сейчас не пропускаются: ждем reset_timeout или результата пробного запроса"""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            return now - self.opened_at < self.reset_timeout
+        return self.state == self.HALF_OPEN and self._probe_busy(now)
+
+    def allow_request(self) -> bool:
+        """Можно ли отправить запрос; после reset_timeout - только один пробный"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                logger.info(f"Предохранитель {self.name}: пробный запрос")
+            elif self._probe_busy(now):
+                return False
+
+            self.probe_started_at = now
+            return True
+
+    def retry_in(self) -> float:
+        """Сколько секунд до пробного запроса"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        """Успешный запрос закрывает предохранитель"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Предохранитель {self.name}: сайт снова доступен")
+            self.failures = 0
+            self.state = self.CLOSED
+            self.opened_at = None
+            self.probe_started_at = None
+
+    def record_failure(self):
+        """Неудачный запрос (после всех повторов)"""
+        with self._lock:
+            self.failures += 1
+            self.probe_started_at = None
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                logger.warning(f"Предохранитель {self.name}: сайт отключен на {self.reset_timeout:.0f} сек "
+                               f"после {self.failures} сбоев подряд")
+
+    def record_neutral(self):
+        """Ответ, не говорящий о здоровье сайта (404 и другие 4xx): счетчик сбоев не сбрасывается.
+
+        Пробный запрос освобождает место, предохранитель остается полуоткрытым.
+        """
+        with self._lock:
+            self.probe_started_at = None
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Предохранитель конкурента, общий для всех экземпляров парсера"""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name, **kwargs)
+    return _breakers[name]
+
+
+def breaker_states() -> Dict[str, Dict]:
+    """Состояние всех предохранителей"""
+    return {
+        name: {'state': b.state, 'failures': b.failures, 'retry_in': round(b.retry_in())}
+        for name, b in _breakers.items()
+    }
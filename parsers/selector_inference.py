@@ -0,0 +1,267 @@
+"""
+Автоматический подбор селекторов по сохраненной HTML странице.
+
+Кандидаты в контейнеры товаров оцениваются по повторяемости класса,
+доле элементов с ценой в тексте и доле элементов со ссылкой. Внутри
+лучшего контейнера так же подбираются селекторы названия, цены и ссылки.
+Результат сохраняется профилем в parsers/profiles/<source>.json и
+подгружается парсером при запуске.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+PROFILES_DIR = os.path.join(os.path.dirname(__file__), 'profiles')
+
+# 795 ₽, 1 200 руб., 450р, 99.90 RUB
+PRICE_RE = re.compile(r'\d[\d\s ]*(?:[.,]\d{1,2})?\s*(?:₽|руб|р\.|р\b|rub)', re.IGNORECASE)
+
+MIN_REPEATS = 3
+# Сколько лучших кандидатов проверяется по внутренней структуре
+STRUCTURE_CANDIDATES = 10
+HEADING_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5']
+
+
+def has_price(text: str) -> bool:
+    """Похож ли текст на цену"""
+    return bool(PRICE_RE.search(text))
+
+
+def is_real_link(href: Optional[str]) -> bool:
+    """Ссылка ведет на страницу, а не на javascript/якорь"""
+    if not href:
+        return False
+    href = href.strip()
+    return bool(href) and not href.startswith(('#', 'javascript:', 'mailto:', 'tel:'))
+
+
+def class_selector(class_name: str) -> str:
+    """CSS селектор по имени класса"""
+    return f".{class_name}"
+
+
+def score_containers(soup) -> List[Dict]:
+    """Оценка кандидатов в контейнеры товаров"""
+    groups = defaultdict(list)
+    for element in soup.find_all(class_=True):
+        for class_name in element.get('class', []):
+            groups[class_name].append(element)
+
+    candidates = []
+    for order, (class_name, elements) in enumerate(groups.items()):
+        count = len(elements)
+        if count < MIN_REPEATS:
+            continue
+
+        texts = [e.get_text(' ', strip=True) for e in elements]
+        price_density = sum(1 for t in texts if has_price(t)) / count
+        if price_density == 0:
+            continue
+
+        link_density = sum(1 for e in elements if any(
+            is_real_link(a.get('href')) for a in e.find_all('a', href=True))) / count
+
+        # Контейнер с одной ценой лучше обертки над всем списком
+        multi_price = sum(1 for t in texts if len(PRICE_RE.findall(t)) > 3) / count
+
+        score = math.log(count) * price_density * (0.5 + 0.5 * link_density) * (1 - 0.5 * multi_price)
+        candidates.append({
+            'selector': class_selector(class_name),
+            'score': score,
+            'count': count,
+            'price_density': round(price_density, 3),
+            'link_density': round(link_density, 3),
+            'order': order,
+            'elements': elements,
+        })
+
+    candidates.sort(key=lambda c: -c['score'])
+    for candidate in candidates[:STRUCTURE_CANDIDATES]:
+        check_structure(candidate)
+
+    # При равной оценке - контейнер, к которому относятся классы полей (BEM-блок),
+    # затем внешний - он раньше в документе
+    candidates.sort(key=lambda c: (-round(c['score'], 4), -c.get('block', 0), c['order']))
+    for candidate in candidates:
+        candidate['score'] = round(candidate['score'], 4)
+        del candidate['elements']
+    return candidates
+
+
+def check_structure(candidate: Dict):
+    """Штраф кандидату, у части элементов которого нет лучших селекторов названия и ссылки.
+
+    Промо-баннер с тем же классом, что и карточки, содержит цену и ссылку,
+    но не название товара - без проверки он попадает в товары.
+    """
+    elements = candidate['elements']
+    fields = score_fields(elements)
+    required = [fields[field][0]['selector'] for field in ('name', 'link') if fields[field]]
+    if not required:
+        candidate['consistency'] = 0.0
+        candidate['score'] = 0.0
+        return
+
+    consistent = sum(1 for e in elements if all(e.select_one(selector) is not None for selector in required))
+    candidate['consistency'] = round(consistent / len(elements), 3)
+    candidate['score'] *= consistent / len(elements)
+
+    # Названия вида .products-card__title - элементы блока .products-card
+    prefix = candidate['selector'] + '__'
+    candidate['block'] = sum(1 for selector in required if selector.startswith(prefix))
+
+
+def _descendant_selectors(container) -> List[str]:
+    """Селекторы-кандидаты внутри одного контейнера"""
+    selectors = []
+    for element in container.find_all(True):
+        for class_name in element.get('class', []):
+            selectors.append(class_selector(class_name))
+        if element.name in HEADING_TAGS:
+            selectors.append(element.name)
+    return selectors
+
+
+def score_fields(containers: list) -> Dict[str, List[Dict]]:
+    """Оценка селекторов названия, цены и ссылки внутри контейнеров"""
+    total = len(containers)
+    seen = Counter()
+    for container in containers:
+        seen.update(set(_descendant_selectors(container)))
+
+    fields = {'name': [], 'price': [], 'link': []}
+
+    for selector, present in seen.items():
+        coverage = present / total
+        if coverage < 0.5:
+            continue
+
+        name_hits = price_hits = link_hits = 0
+        text_lengths = []
+        nested = 0
+        name_texts = set()
+        hrefs = set()
+
+        for container in containers:
+            elements = container.select(selector)
+            if not elements:
+                continue
+            element = elements[0]
+            text = element.get_text(' ', strip=True)
+            text_lengths.append(len(text))
+            nested += len(element.find_all(True))
+
+            if has_price(text):
+                price_hits += 1
+            elif len(text) >= 5 and re.search(r'[A-Za-zА-Яа-я]', text):
+                name_hits += 1
+                name_texts.add(text)
+
+            link = element if element.name == 'a' else element.find('a', href=True)
+            if link is not None and is_real_link(link.get('href')):
+                link_hits += 1
+                hrefs.add(link['href'])
+
+        avg_length = sum(text_lengths) / len(text_lengths) if text_lengths else 0
+        # При равной оценке точнее элемент с меньшим числом вложенных тегов
+        size = nested / len(text_lengths) if text_lengths else 0
+
+        if price_hits:
+            # Чем короче текст, тем точнее селектор указывает на саму цену
+            specificity = 1 / (1 + avg_length / 20)
+            fields['price'].append({'selector': selector, 'score': round(price_hits / total * specificity, 4),
+                                    'size': size})
+
+        if name_hits and 10 <= avg_length <= 200:
+            # Названия у товаров разные, подписи вроде "В один клик" одинаковые
+            distinctness = len(name_texts) / name_hits
+            specificity = 1 / (1 + avg_length / 100)
+            hint = 1.5 if selector in HEADING_TAGS or any(
+                word in selector.lower() for word in ('title', 'name')) else 1.0
+            score = name_hits / total * distinctness * specificity * hint
+            fields['name'].append({'selector': selector, 'score': round(score, 4), 'size': size})
+
+        if link_hits:
+            # Ссылки должны вести на разные товары
+            uniqueness = len(hrefs) / link_hits
+            fields['link'].append({'selector': selector, 'score': round(link_hits / total * uniqueness, 4),
+                                   'size': size})
+
+    for candidates in fields.values():
+        # При равной оценке - меньший элемент; size нужен только для сортировки
+        candidates.sort(key=lambda c: (-c['score'], c['size']))
+        for candidate in candidates:
+            del candidate['size']
+
+    return fields
+
+
+def infer_profile(html: str, source: str) -> Optional[Dict]:
+    """Построение профиля селекторов по HTML странице каталога"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    containers = score_containers(soup)
+    if not containers:
+        logger.warning(f"{source}: не найдено кандидатов в контейнеры товаров")
+        return None
+
+    best = containers[0]
+    fields = score_fields(soup.select(best['selector']))
+
+    profile = {
+        'source': source,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'container': best['selector'],
+        'scores': {
+            'container': [{k: c[k] for k in ('selector', 'score', 'count', 'price_density', 'link_density',
+                                             'consistency') if k in c}
+                          for c in containers[:5]],
+        },
+    }
+
+    for field, candidates in fields.items():
+        profile[field] = candidates[0]['selector'] if candidates else None
+        profile['scores'][field] = candidates[:5]
+
+    return profile
+
+
+def profile_path(source: str) -> str:
+    """Путь к файлу профиля сайта"""
+    return os.path.join(PROFILES_DIR, f"{source}.json")
+
+
+def save_profile(profile: Dict) -> str:
+    """Сохранение профиля сайта"""
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    path = profile_path(profile['source'])
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_profile(source: str) -> Dict:
+    """Загрузка профиля сайта, пустой словарь если профиля нет"""
+    if not source:
+        return {}
+
+    path = profile_path(source)
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось загрузить профиль {path}: {e}")
+        return {}
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMO_PATH = os.path.join('data', 'selector_memo.json')
+
+
+class SelectorMemo:
+    """Запоминает селекторы, которые последними дали валидные товары"""
+
+    def __init__(self, path: str = DEFAULT_MEMO_PATH):
+        self.path = path
+        self._data = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        """Чтение сохраненных селекторов с диска"""
+        if not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Не удалось прочитать {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        """Атомарная запись на диск"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, source: str) -> Dict[str, str]:
+        """Запомненные селекторы сайта: {'container': ..., 'name': ..., 'price': ...}"""
+        return dict(self._data.get(source, {}))
+
+    def order(self, source: str, field: str, selectors: List[str]) -> List[str]:
+        """Список селекторов, где запомненный стоит первым"""
+        remembered = self._data.get(source, {}).get(field)
+        if not remembered:
+            return list(selectors)
+        return [remembered] + [s for s in selectors if s != remembered]
+
+    def prime(self, source: str, selectors: Dict[str, str]):
+        """Подстановка селекторов в память без записи на диск (для процессов пула)"""
+        if selectors:
+            self._data[source] = dict(selectors)
+        else:
+            self._data.pop(source, None)
+
+    def remember(self, source: str, selectors: Dict[str, str]):
+        """Сохранение селекторов, давших валидные товары"""
+        selectors = {field: sel for field, sel in selectors.items() if sel}
+        if not source or not selectors or self._data.get(source) == selectors:
+            return
+
+        # Перечитываем файл, чтобы не затереть записи других парсеров
+        self._data = self._load()
+        self._data[source] = selectors
+
+        try:
+            self._save()
+            logger.info(f"Запомнены селекторы для {source}: {selectors}")
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить селекторы {source}: {e}")
+
+    def forget(self, source: str):
+        """Сброс запомненных селекторов сайта"""
+        self._data = self._load()
+        if self._data.pop(source, None) is not None:
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Не удалось сбросить селекторы {source}: {e}")
@@ -0,0 +1,157 @@
+"""
+Поиск новых и измененных товаров по карте сайта (sitemap.xml).
+
+Карта читается потоково: куски ответа подаются в XMLPullParser lxml,
+каждая разобранная запись <url> сразу удаляется из дерева, поэтому даже
+карта на десятки тысяч адресов не держится в памяти целиком. По <lastmod>
+отбираются только адреса, добавленные или измененные с прошлого обхода;
+вложенные карты (sitemapindex) без изменений не загружаются.
+"""
+
+import asyncio
+import logging
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# (вид записи: 'url' или 'sitemap', адрес, lastmod)
+Entry = Tuple[str, str, Optional[datetime]]
+
+
+def parse_lastmod(text: Optional[str]) -> Optional[datetime]:
+    """<lastmod> (W3C Datetime) в наивное время UTC, как хранится в MySQL"""
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        value = datetime.fromisoformat(text[:-1] + '+00:00' if text.endswith('Z') else text)
+    except ValueError:
+        logger.debug(f"Непонятный lastmod в карте сайта: {text}")
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def is_changed(known: Dict[str, Optional[datetime]], url: str, lastmod: Optional[datetime]) -> bool:
+    """Адрес новый или его lastmod новее сохраненного"""
+    if url not in known:
+        return True
+    stored = known[url]
+    return lastmod is not None and (stored is None or lastmod > stored)
+
+
+class SitemapReader:
+    """Инкрементальный разбор карты сайта: feed(кусок) -> записи.
+
+    Сжатые карты (sitemap.xml.gz) распознаются по первым байтам.
+    """
+
+    def __init__(self):
+        self._parser = etree.XMLPullParser(events=('end',), resolve_entities=False, no_network=True,
+                                           huge_tree=True)
+        self._gunzip = None
+        self._started = False
+
+    def feed(self, chunk: bytes) -> List[Entry]:
+        if not self._started:
+            self._started = True
+            if chunk[:2] == b'\x1f\x8b':
+                self._gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._gunzip:
+            chunk = self._gunzip.decompress(chunk)
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self) -> List[Entry]:
+        if self._gunzip:
+            self._parser.feed(self._gunzip.flush())
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[Entry]:
+        entries = []
+        for _, elem in self._parser.read_events():
+            kind = etree.QName(elem).localname
+            if kind not in ('url', 'sitemap'):
+                continue
+
+            loc = lastmod = None
+            for child in elem:
+                name = etree.QName(child).localname
+                if name == 'loc' and child.text:
+                    loc = child.text.strip()
+                elif name == 'lastmod':
+                    lastmod = parse_lastmod(child.text)
+            if loc:
+                entries.append((kind, loc, lastmod))
+
+            # Разобранная запись и предыдущие соседи больше не нужны
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return entries
+
+
+async def read_sitemap(parser, url: str, known: Dict[str, Optional[datetime]]) -> Tuple[List, List, int]:
+    """Одна карта: измененные адреса товаров, измененные вложенные карты, всего записей"""
+    response = await parser.fetch(url, stream=True)
+
+    def read():
+        products, sitemaps = [], []
+        total = 0
+        try:
+            response.raise_for_status()
+            reader = SitemapReader()
+
+            def take(entries: List[Entry]):
+                nonlocal total
+                for kind, loc, lastmod in entries:
+                    total += 1
+                    if kind == 'sitemap':
+                        # Карта без lastmod перечитывается каждый раз
+                        if lastmod is None or is_changed(known, loc, lastmod):
+                            sitemaps.append((loc, lastmod))
+                    elif parser.is_sitemap_product(loc) and is_changed(known, loc, lastmod):
+                        products.append((loc, lastmod))
+
+            for chunk in response.iter_content(parser.stream_chunk_size):
+                take(reader.feed(chunk))
+            take(reader.close())
+        finally:
+            response.close()
+        return products, sitemaps, total
+
+    return await asyncio.get_running_loop().run_in_executor(None, read)
+
+
+async def discover(parser, known: Dict[str, Optional[datetime]]) -> Dict:
+    """Новые и измененные товары из карты сайта парсера.
+
+    known - сохраненные lastmod адресов (товаров и вложенных карт).
+    Результат: {'products': [(адрес, lastmod)], 'sitemaps': [(адрес, lastmod)], 'listed': записей}
+    """
+    result = {'products': [], 'sitemaps': [], 'listed': 0}
+    pending = [parser.sitemap_url]
+    visited = set()
+
+    while pending:
+        url = pending.pop(0)
+        if url in visited:
+            continue
+        visited.add(url)
+
+        products, sitemaps, total = await read_sitemap(parser, url, known)
+        result['products'].extend(products)
+        result['listed'] += total
+        for child in sitemaps:
+            result['sitemaps'].append(child)
+            pending.append(child[0])
+
+    logger.info(f"🗺 {parser.name}: в карте сайта {result['listed']} записей, "
+                f"новых или измененных товаров {len(result['products'])}")
+    return result
@@ -0,0 +1,152 @@
+"""
+Потоковый разбор страницы каталога.
+
+Куски ответа подаются в инкрементальный парсер lxml по мере загрузки.
+Когда закрывается контейнер товара, его поддерево разбирается обычным
+parse_product_container и сразу удаляется из дерева, поэтому в памяти
+держится только текущая карточка, а не вся страница.
+
+Поддерживаются простые селекторы контейнера: tag, .class, tag.class1.class2.
+"""
+
+import logging
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+SIMPLE_SELECTOR_RE = re.compile(r'^([a-zA-Z][\w-]*)?((?:\.[\w-]+)*)$')
+
+
+def compile_selector(selector: str) -> Optional[Tuple[Optional[str], frozenset]]:
+    """Простой CSS селектор в (тег, классы); None, если селектор сложнее"""
+    match = SIMPLE_SELECTOR_RE.match(selector.strip()) if selector else None
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    classes = frozenset(c for c in match.group(2).split('.') if c)
+    return match.group(1), classes
+
+
+def element_matches(elem, compiled: Tuple[Optional[str], frozenset]) -> bool:
+    """Подходит ли элемент lxml под скомпилированный селектор"""
+    tag, classes = compiled
+    if tag and elem.tag != tag:
+        return False
+    if classes and not classes <= set((elem.get('class') or '').split()):
+        return False
+    return True
+
+
+class StreamingPageParser:
+    """Инкрементальный разбор: feed() кусков, товары по мере закрытия контейнеров"""
+
+    def __init__(self, parser, selectors: List[str]):
+        self.parser = parser
+        self.matchers = []
+        for selector in selectors:
+            compiled = compile_selector(selector)
+            if compiled and selector not in (s for s, _ in self.matchers):
+                self.matchers.append((selector, compiled))
+
+        # Селектор, давший первый валидный товар; дальше проверяется только он
+        self.selector = None
+        self.products = 0
+        # Селекторы полей, давшие товары; заполняются в close()
+        self.selectors = {}
+        self._hits = {'name': Counter(), 'price': Counter(), 'link': Counter()}
+        self._pull = etree.HTMLPullParser(events=('end',), encoding='utf-8')
+
+    @property
+    def can_stream(self) -> bool:
+        """Есть ли селекторы, которые можно проверять потоково"""
+        return bool(self.matchers)
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        """Очередной кусок ответа; возвращает товары из закрывшихся контейнеров"""
+        self._pull.feed(chunk)
+        return self._drain()
+
+    def close(self) -> List[Dict]:
+        """Конец ответа: оставшиеся товары и итоговые селекторы в selectors"""
+        try:
+            self._pull.close()
+        except etree.XMLSyntaxError:
+            pass
+        products = self._drain()
+
+        if self.products:
+            self.selectors = {'container': self.selector}
+            for field, counter in self._hits.items():
+                if counter:
+                    self.selectors[field] = counter.most_common(1)[0][0]
+        return products
+
+    def _match(self, elem) -> Optional[str]:
+        """Селектор контейнера, под который подходит элемент"""
+        if self.selector:
+            return self.selector if element_matches(elem, self.matchers[0][1]) else None
+        for selector, compiled in self.matchers:
+            if element_matches(elem, compiled):
+                return selector
+        return None
+
+    def _drain(self) -> List[Dict]:
+        """Разбор закрывшихся элементов"""
+        products = []
+        for _, elem in self._pull.read_events():
+            if not isinstance(elem.tag, str):
+                continue
+
+            selector = self._match(elem)
+            if selector is None:
+                continue
+
+            product = self._parse_element(elem)
+            if product is None:
+                continue
+
+            if self.selector is None:
+                self.selector = selector
+                self.matchers = [m for m in self.matchers if m[0] == selector]
+                logger.info(f"{self.parser.name}: потоковый разбор по селектору {selector}")
+
+            products.append(product)
+            self.products += 1
+            self._discard(elem)
+
+        return products
+
+    def _parse_element(self, elem) -> Optional[Dict]:
+        """Карточка товара из поддерева через обычный parse_product_container"""
+        html = etree.tostring(elem, encoding='unicode', method='html')
+        container = BeautifulSoup(html, 'html.parser').find(elem.tag)
+        if container is None:
+            return None
+
+        self.parser._field_hits = {}
+        try:
+            product = self.parser.parse_product_container(container)
+        except Exception as e:
+            logger.error(f"Ошибка парсинга товара {self.parser.name}: {e}")
+            return None
+
+        if not product or not self.parser.validate_product(product):
+            return None
+
+        for field, field_selector in self.parser._field_hits.items():
+            self._hits[field][field_selector] += 1
+        return product
+
+    @staticmethod
+    def _discard(elem):
+        """Удаление разобранной карточки и уже пройденных соседей из дерева"""
+        elem.clear()
+        parent = elem.getparent()
+        if parent is None:
+            return
+        while elem.getprevious() is not None:
+            del parent[0]
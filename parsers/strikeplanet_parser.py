@@ -1,5 +1,5 @@
 from .base_parser import BaseParser
-from bs4 import BeautifulSoup
+from database.records import CompetitorProduct
 import logging
 from typing import List, Dict
 import re
@@ -9,95 +9,73 @@ logger = logging.getLogger(__name__)
 
 
 class StrikePlanetParser(BaseParser):
-    def __init__(self):
-        super().__init__("StrikePlanet")
+    source = 'strikeplanet'
+
+    # Более гибкие селекторы для StrikePlanet
+    product_selectors = [
+        '.catalog-item',
+        '.product-item',
+        '.item',
+        '.product',
+        '.goods-item',
+        '.catalog-section-item'
+    ]
+
+    name_selectors = [
+        '.catalog-item-name',
+        '.product-name',
+        '.item-title',
+        '.name',
+        'h1', 'h2', 'h3', 'h4',
+        '.title'
+    ]
+
+    price_selectors = [
+        '.catalog-item-price',
+        '.price',
+        '.cost',
+        '.item-price',
+        '.price_value'
+    ]
+
+    default_categories = [
+        {'name': 'shary', 'url': "https://strikeplanet.ru/catalog/raskhodniki/straykbolnye-shary/"},
+    ]
+
+    def __init__(self, config: Dict = None):
+        super().__init__("StrikePlanet", config)
         self.base_url = "https://strikeplanet.ru"
-        self.catalog_url = "https://strikeplanet.ru/catalog/raskhodniki/straykbolnye-shary/"
         self.page_param = "?PAGEN_1="
 
-    def parse_products(self) -> List[Dict]:
+    async def parse_products(self) -> List[Dict]:
         """Парсинг всех товаров с пагинацией"""
         all_products = []
 
-        # Парсим только первую страницу для теста
-        logger.info(f"Парсинг страницы: {self.catalog_url}")
+        if not self.is_available():
+            return []
 
-        html = self.get_page(self.catalog_url)
-        if not html:
-            logger.error(f"Не удалось загрузить страницу")
+        # Первые страницы разделов каталога
+        products = await self.fetch_categories()
+        if not products:
             return []
 
-        products = self.parse_page(html)
-        all_products.extend(products)
+        all_products.extend(await self.enrich_products(products))
 
         logger.info(f"Всего найдено товаров: {len(all_products)}")
         return all_products
 
-    def parse_page(self, html: str) -> List[Dict]:
-        """Парсинг одной страницы"""
-        soup = BeautifulSoup(html, 'html.parser')
-        products = []
-
-        # Более гибкие селекторы для StrikePlanet
-        product_selectors = [
-            '.catalog-item',
-            '.product-item',
-            '.item',
-            '.product',
-            '.goods-item',
-            '.catalog-section-item'
-        ]
-
-        product_containers = None
-        for selector in product_selectors:
-            product_containers = soup.select(selector)
-            if product_containers:
-                logger.info(f"Найден селектор товаров: {selector}, найдено: {len(product_containers)}")
-                break
-
-        if not product_containers:
-            logger.warning("Не найден селектор для товаров, пробуем альтернативный поиск")
-            # Альтернативный поиск по структуре
-            product_containers = soup.find_all('div', class_=lambda x: x and any(
-                word in str(x).lower() for word in ['item', 'product', 'card', 'goods']))
-            logger.info(f"Альтернативный поиск: найдено {len(product_containers)} контейнеров")
-
-        for container in product_containers:
-            try:
-                product = self.parse_product_container(container)
-                if product and self.validate_product(product):
-                    products.append(product)
-            except Exception as e:
-                logger.error(f"Ошибка парсинга товара: {e}")
-                continue
-
-        return products
-
-    def parse_product_container(self, container) -> Dict:
+    def parse_product_container(self, container) -> CompetitorProduct:
         """Парсинг отдельного товара"""
         # Название товара
         name = None
-        url = None
 
         # Ищем название различными способами
-        name_selectors = [
-            '.catalog-item-name',
-            '.product-name',
-            '.item-title',
-            '.name',
-            'h1', 'h2', 'h3', 'h4',
-            '.title'
-        ]
-
-        for selector in name_selectors:
-            name_elem = container.select_one(selector)
-            if name_elem:
-                name = name_elem.get_text(strip=True)
-                # Пробуем найти ссылку
-                link_elem = name_elem.find('a') if name_elem else None
-                if link_elem and link_elem.get('href'):
-                    url = link_elem.get('href')
-                break
+        name_elem = self.select_field(container, 'name', self.name_selectors)
+        if name_elem:
+            name = name_elem.get_text(strip=True)
+
+        # Ссылка - в названии или отдельным элементом карточки
+        url = self.select_link(container, name_elem)
 
         # Если не нашли через селекторы, ищем любой текст как название
         if not name:
@@ -113,22 +91,7 @@ class StrikePlanetParser(BaseParser):
                     break
 
         # Цена
-        price = 0
-        price_selectors = [
-            '.catalog-item-price',
-            '.price',
-            '.cost',
-            '.item-price',
-            '.price_value'
-        ]
-
-        for selector in price_selectors:
-            price_elem = container.select_one(selector)
-            if price_elem:
-                price_text = price_elem.get_text(strip=True)
-                price = self.clean_price(price_text)
-                if price > 0:
-                    break
+        price = self.select_price(container, self.price_selectors)
 
         # Если не нашли цену, ищем числа в тексте
         if price == 0:
@@ -165,50 +128,12 @@ class StrikePlanetParser(BaseParser):
         weight = self.extract_weight(name) if name else None
         package = self.extract_package(name) if name else None
 
-        return {
-            'name': name or "Неизвестный товар",
-            'price': price,
-            'competitor': self.name,
-            'url': url,
-            'in_stock': True,  # Предполагаем что в наличии
-            'weight': weight,
-            'package': package
-        }
-
-    def extract_weight(self, name: str) -> str:
-        """Извлечение веса из названия"""
-        if not name:
-            return None
-
-        weight_patterns = [
-            r'(\d+[,.]?\d*)\s*[gг]',  # 0.25g, 0.25г
-            r'(\d+[,.]?\d*)\s*грамм',  # 0.25 грамм
-            r'(\d+)\s*гр',  # 25 гр
-        ]
-
-        for pattern in weight_patterns:
-            match = re.search(pattern, name, re.IGNORECASE)
-            if match:
-                weight = match.group(1).replace(',', '.')
-                return f"{weight}g"
-
-        return None
-
-    def extract_package(self, name: str) -> str:
-        """Извлечение информации о упаковке"""
-        if not name:
-            return None
-
-        package_patterns = [
-            r'(\d+[,.]?\d*)\s*[pр]',  # 1000p, 1000р
-            r'(\d+)\s*шт',  # 1000 шт
-            r'(\d+)\s*штук',  # 1000 штук
-        ]
-
-        for pattern in package_patterns:
-            match = re.search(pattern, name, re.IGNORECASE)
-            if match:
-                count = match.group(1)
-                return f"{count} шт"
-
-        return None
\ No newline at end of file
+        return CompetitorProduct(
+            name=name or "Неизвестный товар",
+            price=price,
+            competitor=self.name,
+            url=url,
+            in_stock=True,  # Предполагаем что в наличии
+            weight=weight,
+            package=package
+        )
@@ -0,0 +1,171 @@
+"""
+Транспорт HTTP запросов парсеров: живой, запись в кассету и воспроизведение.
+
+В режиме записи каждый ответ сохраняется в файл-кассету, в режиме
+воспроизведения ответы берутся из кассеты без сети (с необязательной
+искусственной задержкой). Так прогоны парсеров повторяются один в один.
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Параметры, которые не пишутся в кассету и не участвуют в ключе
+SECRET_PARAMS = ('access_token',)
+
+
+def request_key(method: str, url: str, params: Optional[Dict] = None) -> str:
+    """Ключ запроса в кассете: метод, URL и параметры без секретов"""
+    params = {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS}
+    query = urlencode(sorted(params.items()))
+    return f"{method.upper()} {url}" + (f"?{query}" if query else "")
+
+
+class Cassette:
+    """Файл с записанными парами запрос/ответ (JSON, .gz - сжатый)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions: Dict[str, List[Dict]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def load(self) -> 'Cassette':
+        """Чтение кассеты с диска"""
+        opener = gzip.open if self.path.endswith('.gz') else open
+        with opener(self.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        for item in data.get('interactions', []):
+            self.interactions[item['key']].append(item['response'])
+        logger.info(f"Кассета {self.path}: {sum(len(v) for v in self.interactions.values())} ответов")
+        return self
+
+    def save(self):
+        """Запись кассеты на диск"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            items = [{'key': key, 'response': response}
+                     for key, responses in self.interactions.items() for response in responses]
+
+        opener = gzip.open if self.path.endswith('.gz') else open
+        with opener(self.path, 'wt', encoding='utf-8') as f:
+            json.dump({'interactions': items}, f, ensure_ascii=False)
+        logger.info(f"Кассета {self.path} сохранена: {len(items)} ответов")
+
+    def add(self, key: str, response: requests.Response):
+        """Добавление ответа к записи запроса"""
+        with self._lock:
+            self.interactions[key].append({
+                # URL ответа не сохраняем: в нем могут быть секретные параметры
+                'status': response.status_code,
+                'headers': dict(response.headers),
+                'encoding': response.encoding,
+                'body': response.content.decode(response.encoding or 'utf-8', errors='replace'),
+            })
+
+
+class LiveTransport:
+    """Обычные запросы через сессию парсера"""
+
+    offline = False
+
+    def send(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        """GET запрос (выполняется в потоке executor)"""
+        return session.get(url, **kwargs)
+
+    def close(self):
+        """Завершение работы транспорта"""
+        pass
+
+
+class RecordingTransport(LiveTransport):
+    """Живые запросы с записью ответов в кассету"""
+
+    def __init__(self, path: str):
+        self.cassette = Cassette(path)
+
+    def send(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        """GET запрос с записью ответа"""
+        response = super().send(session, url, **kwargs)
+        self.cassette.add(request_key('GET', url, kwargs.get('params')), response)
+        return response
+
+    def close(self):
+        """Сохранение кассеты"""
+        self.cassette.save()
+
+
+class ReplayTransport:
+    """Ответы из кассеты без сети; повторные запросы получают записи по порядку"""
+
+    offline = True
+
+    def __init__(self, path: str, latency: float = 0.0):
+        self.cassette = Cassette(path).load()
+        self.latency = latency
+        self._served = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def send(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        """Записанный ответ вместо запроса в сеть"""
+        key = request_key('GET', url, kwargs.get('params'))
+        responses = self.cassette.interactions.get(key)
+        if not responses:
+            raise requests.ConnectionError(f"Нет записи в кассете: {key}")
+
+        with self._lock:
+            index = min(self._served[key], len(responses) - 1)
+            self._served[key] += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        return self._build_response(responses[index], url)
+
+    @staticmethod
+    def _build_response(recorded: Dict, url: str) -> requests.Response:
+        """Объект requests.Response из записи кассеты"""
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.url = url
+        response.headers = CaseInsensitiveDict(recorded.get('headers', {}))
+        response.encoding = recorded.get('encoding') or 'utf-8'
+        body = recorded['body'].encode(response.encoding)
+        response._content = body
+        # Тело уже прочитано: iter_content отдает его кусками, raw - для читающих поток напрямую
+        response._content_consumed = True
+        response.raw = io.BytesIO(body)
+        return response
+
+    def close(self):
+        """Кассета только читается, сохранять нечего"""
+        pass
+
+
+_transport = LiveTransport()
+
+
+def get_transport():
+    """Текущий транспорт процесса"""
+    return _transport
+
+
+def set_transport(transport):
+    """Замена транспорта для всех парсеров процесса"""
+    global _transport
+    _transport = transport
+    return transport
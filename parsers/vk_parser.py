@@ -1,4 +1,5 @@
 from .base_parser import BaseParser
+from database.records import OurProduct
 import logging
 from typing import List, Dict, Optional
 
@@ -6,23 +7,40 @@ logger = logging.getLogger(__name__)
 
 
 class VKParser(BaseParser):
-    def __init__(self, access_token: str = None):
-        super().__init__("VK")
+    source = 'vk'
+
+    def __init__(self, access_token: str = None, config: Dict = None):
+        super().__init__("VK", config)
         self.access_token = access_token
         self.group_id = "-225037209"
+        self.api_url = "https://api.vk.com/method/market.get"
+
+    def warm_up_urls(self) -> List[str]:
+        """Соединение с API открывается при запуске"""
+        return [self.api_url]
+
+    def job_pages(self, category: str = None) -> List[str]:
+        """Все товары группы загружаются одним запросом к API"""
+        return [self.api_url]
+
+    async def fetch_payload(self, page: str) -> Optional[List[Dict]]:
+        """Товары приходят из API уже разобранными"""
+        return await self.parse_products()
 
-    def parse_products(self) -> List[Dict]:
+    async def parse_products(self) -> List[Dict]:
         """Парсинг товаров из VK с обработкой ошибок"""
         logger.info("Парсинг VK товаров...")
 
-        # Если нет токена, используем fallback
+        if not self.is_available():
+            return []
+
         if not self.access_token:
-            logger.warning("VK токен не указан, используем тестовые данные")
-            return self.get_fallback_products()
+            logger.warning("VK токен не указан, товары не загружены")
+            return []
 
         try:
             # Пробуем получить товары через API
-            products = self.get_market_items()
+            products = await self.get_market_items()
             if products:
                 parsed_products = []
                 for product in products:
@@ -32,19 +50,17 @@ class VKParser(BaseParser):
                 logger.info(f"VK: получено {len(parsed_products)} товаров")
                 return parsed_products
             else:
-                logger.warning("VK API не вернул товары, используем fallback")
-                return self.get_fallback_products()
+                logger.warning("VK API не вернул товары")
+                return []
 
         except Exception as e:
-            logger.error(f"Ошибка VK API: {e}, используем fallback")
-            return self.get_fallback_products()
+            logger.error(f"Ошибка VK API: {e}")
+            return []
 
-    def get_market_items(self) -> List[Dict]:
+    async def get_market_items(self) -> List[Dict]:
         """Получение товаров через VK API"""
         try:
-            import requests
-
-            url = "https://api.vk.com/method/market.get"
+            url = self.api_url
             params = {
                 'owner_id': self.group_id,
                 'count': 50,
@@ -53,8 +69,9 @@ class VKParser(BaseParser):
                 'v': '5.131'
             }
 
-            response = requests.get(url, params=params, timeout=10)
+            response = await self.fetch(url, params=params)
             response.raise_for_status()
+            await self.archive_page(url, response.status_code, response.text)
 
             data = response.json()
 
@@ -69,7 +86,7 @@ class VKParser(BaseParser):
             logger.error(f"Ошибка VK API запроса: {e}")
             return []
 
-    def parse_vk_product(self, vk_product: Dict) -> Optional[Dict]:
+    def parse_vk_product(self, vk_product: Dict) -> Optional[OurProduct]:
         """Парсинг одного товара VK"""
         try:
             name = vk_product.get('title', '').strip()
@@ -86,55 +103,16 @@ class VKParser(BaseParser):
             weight = self.extract_weight(name)
             package = self.extract_package(name)
 
-            return {
-                'name': name,
-                'price': price,
-                'vk_url': vk_url,
-                'description': description,
-                'weight': weight,
-                'package': package,
-                'vk_product_id': vk_product['id']
-            }
+            return OurProduct(
+                name=name,
+                price=price,
+                vk_url=vk_url,
+                description=description,
+                weight=weight,
+                package=package,
+                vk_product_id=vk_product['id']
+            )
 
         except Exception as e:
             logger.error(f"Ошибка парсинга товара VK: {e}")
             return None
-
-    def get_fallback_products(self) -> List[Dict]:
-        """Возвращает тестовые данные если VK не работает"""
-        logger.info("Используем тестовые данные для VK")
-
-        return [
-            {
-                'name': 'BB шары 0.25g Премиум (Наши)',
-                'price': 380.0,
-                'vk_url': 'https://vk.com/market-225037209',
-                'description': 'Высококачественные шары 0.25g',
-                'weight': '0.25g',
-                'package': '3000 шт'
-            },
-            {
-                'name': 'BB шары 0.28g Снайперские (Наши)',
-                'price': 450.0,
-                'vk_url': 'https://vk.com/market-225037209',
-                'description': 'Снайперские шары повышенной точности',
-                'weight': '0.28g',
-                'package': '3000 шт'
-            },
-            {
-                'name': 'BB шары 0.30g Тяжелые (Наши)',
-                'price': 520.0,
-                'vk_url': 'https://vk.com/market-225037209',
-                'description': 'Тяжелые шары для повышенной дальности',
-                'weight': '0.30g',
-                'package': '3000 шт'
-            },
-            {
-                'name': 'BB шары 0.25g Биоразлагаемые (Наши)',
-                'price': 420.0,
-                'vk_url': 'https://vk.com/market-225037209',
-                'description': 'Экологичные биоразлагаемые шары',
-                'weight': '0.25g',
-                'package': '2000 шт'
-            }
-        ]
\ No newline at end of file
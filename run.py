@@ -13,9 +13,11 @@ sys.path.append(os.path.dirname(__file__))
 
 def main():
     """Запуск бота"""
-    from main import AirsoftBot
+    from config import get_config
+    from main import AirsoftBot, setup_logging
 
     try:
+        setup_logging(get_config())
         bot = AirsoftBot()
         bot.run()
     except KeyboardInterrupt:
@@ -0,0 +1,71 @@
+import logging
+import random
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FreshnessTracker:
+    """Свежесть данных по источникам и повторные обновления после сбоев.
+
+    Если обновление источника не удалось, в базу ничего не пишется:
+    пользователи видят последний удачный снимок с пометкой о его возрасте,
+    а повторная попытка откладывается с растущей задержкой.
+    """
+
+    def __init__(self, base_delay: float = 120, max_delay: float = 3600):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._states: Dict[str, Dict] = {}
+
+    def _state(self, source: str) -> Dict:
+        return self._states.setdefault(source, {
+            'last_success': None,
+            'last_count': 0,
+            'last_changed': None,
+            'last_failure': None,
+            'failures': 0,
+            'error': None,
+            'retry_at': None,
+        })
+
+    def record_success(self, source: str, count: int, changed: Optional[int] = None):
+        """Удачное обновление: данные свежие, счетчик сбоев сбрасывается.
+
+        changed - сколько цен изменилось с прошлого обновления (None - неизвестно).
+        """
+        state = self._state(source)
+        if state['failures']:
+            logger.info(f"✅ {source}: данные снова актуальны после {state['failures']} неудачных попыток")
+        state.update(last_success=time.time(), last_count=count, last_changed=changed,
+                     failures=0, error=None, retry_at=None)
+
+    def record_failure(self, source: str, error: str) -> float:
+        """Неудачное обновление; возвращает задержку до повторной попытки"""
+        state = self._state(source)
+        state['failures'] += 1
+        state['last_failure'] = time.time()
+        state['error'] = error
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (state['failures'] - 1))
+        # Разброс, чтобы повторы разных источников не совпадали
+        delay = random.uniform(delay / 2, delay)
+        state['retry_at'] = time.time() + delay
+
+        logger.warning(f"⚠️ {source}: обновление не удалось ({error}), остаются прежние данные, "
+                       f"повтор через {delay:.0f} сек")
+        return delay
+
+    def is_stale(self, source: str) -> bool:
+        """Последняя попытка обновления не удалась"""
+        return self._state(source)['failures'] > 0
+
+    def age(self, source: str) -> Optional[float]:
+        """Секунд с последнего удачного обновления в этом процессе"""
+        last_success = self._state(source)['last_success']
+        return time.time() - last_success if last_success else None
+
+    def status(self) -> Dict[str, Dict]:
+        """Состояние всех источников"""
+        return {source: dict(state) for source, state in self._states.items()}
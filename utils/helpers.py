@@ -1,8 +1,13 @@
 import logging
-from typing import List, Dict
+import random
+import time
+from typing import List, Dict, Optional
 from datetime import datetime
 import asyncio
 
+from database.leader import LeaderLock
+from database.records import OurProduct
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,9 +38,24 @@ class MessageFormatter:
 💡 *Совет:* Для быстрого заказа используйте кнопки под нашими товарами!
         """
 
-    def format_competitor_prices(self, competitors: Dict) -> List[str]:
-        """Форматирование цен конкурентов"""
+    def format_age(self, seconds: float) -> str:
+        """Возраст данных словами: 5 мин, 3 ч, 2 дн"""
+        if seconds < 60:
+            return "меньше минуты"
+        if seconds < 3600:
+            return f"{int(seconds // 60)} мин"
+        if seconds < 86400:
+            return f"{int(seconds // 3600)} ч"
+        return f"{int(seconds // 86400)} дн"
+
+    def format_competitor_prices(self, competitors: Dict, freshness: Dict = None) -> List[str]:
+        """Форматирование цен конкурентов.
+
+        freshness: {конкурент: {'updated_at': datetime, 'stale': bool}} - время
+        последнего удачного обновления и признак того, что последнее не удалось.
+        """
         messages = []
+        freshness = freshness or {}
 
         for competitor, products in competitors.items():
             if not products:
@@ -44,31 +64,35 @@ class MessageFormatter:
             message = f"🏷 *{competitor}* - Цены на шары\n\n"
 
             # Сортируем по цене
-            sorted_products = sorted(products, key=lambda x: x['price'])
+            sorted_products = sorted(products, key=lambda x: x.price)
 
             for i, product in enumerate(sorted_products[:self.max_products_per_message]):
-                price_text = f"~~{product['old_price']}~~ ➡️ {product['price']}" if product.get(
-                    'old_price') else f"{product['price']}"
+                price_text = f"~~{product.old_price}~~ ➡️ {product.price}" if product.old_price else f"{product.price}"
 
-                message += f"{i + 1}. {product['name']}\n"
+                message += f"{i + 1}. {product.name}\n"
                 message += f"   💰 *{price_text}* руб."
 
-                if product.get('weight'):
-                    message += f" | ⚖️ {product['weight']}"
-                if product.get('package'):
-                    message += f" | 📦 {product['package']}"
+                if product.weight:
+                    message += f" | ⚖️ {product.weight}"
+                if product.package:
+                    message += f" | 📦 {product.package}"
 
                 message += "\n\n"
 
             if len(sorted_products) > self.max_products_per_message:
                 message += f"*... и еще {len(sorted_products) - self.max_products_per_message} товаров*"
 
-            message += f"\n🕒 *Обновлено:* {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+            info = freshness.get(competitor, {})
+            updated_at = info.get('updated_at') or datetime.now()
+            message += f"\n🕒 *Обновлено:* {updated_at.strftime('%d.%m.%Y %H:%M')}"
+            if info.get('stale'):
+                age = self.format_age((datetime.now() - updated_at).total_seconds())
+                message += f"\n⚠️ _Сайт сейчас недоступен, показаны данные, полученные {age} назад_"
             messages.append(message)
 
         return messages
 
-    def format_our_products(self, products: List[Dict]) -> List[str]:
+    def format_our_products(self, products: List[OurProduct]) -> List[str]:
         """Форматирование наших товаров"""
         if not products:
             return ["🛒 *Наши товары*\n\nВ настоящее время товары недоступны."]
@@ -78,21 +102,20 @@ class MessageFormatter:
         current_message = "🛒 *Наши товары*\n\n"
 
         for i, product in enumerate(products):
-            product_text = f"*{i + 1}. {product['name']}*\n"
-            product_text += f"💰 *Цена:* {product['price']} руб."
+            product_text = f"*{i + 1}. {product.name}*\n"
+            product_text += f"💰 *Цена:* {product.price} руб."
 
-            if product.get('old_price'):
-                product_text += f" (~~{product['old_price']}~~ 🔥)"
+            if product.old_price:
+                product_text += f" (~~{product.old_price}~~ 🔥)"
 
-            if product.get('weight'):
-                product_text += f"\n⚖️ *Вес:* {product['weight']}"
+            if product.weight:
+                product_text += f"\n⚖️ *Вес:* {product.weight}"
 
-            if product.get('package'):
-                product_text += f"\n📦 *Упаковка:* {product['package']}"
+            if product.package:
+                product_text += f"\n📦 *Упаковка:* {product.package}"
 
-            if product.get('description'):
-                desc = product['description'][:100] + "..." if len(product['description']) > 100 else product[
-                    'description']
+            if product.description:
+                desc = product.description[:100] + "..." if len(product.description) > 100 else product.description
                 product_text += f"\n📝 {desc}"
 
             product_text += "\n\n"
@@ -139,24 +162,92 @@ class MessageFormatter:
         return message
 
 
+class AdaptiveInterval:
+    """Интервал опроса источника, подстраивается под частоту изменения цен.
+
+    Цены изменились - интервал сокращается вдвое (не меньше min_interval),
+    не изменились - растет в полтора раза (не больше max_interval).
+    """
+
+    def __init__(self, base: float, min_interval: float = None, max_interval: float = None, jitter: float = 0.1):
+        self.base = base
+        self.min_interval = min_interval or base / 4
+        self.max_interval = max_interval or base * 4
+        self.jitter = jitter
+        self.current = base
+
+    def observe(self, changed: Optional[int]):
+        """Результат обновления: число изменившихся цен (None - неизвестно)"""
+        if changed is None:
+            return
+        if changed:
+            self.current = max(self.min_interval, self.current / 2)
+        else:
+            self.current = min(self.max_interval, self.current * 1.5)
+
+    def next_delay(self) -> float:
+        """Задержка до следующего обновления со случайным разбросом"""
+        return self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
 class Scheduler:
-    """Планировщик задач"""
+    """Планировщик задач: у каждого источника (раздела каталога) свой интервал обновления.
 
-    def __init__(self, bot):
+    Если запущено несколько копий бота с одной базой, обновления по
+    расписанию выполняет только лидер (блокировка MySQL GET_LOCK).
+    """
+
+    def __init__(self, bot, heartbeat_interval: float = 15):
         self.bot = bot
         self.tasks = []
         self.is_running = False
+        self.intervals: Dict[str, AdaptiveInterval] = {}
+        self._next_runs: Dict[str, float] = {}
+        self.leader = LeaderLock(bot.db)
+        self.heartbeat_interval = heartbeat_interval
+
+    @property
+    def is_leader(self) -> bool:
+        """Эта копия бота выполняет обновления по расписанию"""
+        return self.leader.is_leader
 
     async def start(self):
         """Запуск планировщика"""
         self.is_running = True
 
-        # Задача обновления цен
-        update_interval = int(self.bot.db.get_setting('price_update_interval') or 3600)
-        update_task = asyncio.create_task(self.schedule_price_updates(update_interval))
-        self.tasks.append(update_task)
-
-        logger.info(f"🕒 Планировщик запущен. Интервал обновления: {update_interval} сек.")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.leader.check)
+        self.tasks.append(asyncio.create_task(self.elect_leader()))
+        if not self.is_leader:
+            logger.info(f"🕒 {self.leader.node_id}: лидер - другая копия бота, обновления по расписанию ждут")
+
+        # Интервал по умолчанию для источников без update_interval
+        default_interval = int(self.bot.db.get_setting('price_update_interval') or 3600)
+
+        for source, parser in self.bot.parsers.items():
+            settings = self.bot.config.PARSERS_CONFIG.get(source, {})
+            # Несколько разделов - у каждого свой цикл; настройки раздела важнее настроек источника
+            for key, category in parser.work_units():
+                options = dict(settings, **parser.category(category)) if category else settings
+                interval = AdaptiveInterval(
+                    options.get('update_interval', default_interval),
+                    min_interval=options.get('min_interval'),
+                    max_interval=options.get('max_interval'),
+                )
+                self.intervals[key] = interval
+                self.tasks.append(asyncio.create_task(self.schedule_source(source, interval, category)))
+                logger.info(f"🕒 {key}: обновление каждые {interval.base} сек "
+                            f"({interval.min_interval:.0f}-{interval.max_interval:.0f} по частоте изменений)")
+
+            # Новые и измененные товары по карте сайта - отдельным циклом
+            if parser.sitemap_enabled:
+                base = settings.get('sitemap', {}).get('update_interval', settings.get('update_interval'))
+                interval = AdaptiveInterval(base or default_interval)
+                self.intervals[parser.sitemap_key] = interval
+                self.tasks.append(asyncio.create_task(self.schedule_discovery(source, interval)))
+                logger.info(f"🕒 {parser.sitemap_key}: карта сайта каждые {interval.base} сек")
+
+        logger.info(f"🕒 Планировщик запущен. Источников и разделов: {len(self.intervals)}")
 
     async def stop(self):
         """Остановка планировщика"""
@@ -166,32 +257,89 @@ class Scheduler:
             task.cancel()
 
         await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+        # Освобождаем лидерство сразу, не дожидаясь закрытия соединения
+        await asyncio.get_running_loop().run_in_executor(None, self.leader.release)
         logger.info("🕒 Планировщик остановлен")
 
-    async def schedule_price_updates(self, interval: int):
-        """Планирование обновления цен"""
+    async def elect_leader(self):
+        """Периодическое подтверждение лидерства или попытка его захватить"""
+        loop = asyncio.get_running_loop()
+        while self.is_running:
+            try:
+                await asyncio.sleep(self.heartbeat_interval)
+                await loop.run_in_executor(None, self.leader.check)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Ошибка выбора лидера: {e}")
+
+    async def schedule_source(self, source: str, interval: AdaptiveInterval, category: str = None):
+        """Периодическое обновление одного источника или раздела"""
+        key = self.bot.parsers[source].work_key(category)
         while self.is_running:
             try:
-                await asyncio.sleep(interval)
+                delay = interval.next_delay()
+                self._next_runs[key] = time.time() + delay
+                await asyncio.sleep(delay)
+                self._next_runs.pop(key, None)
+
+                if not self.is_leader:
+                    logger.debug(f"🕒 {key}: пропуск, обновления по расписанию выполняет лидер")
+                    continue
 
-                logger.info("🔄 Запуск автоматического обновления цен")
+                logger.info(f"🔄 Автоматическое обновление {key}")
+                success_count = await self.bot.update_source(source, 'планировщик', category)
 
-                # Обновляем цены
-                success_count = await self.bot.update_all_prices()
-                logger.info(f"✅ Автоматическое обновление завершено. Обработано: {success_count} товаров")
+                changed = self.bot.freshness.status().get(key, {}).get('last_changed') if success_count else None
+                interval.observe(changed)
+                logger.info(f"✅ {key}: обработано {success_count} товаров, изменилось цен: {changed}, "
+                            f"следующее обновление через ~{interval.current:.0f} сек")
 
-                # Публикуем обновление в группе если есть изменения
-                if success_count > 0:
-                    from telegram.ext import ContextTypes
-                    context = ContextTypes.DEFAULT_TYPE
-                    await self.bot.publish_price_update(context)
+                # Публикуем обновление в группе если цены изменились
+                if changed:
+                    await self.bot.publish_price_update(self.bot.application)
 
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"❌ Ошибка в планировщике: {e}")
+                logger.error(f"❌ Ошибка в планировщике ({key}): {e}")
                 await asyncio.sleep(60)  # Ждем перед повторной попыткой
 
+    async def schedule_discovery(self, source: str, interval: AdaptiveInterval):
+        """Периодический поиск новых и измененных товаров источника по карте сайта"""
+        key = self.bot.parsers[source].sitemap_key
+        while self.is_running:
+            try:
+                delay = interval.next_delay()
+                self._next_runs[key] = time.time() + delay
+                await asyncio.sleep(delay)
+                self._next_runs.pop(key, None)
+
+                if not self.is_leader:
+                    continue
+
+                found = await self.bot.discover_source(source, 'планировщик')
+                interval.observe(found)
+
+                if found:
+                    await self.bot.publish_price_update(self.bot.application)
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Ошибка в планировщике ({key}): {e}")
+                await asyncio.sleep(60)
+
+    def status(self) -> Dict[str, float]:
+        """Текущие интервалы источников и разделов, сек"""
+        return {source: interval.current for source, interval in self.intervals.items()}
+
+    def next_runs(self) -> Dict[str, float]:
+        """Время следующего обновления по расписанию (timestamp) по источникам и разделам"""
+        return dict(self._next_runs)
+
 
 def setup_logging():
     """Настройка логирования"""
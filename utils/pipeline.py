@@ -0,0 +1,362 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from database.fingerprints import ProductIndex, product_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    # Одновременных обработчиков на стадию
+    'fetch_concurrency': 4,
+    'parse_concurrency': 2,
+    'normalize_concurrency': 1,
+    'write_concurrency': 1,
+    # Размер очереди перед стадией (в элементах: страницах или товарах)
+    'fetch_queue': 8,
+    'parse_queue': 4,
+    'normalize_queue': 500,
+    'write_queue': 1000,
+    # Товаров в одной пакетной записи
+    'write_batch': 200,
+}
+
+_DONE = object()
+
+
+class PipelineMetrics:
+    """Счетчики стадий конвейера: обработано, ошибки, время обработки, глубина очередей"""
+
+    def __init__(self):
+        self._stages: Dict[str, Dict] = {}
+        self._queues: Dict[str, List[asyncio.Queue]] = {}
+
+    def _stage(self, name: str) -> Dict:
+        return self._stages.setdefault(name, {
+            'items': 0, 'errors': 0, 'busy': 0.0, 'max_latency': 0.0, 'peak_depth': 0, 'capacity': 0
+        })
+
+    def attach(self, name: str, queue: asyncio.Queue):
+        """Очередь перед стадией запущенного конвейера"""
+        self._stage(name)['capacity'] = queue.maxsize
+        self._queues.setdefault(name, []).append(queue)
+
+    def detach(self, name: str, queue: asyncio.Queue):
+        queues = self._queues.get(name, [])
+        if queue in queues:
+            queues.remove(queue)
+
+    def observe_depth(self, name: str, queue: asyncio.Queue):
+        stage = self._stage(name)
+        stage['peak_depth'] = max(stage['peak_depth'], queue.qsize())
+
+    def record(self, name: str, latency: float, items: int = 1, error: bool = False):
+        """Обработка элемента (или пакета из items элементов) стадией"""
+        stage = self._stage(name)
+        stage['items'] += items
+        stage['busy'] += latency
+        stage['max_latency'] = max(stage['max_latency'], latency)
+        if error:
+            stage['errors'] += 1
+
+    def status(self) -> Dict[str, Dict]:
+        """Состояние стадий: текущая глубина очередей, среднее и максимальное время обработки"""
+        result = {}
+        for name, stage in self._stages.items():
+            calls = stage['items'] or 1
+            result[name] = dict(
+                stage,
+                depth=sum(queue.qsize() for queue in self._queues.get(name, [])),
+                avg_latency=stage['busy'] / calls,
+            )
+        return result
+
+
+class Pipeline:
+    """Стадии, соединенные очередями ограниченного размера.
+
+    Каждая стадия - async обработчик с заданным числом одновременных вызовов.
+    Обработчик возвращает элементы для следующей стадии; если ее очередь
+    заполнена, он ждет, поэтому быстрая стадия не копит данные в памяти.
+    Последняя стадия может собирать элементы в пакеты (batch_stage).
+    """
+
+    def __init__(self, metrics: PipelineMetrics = None):
+        self.metrics = metrics or PipelineMetrics()
+        self.stages: List[Dict] = []
+
+    def stage(self, name: str, handler: Callable[[object], Awaitable[Optional[Iterable]]],
+              concurrency: int = 1, queue_size: int = None) -> 'Pipeline':
+        """Стадия: handler(элемент) -> элементы для следующей стадии"""
+        self.stages.append({'name': name, 'handler': handler, 'concurrency': concurrency,
+                            'queue_size': queue_size or concurrency * 2, 'batch': None})
+        return self
+
+    def batch_stage(self, name: str, handler: Callable[[List], Awaitable[None]],
+                    batch_size: int = 100, concurrency: int = 1, queue_size: int = None) -> 'Pipeline':
+        """Последняя стадия: handler(пакет не больше batch_size элементов)"""
+        self.stages.append({'name': name, 'handler': handler, 'concurrency': concurrency,
+                            'queue_size': queue_size or batch_size * 2, 'batch': batch_size})
+        return self
+
+    async def run(self, items: Iterable):
+        """Прогон элементов через все стадии до конца"""
+        queues = [asyncio.Queue(maxsize=stage['queue_size']) for stage in self.stages]
+        for stage, queue in zip(self.stages, queues):
+            self.metrics.attach(stage['name'], queue)
+
+        workers = []
+        for i, stage in enumerate(self.stages):
+            last = i + 1 == len(self.stages)
+            outbox = None if last else queues[i + 1]
+            next_name = None if last else self.stages[i + 1]['name']
+            run = self._batch_worker if stage['batch'] else self._worker
+            workers.append([asyncio.create_task(run(stage, queues[i], outbox, next_name))
+                            for _ in range(stage['concurrency'])])
+
+        try:
+            for item in items:
+                await queues[0].put(item)
+                self.metrics.observe_depth(self.stages[0]['name'], queues[0])
+            # Стадия закончена, когда завершились все ее обработчики; тогда закрываем следующую
+            for i, stage_workers in enumerate(workers):
+                for _ in stage_workers:
+                    await queues[i].put(_DONE)
+                await asyncio.gather(*stage_workers)
+        except BaseException:
+            for task in (task for stage_workers in workers for task in stage_workers):
+                task.cancel()
+            await asyncio.gather(*(task for stage_workers in workers for task in stage_workers),
+                                 return_exceptions=True)
+            raise
+        finally:
+            for stage, queue in zip(self.stages, queues):
+                self.metrics.detach(stage['name'], queue)
+
+    async def _worker(self, stage: Dict, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], next_name: str):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+
+            started = time.perf_counter()
+            try:
+                outputs = await stage['handler'](item)
+            except Exception as e:
+                self.metrics.record(stage['name'], time.perf_counter() - started, error=True)
+                logger.error(f"❌ Стадия {stage['name']}: {e}")
+                continue
+            self.metrics.record(stage['name'], time.perf_counter() - started)
+
+            if outbox is not None:
+                for output in outputs or ():
+                    await outbox.put(output)
+                    self.metrics.observe_depth(next_name, outbox)
+
+    async def _batch_worker(self, stage: Dict, inbox: asyncio.Queue, outbox, next_name):
+        batch = []
+        while True:
+            item = await inbox.get()
+            if item is not _DONE:
+                batch.append(item)
+                if len(batch) < stage['batch']:
+                    continue
+            if batch:
+                started = time.perf_counter()
+                try:
+                    await stage['handler'](batch)
+                    self.metrics.record(stage['name'], time.perf_counter() - started, items=len(batch))
+                except Exception as e:
+                    self.metrics.record(stage['name'], time.perf_counter() - started, items=len(batch), error=True)
+                    logger.error(f"❌ Стадия {stage['name']}: {e}")
+                batch = []
+            if item is _DONE:
+                return
+
+
+class RefreshPipeline:
+    """Обновление цен конвейером: загрузка -> разбор -> нормализация -> пакетная запись.
+
+    Загрузка следующих страниц идет, пока предыдущие разбираются в пуле
+    процессов и пишутся в базу; очереди между стадиями ограничены. Перед
+    записью товары сравниваются с отпечатками сохраненных (ProductIndex),
+    в базу уходят только новые и изменившиеся. Товары, пропавшие из
+    полного обхода, после отсрочки помечаются отсутствующими (in_stock).
+    """
+
+    def __init__(self, parsers: Dict, product_ops, settings: Dict = None, metrics: PipelineMetrics = None,
+                 index: ProductIndex = None, reload_index: bool = False):
+        self.parsers = parsers
+        self.product_ops = product_ops
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+        self.metrics = metrics or PipelineMetrics()
+        self.index = index or ProductIndex()
+        # Перечитывать отпечатки перед каждым обходом: в базу пишет не только этот процесс (воркеры)
+        self.reload_index = reload_index
+
+    async def load_index(self, sources: Iterable[str], force: bool = False):
+        """Загрузка отпечатков товаров источников из базы"""
+        loop = asyncio.get_running_loop()
+        for source in sources:
+            if self.index.is_loaded(source) and not force:
+                continue
+            try:
+                rows = await loop.run_in_executor(
+                    None, self.product_ops.get_source_states, source, self.parsers[source].name)
+            except Exception as e:
+                # Без отпечатков источник пишется целиком, как раньше
+                logger.error(f"Не удалось загрузить отпечатки товаров {source}: {e}")
+                self.index.forget(source)
+                continue
+            self.index.load(source, rows)
+
+    async def run(self, work: List[Tuple[str, str]]) -> Dict[str, Dict]:
+        """Обход страниц (источник, страница); результат по источникам"""
+        sources = {source for source, _ in work}
+        await self.load_index(sources, force=self.reload_index)
+        # Источники с отпечатками и сколько товаров было сохранено до обхода
+        known = {source: self.index.size(source) for source in sources if self.index.is_loaded(source)}
+        indexed = set(known)
+        # Обойденные разделы; None - источник целиком (все разделы или их нет).
+        # Отдельные страницы товаров (карта сайта) полным обходом не считаются
+        scopes = {}
+        for source, page in work:
+            crawled = scopes.setdefault(source, set())
+            if not self.parsers[source].is_product_page(page):
+                crawled.add(self.parsers[source].category_of(page))
+        for source, crawled in scopes.items():
+            if crawled >= {category['name'] for category in self.parsers[source].categories}:
+                scopes[source] = None
+
+        results = {source: {'pages': 0, 'failed_pages': 0, 'products': 0, 'inserted': 0, 'updated': 0,
+                            'unchanged': 0, 'price_changes': 0, 'changed': None, 'disappeared': None,
+                            'vanished': 0, 'seen': set(), 'errors': [], 'unfetched': [], 'write_failed': False}
+                   for source in sources}
+
+        def fail(source: str, error: str):
+            results[source]['failed_pages'] += 1
+            results[source]['errors'].append(error)
+
+        async def fetch(item):
+            source, page = item
+            try:
+                payload = await self.parsers[source].fetch_payload(page)
+            except Exception as e:
+                fail(source, str(e))
+                results[source]['unfetched'].append(page)
+                return []
+            if payload is None:
+                fail(source, f"страница не загружена: {page}")
+                results[source]['unfetched'].append(page)
+                return []
+            return [(source, page, payload)]
+
+        async def parse(item):
+            source, page, payload = item
+            try:
+                products = await self.parsers[source].parse_payload(payload, page)
+            except Exception as e:
+                fail(source, str(e))
+                return []
+            if not products:
+                fail(source, f"товары не получены: {page}")
+                return []
+            results[source]['pages'] += 1
+            category = self.parsers[source].category_of(page)
+            if source != 'vk':
+                for product in products:
+                    # Раздел страницы товара неизвестен - остается прежний
+                    product.category = category or self.index.category(source, product_key(source, product))
+            return [(source, product) for product in products]
+
+        async def normalize(item):
+            source, product = item
+            product = self.parsers[source].normalize_product(product)
+            return [(source, product)] if product else []
+
+        async def write(batch):
+            by_source = {}
+            for source, product in batch:
+                by_source.setdefault(source, []).append(product)
+
+            loop = asyncio.get_running_loop()
+            for source, products in by_source.items():
+                result = results[source]
+                if source in indexed:
+                    delta = self.index.diff(source, products)
+                    changed = delta['inserts'] + delta['updates']
+                else:
+                    delta = {'inserts': products, 'updates': [], 'price_changes': 0, 'unchanged': 0}
+                    changed = products
+
+                try:
+                    if changed:
+                        await loop.run_in_executor(None, self.product_ops.save_source_products, source, changed)
+                except Exception as e:
+                    logger.error(f"Ошибка сохранения товаров {self.parsers[source].name}: {e}")
+                    result['write_failed'] = True
+                    result['errors'].append(f"ошибка базы: {e}")
+                    continue
+
+                self.index.apply(source, changed)
+                result['products'] += len(products)
+                result['inserted'] += len(delta['inserts'])
+                result['updated'] += len(delta['updates'])
+                result['price_changes'] += delta['price_changes']
+                result['unchanged'] += delta['unchanged']
+                result['seen'].update(product_key(source, product) for product in products)
+
+        pipeline = (
+            Pipeline(self.metrics)
+            .stage('fetch', fetch, self.settings['fetch_concurrency'], self.settings['fetch_queue'])
+            .stage('parse', parse, self.settings['parse_concurrency'], self.settings['parse_queue'])
+            .stage('normalize', normalize, self.settings['normalize_concurrency'], self.settings['normalize_queue'])
+            .batch_stage('write', write, self.settings['write_batch'], self.settings['write_concurrency'],
+                         self.settings['write_queue'])
+        )
+
+        started = time.perf_counter()
+        await pipeline.run(work)
+
+        for source, result in results.items():
+            if source not in indexed:
+                continue
+            # Новые товары и новые цены; при первом заполнении базы сравнивать не с чем
+            if known[source]:
+                result['changed'] = result['inserted'] + result['price_changes']
+            # Пропавшие товары считаются только по полному обходу источника или раздела
+            complete = result['products'] and not result['failed_pages'] and not result['write_failed']
+            if complete and scopes[source] != set():
+                result['disappeared'] = self.index.missing(source, result['seen'], scopes[source])
+                result['vanished'] = await self.mark_vanished(source, result['seen'], scopes[source])
+
+        logger.info(f"🏭 Конвейер: {len(work)} страниц за {time.perf_counter() - started:.1f} сек, "
+                    f"записано товаров: {sum(r['inserted'] + r['updated'] for r in results.values())} "
+                    f"из {sum(r['products'] for r in results.values())}")
+        return results
+
+    async def mark_vanished(self, source: str, seen, categories=None) -> int:
+        """Пометка товаров, которых нет в полных обходах дольше отсрочки, отсутствующими"""
+        parser = self.parsers[source]
+        vanished = self.index.reconcile(source, seen, parser.vanish_runs, parser.vanish_grace,
+                                        categories=categories)
+        loop = asyncio.get_running_loop()
+        marked = 0
+
+        # Обычно одна группа: все пропавшие в одном обходе видели последний раз одновременно
+        for last_seen, keys in vanished.items():
+            try:
+                await loop.run_in_executor(None, self.product_ops.mark_vanished, source, keys,
+                                           datetime.fromtimestamp(last_seen), parser.name)
+            except Exception as e:
+                logger.error(f"Не удалось пометить пропавшие товары {parser.name}: {e}")
+                continue
+            self.index.mark_gone(source, keys)
+            marked += len(keys)
+
+        if marked:
+            logger.info(f"📭 {parser.name}: нет в наличии (пропали из каталога): {marked}")
+        return marked
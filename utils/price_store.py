@@ -0,0 +1,142 @@
+"""
+Колоночный снимок цен для статистики.
+
+Вместо списка товаров - параллельные массивы array: цены и вес в 'd',
+количество и ID в 'q', конкурент - номер в таблице интернированных
+названий. Агрегаты считаются проходом по массиву (sum, sorted работают
+на уровне C), поэтому статистика по десяткам тысяч товаров занимает
+миллисекунды и не создает объектов на каждый товар.
+"""
+
+import math
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from database.records import parse_count, parse_weight
+
+NAN = float('nan')
+
+
+def mean(values: Sequence[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def percentile(values: Sequence[float], q: float, presorted: bool = False) -> Optional[float]:
+    """Процентиль q (0-100) с линейной интерполяцией между соседними значениями"""
+    if not values:
+        return None
+    ordered = values if presorted else sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def median(values: Sequence[float]) -> Optional[float]:
+    return percentile(values, 50)
+
+
+def summary(values: Sequence[float], percentiles: Iterable[float] = (10, 90)) -> Dict:
+    """Количество, среднее, медиана, минимум, максимум и процентили (p10, p90, ...)"""
+    ordered = sorted(values)
+    result = {
+        'count': len(ordered),
+        'mean': mean(ordered),
+        'median': percentile(ordered, 50, presorted=True),
+        'min': ordered[0] if ordered else None,
+        'max': ordered[-1] if ordered else None,
+    }
+    for q in percentiles:
+        result[f"p{q:g}"] = percentile(ordered, q, presorted=True)
+    return result
+
+
+class PriceStore:
+    """Снимок каталога по колонкам; позиция товара во всех массивах одна и та же"""
+
+    def __init__(self):
+        self.ids = array('q')
+        self.prices = array('d')
+        # Вес шара в граммах, NaN - не указан
+        self.weights = array('d')
+        # Шаров в упаковке, 0 - не указано
+        self.counts = array('q')
+        self.competitors = array('H')
+        self.names: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._offsets: Dict[int, int] = {}
+
+    @classmethod
+    def from_products(cls, products: Iterable, competitor: str = None) -> 'PriceStore':
+        """Снимок из записей товаров; competitor - одно название для всех (наши товары)"""
+        store = cls()
+        for product in products:
+            if product.price is None:
+                continue
+            weight = product.weight_g if product.weight_g is not None else parse_weight(product.weight)
+            count = product.bb_count if product.bb_count is not None else parse_count(product.package)
+            store.append(product.id, competitor or product.competitor, product.price, weight, count)
+        return store
+
+    def intern(self, competitor: str) -> int:
+        """Код конкурента в колонке competitors"""
+        code = self._codes.get(competitor)
+        if code is None:
+            code = self._codes[competitor] = len(self.names)
+            self.names.append(competitor)
+        return code
+
+    def append(self, product_id: Optional[int], competitor: str, price: float,
+               weight: float = None, count: int = None):
+        if product_id is not None:
+            self._offsets[product_id] = len(self.ids)
+        self.ids.append(product_id or 0)
+        self.prices.append(float(price))
+        self.weights.append(NAN if weight is None else float(weight))
+        self.counts.append(count or 0)
+        self.competitors.append(self.intern(competitor))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def offset(self, product_id: int) -> Optional[int]:
+        """Позиция товара в колонках по ID"""
+        return self._offsets.get(product_id)
+
+    def mean(self) -> Optional[float]:
+        return mean(self.prices)
+
+    def median(self) -> Optional[float]:
+        return median(self.prices)
+
+    def percentile(self, q: float) -> Optional[float]:
+        return percentile(self.prices, q)
+
+    def group_by(self, keys: Sequence) -> Dict[object, array]:
+        """Цены по значениям колонки keys (None - товар в группы не попадает)"""
+        groups: Dict[object, array] = {}
+        for key, price in zip(keys, self.prices):
+            if key is not None:
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = array('d')
+                group.append(price)
+        return groups
+
+    def by_competitor(self) -> Dict[str, array]:
+        """Цены по конкурентам"""
+        return {self.names[code]: prices for code, prices in self.group_by(self.competitors).items()}
+
+    def by_weight(self) -> Dict[float, array]:
+        """Цены по весу шара; товары без веса пропускаются"""
+        return self.group_by([None if math.isnan(weight) else weight for weight in self.weights])
+
+    def per_thousand(self) -> array:
+        """Цена за 1000 шаров; NaN - количество не указано"""
+        return array('d', (price * 1000 / count if count else NAN for price, count in zip(self.prices, self.counts)))
+
+    def stats(self, groups: Callable[[], Dict] = None, percentiles: Iterable[float] = (10, 90)) -> Dict:
+        """summary() по всему снимку или по группам: store.stats(store.by_competitor)"""
+        if groups is None:
+            return summary(self.prices, percentiles)
+        return {key: summary(prices, percentiles) for key, prices in groups().items()}
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshCoordinator:
+    """Одно обновление на ключ в каждый момент времени.
+
+    Если обновление уже идет (из /update, админ-панели или планировщика),
+    повторный запрос не запускает второй обход сайтов, а ждет текущий и
+    получает его результат.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, Dict] = {}
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]], trigger: str = None) -> Any:
+        """Запуск factory() под ключом key или ожидание уже идущего запуска"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight['waiters'] += 1
+            logger.info(f"⏳ {key}: обновление уже идет (запустил {flight['trigger']}), "
+                        f"{trigger or 'запрос'} ждет его результат")
+            try:
+                return await asyncio.shield(flight['task'])
+            finally:
+                flight['waiters'] -= 1
+
+        task = asyncio.ensure_future(factory())
+        self._flights[key] = {'task': task, 'trigger': trigger, 'started_at': time.time(), 'waiters': 0}
+        task.add_done_callback(lambda _: self._flights.pop(key, None))
+
+        # shield: отмена одного ожидающего не прерывает обновление для остальных
+        return await asyncio.shield(task)
+
+    def is_running(self, key: str) -> bool:
+        """Идет ли обновление под ключом"""
+        return key in self._flights
+
+    def status(self) -> Dict[str, Dict]:
+        """Идущие обновления: кто запустил, сколько идут, сколько запросов ждут"""
+        now = time.time()
+        return {
+            key: {
+                'trigger': flight['trigger'],
+                'running_for': now - flight['started_at'],
+                'waiters': flight['waiters'],
+            }
+            for key, flight in self._flights.items()
+        }
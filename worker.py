@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Воркер очереди задач парсинга.
+
+Бот в режиме очереди (QUEUE_CONFIG['enabled'] в key/key.py) только ставит
+задачи в таблицу scrape_jobs, а сайты парсят воркеры: сколько угодно
+процессов на одной или нескольких машинах с общей базой. Задачу, которую
+не завершил упавший воркер, после истечения захвата забирает другой.
+
+Примеры:
+    python worker.py                                  # все включенные источники
+    python worker.py --source strikeplanet --source vk
+    python worker.py --concurrency 2                  # две задачи одновременно
+    python worker.py --once                           # выполнить ожидающие задачи и выйти
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from config import get_config
+from database.job_queue import ScrapeJobQueue
+from database.operations import ProductOperations
+from parsers import parse_pool
+from parsers.airsoftrus_parser import AirsoftRusParser
+from parsers.http_clients import http_clients
+from parsers.strikeplanet_parser import StrikePlanetParser
+from parsers.vk_parser import VKParser
+from utils.pipeline import RefreshPipeline
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def create_parsers(parsers_config: dict) -> dict:
+    """Включенные парсеры (как в AirsoftBot.setup_parsers)"""
+    parsers = {}
+
+    if parsers_config.get('strikeplanet', {}).get('enabled', False):
+        parsers['strikeplanet'] = StrikePlanetParser(parsers_config['strikeplanet'])
+
+    if parsers_config.get('airsoftrus', {}).get('enabled', False):
+        parsers['airsoftrus'] = AirsoftRusParser(parsers_config['airsoftrus'])
+
+    if parsers_config.get('vk', {}).get('enabled', False) and parsers_config['vk'].get('access_token'):
+        parsers['vk'] = VKParser(parsers_config['vk']['access_token'], parsers_config['vk'])
+
+    return parsers
+
+
+class Worker:
+    """Цикл захвата и выполнения задач из scrape_jobs"""
+
+    def __init__(self, config, sources=None, concurrency: int = 1):
+        self.queue = ScrapeJobQueue(config.QUEUE_CONFIG)
+        self.product_ops = ProductOperations()
+        self.parsers = create_parsers(config.PARSERS_CONFIG)
+        if sources:
+            self.parsers = {source: parser for source, parser in self.parsers.items() if source in sources}
+        # В базу пишут и другие воркеры, поэтому отпечатки товаров перечитываются перед каждой задачей
+        self.pipeline = RefreshPipeline(self.parsers, self.product_ops, config.PIPELINE_CONFIG, reload_index=True)
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.processed = 0
+
+    async def run(self, once: bool = False):
+        """Запуск concurrency циклов обработки"""
+        if not self.parsers:
+            print("❌ Нет включенных парсеров для выбранных источников")
+            return
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.queue.db.create_tables)
+        await loop.run_in_executor(None, self.queue.db.migrate)
+
+        print(f"🚀 Воркер {self.worker_id}: источники {', '.join(self.parsers)}, "
+              f"одновременно задач: {self.concurrency}")
+        await asyncio.gather(*(self.consume(once) for _ in range(self.concurrency)))
+
+    async def consume(self, once: bool):
+        """Захват задач по одной, пока очередь не опустеет (once) или бесконечно"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                job = await loop.run_in_executor(None, self.queue.claim, self.worker_id, list(self.parsers))
+            except Exception as e:
+                logger.error(f"❌ Ошибка чтения очереди: {e}")
+                job = None
+
+            if job is None:
+                if once:
+                    return
+                await asyncio.sleep(self.queue.settings['poll_interval'])
+                continue
+
+            await self.process(job)
+
+    async def process(self, job: dict):
+        """Парсинг страницы задачи и сохранение результата через конвейер"""
+        source = job['source']
+        parser = self.parsers[source]
+        started = time.time()
+        logger.info(f"🔄 Задача #{job['id']}: {parser.name} {job['page']} (попытка {job['attempts']})")
+
+        heartbeat = asyncio.create_task(self.keep_lease(job))
+        try:
+            result = (await self.pipeline.run([(source, job['page'])]))[source]
+        finally:
+            heartbeat.cancel()
+
+        if not result['products'] or result['write_failed']:
+            error = result['errors'][0] if result['errors'] else "товары не получены"
+            logger.error(f"❌ Задача #{job['id']} ({parser.name}) не выполнена: {error}")
+            self.queue.fail(job['id'], self.worker_id, job['attempts'], error)
+            return
+
+        count, changed = result['products'], result['changed']
+        if not self.queue.complete(job['id'], self.worker_id, count, changed):
+            logger.warning(f"⚠️ Задача #{job['id']} тем временем передана другому воркеру")
+            return
+
+        self.processed += 1
+        logger.info(f"✅ Задача #{job['id']}: {count} товаров, изменилось цен: {changed}, "
+                    f"{time.time() - started:.1f} сек")
+
+    async def keep_lease(self, job: dict):
+        """Продление захвата задачи, пока идет парсинг"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.queue.settings['lease_seconds'] / 3)
+            try:
+                extended = await loop.run_in_executor(None, self.queue.extend_lease, job['id'], self.worker_id)
+            except Exception as e:
+                logger.warning(f"Не удалось продлить задачу #{job['id']}: {e}")
+                continue
+            if not extended:
+                logger.warning(f"⚠️ Задача #{job['id']} больше не закреплена за воркером")
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воркер очереди задач парсинга")
+    parser.add_argument('--source', action='append', choices=['strikeplanet', 'airsoftrus', 'vk'],
+                        help="Источник (можно несколько раз), по умолчанию - все включенные")
+    parser.add_argument('--concurrency', type=int, default=1, help="Задач одновременно")
+    parser.add_argument('--once', action='store_true', help="Выполнить ожидающие задачи и выйти")
+    args = parser.parse_args()
+
+    config = get_config()
+    http_clients.configure(config.HTTP_CONFIG)
+    worker = Worker(config, sources=args.source, concurrency=args.concurrency)
+
+    try:
+        asyncio.run(worker.run(once=args.once))
+    except KeyboardInterrupt:
+        # Незавершенные задачи заберут другие воркеры после истечения захвата
+        print("\n🛑 Воркер остановлен")
+    finally:
+        parse_pool.shutdown()
+        http_clients.close()
+
+    print(f"📊 Выполнено задач: {worker.processed}")
+
+
+if __name__ == "__main__":
+    main()